@@ -1,14 +1,19 @@
 """A library for .bsp file analysis & modification"""
-__all__ = ["base", "branches", "load_bsp", "lumps", "tools",
+__all__ = ["base", "branches", "identify", "load_bsp", "lumps", "probe", "profiling", "spatial", "tools",
            "D3DBsp", "GoldSrcBsp", "IdTechBsp", "InfinityWardBsp",
            "QuakeBsp", "RavenBsp", "RespawnBsp", "RitualBsp", "ValveBsp"]
 
+import collections
+import fnmatch
 import os
 from types import ModuleType
+from typing import Union
 
 from . import base  # base.Bsp base class
 from . import branches  # all known .bsp variant definitions
 from . import lumps
+from . import profiling  # opt-in per-lump load measurements
+from . import spatial  # radius, nearest & box queries over props, lights, cubemaps & entities
 from .id_software import QuakeBsp, IdTechBsp
 from .infinity_ward import InfinityWardBsp, D3DBsp
 from .raven import RavenBsp
@@ -35,24 +40,56 @@ GoldSrc_versions = {*branches.valve.goldsrc.GAME_VERSIONS.values(),
                     *branches.gearbox.nightfire.GAME_VERSIONS.values()}
 # detect InfinityWardBsp / D3DBsp
 InfinityWard_versions = {v for s in branches.infinity_ward.scripts for v in s.GAME_VERSIONS.values()}
+D3D_versions = {v for v in InfinityWard_versions if v >= branches.infinity_ward.call_of_duty4.BSP_VERSION}
 # detect QuakeBsp
 Quake_versions = {*branches.id_software.quake.GAME_VERSIONS.values()}
 
 
-def load_bsp(filename: str, branch_script: ModuleType = None) -> base.Bsp:
+def load_bsp(filename: Union[str, base.BspSource], branch_script: ModuleType = None, mmap: bool = False,
+             lazy: bool = False, workers: int = 1) -> base.Bsp:
     """Calculate and return the correct base.Bsp sub-class for the given .bsp"""
+    # NOTE: mmap=True memory maps the .bsp; lumps become views of the map & skip file reads
+    # NOTE: lazy=True only reads headers; each lump is loaded when first accessed (see Bsp.unload)
+    # NOTE: workers > 1 decompresses all compressed lumps at once, in a pool of threads
+    # NOTE: filename can also be an in-memory .bsp (bytes, memoryview or file object; see base.BspSource)
+    # -- e.g. load_bsp(Pk3("pak0.pk3").open("maps/q3dm1.bsp")); lumps are views of the buffer, nothing touches disk
     # TODO: OPTION: use filepath to guess game / branch
-    # verify path
-    if not os.path.exists(filename):
-        raise FileNotFoundError(f".bsp file '{filename}' does not exist.")
-    elif os.path.getsize(filename) == 0:  # HL2/ d2_coast_02.bsp
-        raise RuntimeError(f"{filename} is an empty file")
+    if not isinstance(filename, str):
+        filename = base.buffered(filename)  # archive members & streams are only read once
+    BspVariant, branch_script, file_magic, version = identify(filename, branch_script)
+    # NOTE: might raise errors
+    return BspVariant(branch_script, filename, autoload=True, mmap=mmap, lazy=lazy, workers=workers)
+
+
+def identify(filename: Union[str, base.BspSource], branch_script: ModuleType = None
+             ) -> (base.Bsp, ModuleType, bytes, int):
+    """Get the BspVariant, branch_script, file_magic & bsp_version of a .bsp, without loading it"""
+    if isinstance(filename, str):
+        # verify path
+        if not os.path.exists(filename):
+            raise FileNotFoundError(f".bsp file '{filename}' does not exist.")
+        elif os.path.getsize(filename) == 0:  # HL2/ d2_coast_02.bsp
+            raise RuntimeError(f"{filename} is an empty file")
+        with open(filename, "rb") as bsp_file:
+            header = bsp_file.read(8)
+    else:  # in-memory .bsp
+        # NOTE: unseekable streams are read into memory; pass load_bsp the result of base.buffered instead
+        source = base.buffered(filename)
+        position = source.tell()
+        source.seek(0)
+        header = source.read(8)
+        source.seek(position)
+        filename = base.source_name(source, None)
+        if filename is None:  # no extension to go by
+            is_d3dbsp = header[:4] == b"IBSP" and int.from_bytes(header[4:8], "little") in D3D_versions
+            filename = "untitled.d3dbsp" if is_d3dbsp else "untitled.bsp"
+        if len(header) == 0:
+            raise RuntimeError(f"{filename} is an empty file")
     # parse header
-    with open(filename, "rb") as bsp_file:
-        file_magic = bsp_file.read(4)
-        version = int.from_bytes(bsp_file.read(4), "little")
-        if version > 0xFFFF:
-            version = (version & 0xFFFF, version >> 16)  # major, minor
+    file_magic = header[:4]
+    version = int.from_bytes(header[4:8], "little")
+    if version > 0xFFFF:
+        version = (version & 0xFFFF, version >> 16)  # major, minor
     # identify BspVariant
     if filename.lower().endswith(".d3dbsp"):  # CoD2 & CoD4
         assert file_magic == b"IBSP", "Mystery .d3dbsp!"
@@ -88,4 +125,39 @@ def load_bsp(filename: str, branch_script: ModuleType = None) -> base.Bsp:
     # -- e.g. (b"VBSP", 20) & (b"VBSP", 21)
     if branch_script is None:
         branch_script = branches.script_from_file_magic_and_version[(file_magic, version)]
-    return BspVariant(branch_script, filename, autoload=True)  # might raise errors
+    return BspVariant, branch_script, file_magic, version
+
+
+ProbedBsp = collections.namedtuple("ProbedBsp", ["filename", "BspVariant", "branch", "file_magic", "bsp_version",
+                                                 "bsp_file_size", "headers", "compressed", "external_lumps",
+                                                 "ent_files"])
+# headers: {"LUMP_NAME": LumpHeader}
+# compressed: ["LUMP_NAME"]  # lumps w/ a non-zero fourCC
+# external_lumps: {"LUMP_NAME": ".bsp_lump filename"}
+# ent_files: [".ent filename"]
+
+
+def probe(filename: str, branch_script: ModuleType = None) -> ProbedBsp:
+    """Identify a .bsp & read it's lump headers; no lumps are loaded"""
+    BspVariant, branch_script, file_magic, version = identify(filename, branch_script)
+    bsp = BspVariant(branch_script, filename, autoload=False)
+    with open(filename, "rb") as bsp.file:
+        bsp.file.seek(0, 2)  # move cursor to end of file
+        bsp_file_size = bsp.file.tell()
+        if BspVariant is D3DBsp:  # headers aren't in LUMP order
+            headers = {header.name: header for header in bsp._read_headers()}
+        else:
+            headers = {LUMP.name: bsp._read_header(LUMP) for LUMP in branch_script.LUMP}
+    compressed = [name for name, header in headers.items() if getattr(header, "fourCC", 0) != 0]
+    # companion files
+    local_files = os.listdir(bsp.folder)
+    external_lumps = dict()
+    for lump_filename in fnmatch.filter(local_files, f"{bsp.filename}.*.bsp_lump"):
+        try:
+            LUMP = branch_script.LUMP(int(lump_filename.split(".")[-2], 16))
+        except ValueError:  # not a lump index, or not a lump in this branch
+            continue
+        external_lumps[LUMP.name] = lump_filename
+    ent_files = fnmatch.filter(local_files, f"{os.path.splitext(bsp.filename)[0]}_*.ent")
+    return ProbedBsp(bsp.filename, BspVariant, branch_script, file_magic, version, bsp_file_size,
+                     headers, compressed, external_lumps, ent_files)
@@ -1,19 +1,47 @@
 from __future__ import annotations
 import collections
 import enum  # for type hints
+import io
 import os
 import struct
 from types import MethodType, ModuleType
-from typing import Dict, List
+from typing import Any, BinaryIO, Dict, List, Union
 import warnings
+import zipfile
 
 from . import lumps
+from . import profiling
 
 
 # TODO: align base.Bsp closer to Quake, rather than Source
 # -- move all versioned lumps etc. to valve.py
 LumpHeader = collections.namedtuple("LumpHeader", ["offset", "length", "version", "fourCC"])
 # NOTE: if fourCC != 0: lump is compressed  (fourCC value == uncompressed size)
+BspSource = Union[bytes, bytearray, memoryview, BinaryIO]
+# ^ an in-memory .bsp; e.g. Pk3("pak0.pk3").read("maps/q3dm1.bsp") or Pk3("pak0.pk3").open("maps/q3dm1.bsp")
+
+
+def buffered(source: BspSource) -> Union[lumps.BufferFile, BinaryIO]:
+    """BspSource as a seekable file; archive members & other streams are read into memory once"""
+    if isinstance(source, lumps.BufferFile):
+        return source
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        return lumps.BufferFile(source)
+    name = getattr(source, "name", None)
+    if isinstance(source, io.BytesIO):
+        return lumps.BufferFile(source.getbuffer(), name)
+    elif isinstance(source, zipfile.ZipExtFile) or not source.seekable():
+        # NOTE: seeking backwards in an archive member restarts decompression from the start of the file
+        if source.seekable():
+            source.seek(0)
+        return lumps.BufferFile(source.read(), name)
+    return source  # e.g. open("map.bsp", "rb")
+
+
+def source_name(source: BspSource, default: str = "untitled.bsp") -> str:
+    """filename (without folder) of an in-memory .bsp, if it has one"""
+    name = getattr(source, "name", None)
+    return os.path.basename(name) if isinstance(name, str) else default
 
 
 class Bsp:
@@ -25,21 +53,39 @@ class Bsp:
     file_magic: bytes = b"XBSP"
     # NOTE: XBSP is not a real bsp variant! this is just a placeholder
     filename: str
-    folder: str
+    folder: str  # "" if loaded from a BspSource
     headers: Dict[str, LumpHeader]
     # ^ {"LUMP_NAME": LumpHeader}
     loading_errors: Dict[str, Exception]
     # ^ {"LUMP_NAME": Exception("details")}
+    load_stats: Dict[str, profiling.LoadStats]
+    # ^ {"LUMP_NAME": LoadStats}; only filled in if profiling is enabled (see profiling.enable)
+    mmap: bool = False  # lumps read from a memory map of the file, rather than seek & read
+    _lump_file: Union[io.BufferedReader, memoryview]  # self.file, or a memory map of it
+    _source: Union[lumps.BufferFile, BinaryIO, None] = None  # see BspSource; None if loaded from disk
+    lazy: bool = False  # lumps are only loaded when first accessed
+    _loadable_lumps: Dict[str, LumpHeader]
+    # ^ {"LUMP_NAME": LumpHeader}; lumps __getattr__ can load from file
+    workers: int = 1  # threads used to decompress lumps while loading
+    _decompressed: Dict[str, (Union[io.BytesIO, memoryview], LumpHeader)]
+    # ^ {"LUMP_NAME": (decompressed_file, decompressed_header)}; see _load_lumps
 
-    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True):
+    def __init__(self, branch: ModuleType, filename: Union[str, BspSource] = "untitled.bsp",
+                 autoload: bool = True, mmap: bool = False, lazy: bool = False, workers: int = 1):
+        filename = self._set_source(filename)
         if not filename.lower().endswith(".bsp"):
             raise RuntimeError("Not a .bsp")
-        filename = os.path.realpath(filename)
+        if self._source is None:
+            filename = os.path.realpath(filename)
         self.folder, self.filename = os.path.split(filename)
         self.set_branch(branch)
         self.headers = dict()
+        self.mmap = mmap
+        self.lazy = lazy
+        self.workers = workers
+        self._decompressed = dict()
         if autoload:
-            if os.path.exists(filename):
+            if self._source is not None or os.path.exists(filename):
                 self._preload()
             else:
                 warnings.warn(UserWarning(f"{filename} not found, creating a new .bsp"))
@@ -52,6 +98,19 @@ class Bsp:
     def __exit__(self, exc_type, exc_value, exc_traceback):
         self.file.close()
 
+    def __getattr__(self, name: str):
+        """Loads lumps on first access"""
+        # NOTE: only called if name isn't already an attribute; i.e. the lump isn't loaded
+        loadable_lumps = self.__dict__.get("_loadable_lumps", dict())
+        if name not in loadable_lumps:
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+        if profiling.enabled:
+            lump = profiling.load_lump(self, name, loadable_lumps[name])
+        else:
+            lump = self._load_lump(name, loadable_lumps[name])
+        setattr(self, name, lump)
+        return lump
+
     def __repr__(self):
         branch_script = ".".join(self.branch.__name__.split(".")[-2:])
         if isinstance(self.bsp_version, tuple):
@@ -62,6 +121,34 @@ class Bsp:
         version = f"({self.file_magic.decode('ascii', 'ignore')} version {version_number})"
         return f"<{self.__class__.__name__} '{self.filename}' {branch_script} {version}>"
 
+    def _set_source(self, filename: Union[str, BspSource], default: str = "untitled.bsp") -> str:
+        """Keeps an in-memory .bsp as self._source; returns the filename to use"""
+        if isinstance(filename, str):
+            self._source = None
+            return filename
+        self._source = buffered(filename)
+        return source_name(self._source, default)
+
+    def _find_associated_files(self) -> List[str]:
+        """files in self.folder with names starting with self.filename (minus extension)"""
+        if self._source is not None:
+            return list()  # not on disk, so no neighbours
+        local_files = os.listdir(self.folder)
+        def is_related(f): return f.startswith(os.path.splitext(self.filename)[0])
+        return [f for f in local_files if is_related(f)]
+
+    def _open(self):
+        """Opens self.file & self._lump_file (a memory map of self.file if self.mmap)"""
+        if self._source is None:
+            self.file = profiling.open_file(os.path.join(self.folder, self.filename))
+        else:
+            self._source.seek(0)
+            self.file = profiling.CountingFile(self._source) if profiling.enabled else self._source
+        if isinstance(self._source, lumps.BufferFile):  # already in memory; lumps are always views
+            self._lump_file = self._source.view
+        else:
+            self._lump_file = lumps.memory_map(self.file) if self.mmap else self.file
+
     def _read_header(self, LUMP: enum.Enum) -> LumpHeader:
         """Reads bytes of lump"""
         self.file.seek(self.branch.lump_header_address[LUMP])
@@ -74,11 +161,9 @@ class Bsp:
 
     def _preload(self):
         """Loads filename using the format outlined in this .bsp's branch defintion script"""
-        local_files = os.listdir(self.folder)
-        def is_related(f): return f.startswith(os.path.splitext(self.filename)[0])
-        self.associated_files = [f for f in local_files if is_related(f)]
+        self.associated_files = self._find_associated_files()
         # open .bsp
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self._open()
         file_magic = self.file.read(4)
         assert file_magic == self.file_magic, f"{self.file} is not a valid .bsp!"
         self.bsp_version = int.from_bytes(self.file.read(4), "little")
@@ -89,6 +174,8 @@ class Bsp:
 
         self.headers = dict()
         self.loading_errors: Dict[str, Exception] = dict()
+        self.load_stats: Dict[str, profiling.LoadStats] = dict()
+        self._loadable_lumps = dict()
         for LUMP_enum in self.branch.LUMP:
             # CHECK: is lump external? (are associated_files overriding)
             lump_header = self._read_header(LUMP_enum)
@@ -96,32 +183,108 @@ class Bsp:
             self.headers[LUMP_NAME] = lump_header
             if lump_header.length == 0:
                 continue
-            try:
-                if LUMP_NAME == "GAME_LUMP":
-                    # NOTE: lump_header.version is ignored in this case
-                    GameLumpClasses = getattr(self.branch, "GAME_LUMP_CLASSES", dict())
-                    BspLump = lumps.GameLump(self.file, lump_header, GameLumpClasses, self.branch.GAME_LUMP_HEADER)
-                elif LUMP_NAME in self.branch.LUMP_CLASSES:
-                    LumpClass = self.branch.LUMP_CLASSES[LUMP_NAME][lump_header.version]
-                    BspLump = lumps.create_BspLump(self.file, lump_header, LumpClass)
-                elif LUMP_NAME in self.branch.SPECIAL_LUMP_CLASSES:
-                    SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_NAME][lump_header.version]
-                    decompressed_file, decompressed_header = lumps.decompressed(self.file, lump_header)
-                    decompressed_file.seek(decompressed_header.offset)
-                    lump_data = decompressed_file.read(decompressed_header.length)
-                    BspLump = SpecialLumpClass(lump_data)
-                elif LUMP_NAME in self.branch.BASIC_LUMP_CLASSES:
-                    LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_NAME][lump_header.version]
-                    BspLump = lumps.create_BasicBspLump(self.file, lump_header, LumpClass)
+            self._loadable_lumps[LUMP_NAME] = lump_header
+        if not self.lazy:
+            self._load_lumps()
+
+    def _load_lump(self, LUMP_NAME: str, lump_header: LumpHeader) -> Any:
+        """Creates the object for a lump; any errors are noted in self.loading_errors"""
+        lump_file = self._lump_file
+        if LUMP_NAME in self._decompressed:  # decompressed ahead of time by _load_lumps
+            lump_file, lump_header = self._decompressed.pop(LUMP_NAME)
+        try:
+            if LUMP_NAME == "GAME_LUMP":
+                # NOTE: lump_header.version is ignored in this case
+                GameLumpClasses = getattr(self.branch, "GAME_LUMP_CLASSES", dict())
+                BspLump = lumps.GameLump(self._lump_file, lump_header, GameLumpClasses, self.branch.GAME_LUMP_HEADER,
+                                         self.workers)
+            elif LUMP_NAME in self.branch.LUMP_CLASSES:
+                LumpClass = self.branch.LUMP_CLASSES[LUMP_NAME][lump_header.version]
+                BspLump = lumps.create_BspLump(lump_file, lump_header, LumpClass)
+            elif LUMP_NAME in self.branch.SPECIAL_LUMP_CLASSES:
+                SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_NAME][lump_header.version]
+                decompressed_file, decompressed_header = lumps.decompressed(lump_file, lump_header)
+                lump_data = lumps.RawBspLump(decompressed_file, decompressed_header).as_bytes()
+                BspLump = SpecialLumpClass(lump_data)
+            elif LUMP_NAME in self.branch.BASIC_LUMP_CLASSES:
+                LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_NAME][lump_header.version]
+                BspLump = lumps.create_BasicBspLump(lump_file, lump_header, LumpClass)
+            else:
+                BspLump = lumps.create_RawBspLump(lump_file, lump_header)
+        except KeyError:  # lump VERSION not supported
+            self.loading_errors[LUMP_NAME] = KeyError(f"{LUMP_NAME} v{lump_header.version} is not supported")
+            BspLump = lumps.create_RawBspLump(lump_file, lump_header)
+        except Exception as exc:
+            self.loading_errors[LUMP_NAME] = exc
+            BspLump = lumps.create_RawBspLump(lump_file, lump_header)
+        return BspLump
+
+    def _load_lumps(self):
+        """Loads every lump which isn't loaded yet"""
+        if self.workers != 1:  # decompress all compressed lumps at once
+            not_loaded = {n: h for n, h in self._loadable_lumps.items() if n not in self.__dict__ and n != "GAME_LUMP"}
+            load_stats = self.load_stats if profiling.enabled else None
+            self._decompressed = lumps.decompressed_all(self._lump_file, not_loaded, self.workers, load_stats)
+        for LUMP_NAME in self._loadable_lumps:
+            getattr(self, LUMP_NAME)  # see __getattr__
+
+    def unload(self, lump_name: str):
+        """Frees a loaded lump; it will be loaded from file again on next access"""
+        # NOTE: any changes made to the lump are lost!
+        if lump_name not in self.__dict__.get("_loadable_lumps", dict()):
+            raise RuntimeError(f"{lump_name} cannot be reloaded from file")
+        self.__dict__.pop(lump_name, None)
+        self.loading_errors.pop(lump_name, None)
+
+    def _unchanged_lumps(self) -> Dict[str, LumpHeader]:
+        """Lumps which can be copied straight from the loaded file when saving"""
+        # NOTE: SpecialLumpClasses & GameLumps don't track changes; once accessed they are re-encoded
+        # -- & compared against the loaded file, so they are only rewritten if their bytes have changed
+        out = dict()
+        # ^ {"LUMP_NAME": LumpHeader}
+        for LUMP_NAME, lump_header in self.__dict__.get("_loadable_lumps", dict()).items():
+            if LUMP_NAME in self.__dict__:  # loaded
+                lump = self.__dict__[LUMP_NAME]
+                fourCC = getattr(lump_header, "fourCC", 0)
+                if not isinstance(lump, lumps.RawBspLump):  # SpecialLumpClass, GameLump or list
+                    if not self._encodes_as_loaded(lump, lump_header):
+                        continue
                 else:
-                    BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            except KeyError:  # lump VERSION not supported
-                self.loading_errors[LUMP_NAME] = KeyError(f"{LUMP_NAME} v{lump_header.version} is not supported")
-                BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            except Exception as exc:
-                self.loading_errors[LUMP_NAME] = exc
-                BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            setattr(self, LUMP_NAME, BspLump)
+                    if fourCC == 0:  # NOTE: compressed lumps read from a decompressed copy of the lump
+                        if lump.file is not self._lump_file or lump.offset != lump_header.offset:
+                            continue  # replaced w/ a lump from elsewhere
+                    if not lumps.is_unchanged(lump, fourCC if fourCC != 0 else lump_header.length):
+                        continue
+            out[LUMP_NAME] = lump_header
+        return out
+
+    def _encodes_as_loaded(self, lump: Any, lump_header: LumpHeader) -> bool:
+        """lump.as_bytes() is identical to the lump in the loaded file"""
+        try:
+            if isinstance(lump, lumps.GameLump):  # NOTE: child lump offsets are relative to the file
+                raw_lump = lump.as_bytes(lump_header.offset)
+            else:
+                raw_lump = lump.as_bytes()
+        except Exception:  # e.g. replaced w/ a list; can't tell if it has changed
+            return False
+        loaded = lumps.create_RawBspLump(self._lump_file, lump_header)  # decompressed, if compressed
+        return len(loaded) == len(raw_lump) and loaded.as_bytes() == raw_lump
+
+    def _is_source(self, filename: str) -> bool:
+        """filename is the file on disk this .bsp was loaded from (and still reads lumps from)"""
+        source_filename = getattr(self.__dict__.get("file"), "name", None)
+        if not isinstance(source_filename, str):  # never loaded, or loaded from memory (see BspSource)
+            return False
+        elif not (os.path.exists(filename) and os.path.exists(source_filename)):  # e.g. an archive member's name
+            return False
+        return os.path.samefile(filename, source_filename)
+
+    def _reload(self):
+        """Reads the .bsp from disk again, discarding all loaded lumps (& any changes to them)"""
+        self.file.close()
+        for LUMP in self.branch.LUMP:
+            self.__dict__.pop(LUMP.name, None)
+        self._preload()
 
     def save_as(self, filename: str):
         """Expects outfile to be a file with write bytes capability"""
@@ -162,6 +325,8 @@ class Bsp:
         if not hasattr(self, lump_name):
             return b""  # lump is empty / deleted
         lump_entries = getattr(self, lump_name)
+        if isinstance(lump_entries, lumps.RawBspLump):  # RawBspLump, BasicBspLump or BspLump
+            return lump_entries.as_bytes()  # one read per piece, with changes packed over the top
         lump_version = self.headers[lump_name].version
         all_lump_classes = {**self.branch.BASIC_LUMP_CLASSES,
                             **self.branch.LUMP_CLASSES,
@@ -179,6 +344,6 @@ class Bsp:
             raw_lump = lump_entries.as_bytes()
         elif lump_name == "GAME_LUMP":
             raw_lump = lump_entries.as_bytes()
-        else:  # assume lump_entries is RawBspLump
+        else:
             raw_lump = bytes(lump_entries)
         return raw_lump
@@ -0,0 +1,170 @@
+"""Load many .bsps in parallel, across multiple processes
+
+from bsp_tool import batch
+for result in batch.Batch(batch.find_maps(maplist.installed_games), callback):
+    ...  # results arrive as each map finishes"""
+from __future__ import annotations
+import collections
+import concurrent.futures
+import fnmatch
+import importlib
+import os
+import signal
+import time
+import traceback
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Union
+import warnings
+
+from . import base
+from . import load_bsp
+
+try:
+    import resource  # unix only
+except ImportError:
+    resource = None
+
+
+MapResult = collections.namedtuple("MapResult", ["filename", "result", "error", "duration"])
+# result: callback(bsp) (None if an error occured)
+# error: formatted traceback, or None
+# duration: seconds spent in the worker process
+
+DirList = Dict[Union[str, Tuple[str, str]], List[str]]
+# ^ {"Game": ["maps_dir"]} (relative to root) or {("SteamFolder", "Game"): ["maps_dir"]}
+
+
+def find_maps(dirs: Union[DirList, Iterable[str]], root: str = ".", pattern: str = "*[Bb][Ss][Pp]") -> List[str]:
+    """List every .bsp in a maplist DirList / installed_games; lists of paths are returned as-is"""
+    # NOTE: "*[Bb][Ss][Pp]" matches .bsp, .BSP & CoD2 .d3dbsp
+    if not isinstance(dirs, dict):
+        return list(dirs)
+    filenames = list()
+    for game, map_dirs in dirs.items():
+        game_dir = os.path.join(*game) if isinstance(game, tuple) else os.path.join(root, game)
+        for map_dir in map_dirs:
+            full_path = os.path.join(game_dir, map_dir)
+            if not os.path.isdir(full_path):
+                continue
+            for filename in sorted(fnmatch.filter(os.listdir(full_path), pattern)):
+                filenames.append(os.path.join(full_path, filename))
+    return filenames
+
+
+def loading_errors(bsp: base.Bsp) -> Dict[str, str]:
+    """Default callback; {"LUMP_NAME": "error"} for each lump which failed to load"""
+    errors = {**bsp.loading_errors}
+    game_lump = getattr(bsp, "GAME_LUMP", None)
+    for child_name in getattr(game_lump, "headers", dict()):
+        getattr(game_lump, child_name)  # child lumps are loaded on first access
+    errors.update(getattr(game_lump, "loading_errors", dict()))
+    return {lump_name: repr(exc) for lump_name, exc in errors.items()}
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("map took too long to process")
+
+
+def _process_map(filename: str, callback: Callable[[base.Bsp], Any], branch_script: str,
+                 load_kwargs: Dict[str, Any], timeout: float, memory_limit: int) -> (Any, str, float):
+    """Runs in a worker process; returns (result, error, duration)"""
+    start = time.perf_counter()
+    if memory_limit is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+    if timeout is not None:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    result, error, bsp = None, None, None
+    try:
+        branch = importlib.import_module(branch_script) if branch_script is not None else None
+        bsp = load_bsp(filename, branch, **load_kwargs)
+        result = callback(bsp)
+    except BaseException:  # MemoryError, TimeoutError & anything the callback raises
+        error = traceback.format_exc()
+    finally:
+        if timeout is not None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        if bsp is not None and hasattr(bsp, "file"):
+            bsp.file.close()  # avoid OSError "Too many open files"
+        del bsp
+        if memory_limit is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+    return result, error, time.perf_counter() - start
+
+
+class Batch:
+    """Iterates over MapResults as each map finishes; errors are collected, not raised"""
+    callback: Callable[[base.Bsp], Any]  # must be picklable (defined at module level)
+    errors: Dict[str, str]
+    # ^ {"filename": "traceback"}
+    filenames: List[str]
+    max_pending: int  # maximum number of maps queued / in progress at any time
+    memory_limit: int  # bytes of address space per worker (unix only)
+    results: Dict[str, Any]
+    # ^ {"filename": callback(bsp)}
+    timeout: float  # seconds per map, including load_bsp (unix only)
+    workers: int
+
+    def __init__(self, maps: Union[DirList, Iterable[str]], callback: Callable[[base.Bsp], Any] = loading_errors,
+                 workers: int = None, max_pending: int = None, timeout: float = None, memory_limit: int = None,
+                 branch_script: ModuleType = None, **load_kwargs):
+        self.filenames = find_maps(maps)
+        self.callback = callback
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.max_pending = max_pending if max_pending is not None else self.workers * 2
+        if timeout is not None and not hasattr(signal, "SIGALRM"):
+            warnings.warn(UserWarning("timeout is not supported on this platform & will be ignored"))
+            timeout = None
+        if memory_limit is not None and resource is None:
+            warnings.warn(UserWarning("memory_limit is not supported on this platform & will be ignored"))
+            memory_limit = None
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.branch_script = branch_script
+        self.load_kwargs = load_kwargs  # mmap / lazy / workers
+        self.errors = dict()
+        self.results = dict()
+
+    def __repr__(self):
+        return f"<Batch of {len(self.filenames)} maps ({self.workers} workers)>"
+
+    def __iter__(self) -> Iterator[MapResult]:
+        branch_script = self.branch_script.__name__ if self.branch_script is not None else None
+        args = (self.callback, branch_script, self.load_kwargs, self.timeout, self.memory_limit)
+        queue = iter(self.filenames)
+        with concurrent.futures.ProcessPoolExecutor(self.workers) as executor:
+            pending = dict()
+            # ^ {Future: "filename"}
+            for filename in queue:
+                pending[executor.submit(_process_map, filename, *args)] = filename
+                if len(pending) >= self.max_pending:
+                    break
+            while len(pending) > 0:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    filename = pending.pop(future)
+                    try:
+                        result, error, duration = future.result()
+                    except Exception:  # worker died (e.g. BrokenProcessPool)
+                        result, error, duration = None, traceback.format_exc(), None
+                    if error is None:
+                        self.results[filename] = result
+                    else:
+                        self.errors[filename] = error
+                    yield MapResult(filename, result, error, duration)
+                for filename in queue:  # top up the queue
+                    pending[executor.submit(_process_map, filename, *args)] = filename
+                    if len(pending) >= self.max_pending:
+                        break
+
+    def run(self) -> Dict[str, Any]:
+        """Process every map; returns {"filename": callback(bsp)} for maps which didn't fail"""
+        for result in self:
+            pass
+        return self.results
+
+    def report(self) -> str:
+        """Summary of errors"""
+        failed = f"{len(self.errors)} out of {len(self.filenames)} .bsps failed"
+        return "\n".join([failed, *[f"{filename}:\n{error}" for filename, error in self.errors.items()]])
@@ -1,6 +1,7 @@
 """Base classes for defining .bsp lump structs"""
 from __future__ import annotations
 import io
+import keyword
 import re
 import struct
 from typing import Any, Dict, Iterable, List, Union
@@ -28,9 +29,14 @@ class Struct:
     _format: str = str()  # struct module format string
     _arrays: Dict[str, Any] = dict()  # slots to be mapped into MappedArrays
     # each value in _arrays is a mapping to generate a MappedArray from
+    _struct: struct.Struct = None  # compiled _format; set for each subclass
     # TODO: _child_subclasses: dict[str, Any]
     # e.g. {"plane.normal": vector.Vec3}
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        specialise(cls, Struct)
+
     def __init__(self, *args, **kwargs):
         # LumpClass(attr1, [attr2_1, attr2_2])
         # LumpClass(attr1, attr2=[attr2_1, attr2_2])
@@ -114,7 +120,7 @@ class Struct:
             value = getattr(self, slot)
             if isinstance(value, MappedArray):
                 _tuple.extend(value.flat())
-            elif isinstance(value, Iterable):
+            elif isinstance(value, Iterable) and not isinstance(value, (str, bytes)):
                 _tuple.extend(value)
             else:
                 _tuple.append(value)
@@ -169,6 +175,11 @@ class Struct:
     def as_bytes(self) -> bytes:
         return struct.pack(self._format, *self.flat())
 
+    @classmethod
+    def numpy_dtype(cls):  # -> numpy.dtype
+        """numpy structured dtype equivalent of _format, with fields named after __slots__ & _arrays"""
+        return numpy_dtype({slot: cls._arrays.get(slot) for slot in cls.__slots__}, cls._format)
+
     @classmethod
     def as_cpp(self) -> str:  # C++ struct definition
         # TODO: move py_struct_as_cpp here, or import & map
@@ -201,9 +212,14 @@ class MappedArray:
     # _mapping cane be either a list of attr names to map a given array to,
     # or, a dict containing a list of attr names, or another dict
     # this second form is difficult to express as a type hint
+    _struct: struct.Struct = None  # compiled _format; set for each subclass
 
     # TODO: test subclass definitions (MappedArray, vector.Vec3)
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        specialise(cls, MappedArray)
+
     def __init__(self, *args, _mapping: Any = None, _format: str = None, **kwargs):
         if _format is None:
             _format = self._format
@@ -274,6 +290,8 @@ class MappedArray:
             value = getattr(self, attr)
             if isinstance(value, MappedArray):
                 array.extend(value.flat())  # recursive call
+            elif isinstance(value, list):  # {"attr": int} child mapping
+                array.extend(value)
             else:
                 array.append(value)
         return array
@@ -346,6 +364,15 @@ class MappedArray:
     def as_bytes(self) -> bytes:
         return struct.pack(self._format, *self.flat())
 
+    @classmethod
+    def numpy_dtype(cls, _mapping: Any = None, _format: str = None):  # -> numpy.dtype
+        """numpy structured dtype equivalent of _format, with fields named after _mapping"""
+        if _format is None:
+            _format = cls._format
+        if _mapping is None:
+            _mapping = cls._mapping
+        return numpy_dtype(_mapping, _format)
+
     @classmethod
     def as_cpp(cls, _mapping: Any = None, _format: str = None) -> str:  # C++ struct definition
         if _format is None:
@@ -388,6 +415,161 @@ def split_format(_format: str) -> List[str]:
     return out
 
 
+# specialised methods
+# -- the generic from_tuple, flat & as_bytes methods re-parse _format & _arrays for every instance
+# -- so each subclass gets its own versions, generated once from it's definition
+# NOTE: subclasses which override __init__ or from_tuple keep the generic methods
+def specialise(cls: Union[Struct, MappedArray], base_class: Union[Struct, MappedArray]):
+    """generate & attach from_tuple, flat & as_bytes methods to a subclass of base_class"""
+    generated = dict()
+    cls._struct = None
+    try:
+        cls._struct = struct.Struct(cls._format)
+        if base_class is Struct:
+            mapping = {slot: cls._arrays.get(slot) for slot in cls.__slots__}
+        else:
+            mapping = cls._mapping
+            if isinstance(mapping, list):
+                mapping = {attr: None for attr in mapping}
+        overridden = {name for name in ("__init__", "from_tuple", "flat", "as_bytes")
+                      if _overrides(cls, base_class, name)}
+        if {"from_tuple", "flat", "as_bytes"}.issubset(overridden):
+            return  # nothing to generate; don't parse _format
+        types = split_format(cls._format)
+        if not isinstance(mapping, dict) or mapping_length(mapping) != len(types):
+            raise RuntimeError(f"{cls.__name__} mapping does not match _format")
+        if "__init__" not in overridden and "from_tuple" not in overridden:
+            generated["from_tuple"] = _generate_from_tuple(cls, base_class, mapping, types)
+        if "flat" not in overridden:
+            generated["flat"] = _generate_flat(cls, base_class, mapping)
+        if "as_bytes" not in overridden:
+            generated["as_bytes"] = _generate_as_bytes(cls, base_class)
+    except Exception:  # bad definition; leave it for the generic methods to complain about
+        generated = dict()
+    finally:
+        for name in ("from_tuple", "flat", "as_bytes"):
+            if name in generated:
+                setattr(cls, name, generated[name])
+            elif getattr(getattr(cls, name), "_generated", False):  # don't inherit a parent's methods
+                setattr(cls, name, base_class.__dict__[name])
+
+
+def _overrides(cls: Any, base_class: Any, name: str) -> bool:
+    """does cls (or a parent between cls & base_class) define it's own (not generated) method"""
+    for parent in cls.__mro__:
+        if parent is base_class:
+            return False
+        method = parent.__dict__.get(name, None)
+        if method is not None and not getattr(getattr(method, "__func__", method), "_generated", False):
+            return True
+    return False
+
+
+def _compile(cls: Any, name: str, lines: List[str], namespace: Dict[str, Any]):
+    """exec generated source & mark the resulting function as generated"""
+    code = compile("\n".join(lines), f"<{cls.__module__}.{cls.__name__}.{name}>", "exec")
+    exec(code, namespace)
+    function = namespace[name]
+    function._generated = True
+    function.__qualname__ = f"{cls.__qualname__}.{name}"
+    return function
+
+
+def _attr(name: Any) -> str:
+    if not isinstance(name, str) or not name.isidentifier() or keyword.iskeyword(name):
+        raise RuntimeError(f"cannot generate code for attribute {name!r}")
+    return name
+
+
+def _from_tuple_lines(target: str, mapping: Dict[str, Any], types: List[str], start: int,
+                      namespace: Dict[str, Any], lines: List[str], nested: bool) -> int:
+    """lines setting the attrs of target from _tuple[start:]; returns number of values consumed"""
+    # NOTE: matches Struct.from_tuple & MappedArray.from_tuple exactly
+    # -- Struct int arrays are slices of _tuple, MappedArray int arrays are lists
+    index = start
+    for attr, child_mapping in mapping.items():
+        attr = _attr(attr)
+        if child_mapping is None:
+            lines.append(f"    {target}.{attr} = _tuple[{index}]")
+            index += 1
+        elif isinstance(child_mapping, int):
+            value = f"_tuple[{index}:{index + child_mapping}]"
+            lines.append(f"    {target}.{attr} = {f'list({value})' if nested else value}")
+            index += child_mapping
+        elif isinstance(child_mapping, (list, dict)):
+            child = f"_{len(namespace)}"
+            namespace[f"{child}_mapping"] = child_mapping
+            length = mapping_length({None: child_mapping})
+            lines.append(f"    {child} = _new(_MappedArray)")
+            lines.append(f"    {child}._format = {''.join(types[index:index + length])!r}")
+            lines.append(f"    {child}._mapping = {child}_mapping")
+            if isinstance(child_mapping, list):
+                child_mapping = {a: None for a in child_mapping}
+            _from_tuple_lines(child, child_mapping, types, index, namespace, lines, nested=True)
+            lines.append(f"    {target}.{attr} = {child}")
+            index += length
+        else:
+            raise RuntimeError(f"Unexpected mapping: {type(child_mapping)}")
+    return index - start
+
+
+def _generate_from_tuple(cls: Any, base_class: Any, mapping: Dict[str, Any], types: List[str]):
+    namespace = {"_new": object.__new__, "_MappedArray": MappedArray,
+                 "_generic": base_class.__dict__["from_tuple"].__func__,
+                 "_cls_format": cls._format, "_cls_mapping": cls._mapping if base_class is MappedArray else None}
+    if base_class is Struct:
+        lines = ["def from_tuple(cls, _tuple):",
+                 "    out = _new(cls)"]
+    else:
+        lines = ["def from_tuple(cls, _tuple, _mapping=None, _format=None):",
+                 "    if _mapping is not None or _format is not None:",
+                 "        return _generic(cls, _tuple, _mapping, _format)",
+                 "    out = _new(cls)",
+                 "    out._format = _cls_format",
+                 "    out._mapping = _cls_mapping"]
+    _from_tuple_lines("out", mapping, types, 0, namespace, lines, nested=base_class is MappedArray)
+    lines.append("    return out")
+    return classmethod(_compile(cls, "from_tuple", lines, namespace))
+
+
+def _generate_flat(cls: Any, base_class: Any, mapping: Dict[str, Any]):
+    # NOTE: values which aren't the expected type are flattened the same way as the generic flat methods
+    namespace = {"_MappedArray": MappedArray, "_generic": base_class.__dict__["flat"],
+                 "_cls_mapping": cls._mapping if base_class is MappedArray else None}
+    values = list()
+    for attr, child_mapping in mapping.items():
+        attr = _attr(attr)
+        value = f"self.{attr}"
+        if child_mapping is None:
+            values.append(value)
+        elif isinstance(child_mapping, int):
+            values.append(f"*{value}")
+        elif base_class is Struct:
+            values.append(f"*({value}.flat() if isinstance({value}, _MappedArray) else {value})")
+        else:  # MappedArray.flat only flattens child MappedArrays & lists
+            flat = f"{value} if isinstance({value}, list) else ({value},)"
+            values.append(f"*({value}.flat() if isinstance({value}, _MappedArray) else {flat})")
+    lines = ["def flat(self):"]
+    if base_class is MappedArray:
+        lines.extend(["    if self._mapping is not _cls_mapping:",
+                      "        return _generic(self)"])
+    lines.append(f"    return [{', '.join(values)}]")
+    function = _compile(cls, "flat", lines, namespace)
+    function.__doc__ = base_class.__dict__["flat"].__doc__
+    return function
+
+
+def _generate_as_bytes(cls: Any, base_class: Any):
+    namespace = {"_pack": cls._struct.pack, "_generic": base_class.__dict__["as_bytes"],
+                 "_cls_format": cls._format}
+    lines = ["def as_bytes(self):"]
+    if base_class is MappedArray:
+        lines.extend(["    if self._format is not _cls_format:",
+                      "        return _generic(self)"])
+    lines.append("    return _pack(*self.flat())")
+    return _compile(cls, "as_bytes", lines, namespace)
+
+
 type_LUT = {"c": "char",  "?": "bool",
             "b": "char",  "B": "unsigned char",
             "h": "short", "H": "unsigned short",
@@ -404,3 +586,55 @@ type_defaults = {"c": b"", "?": False,
                  "i": 0, "I": 0,
                  "f": 0.0, "g": 0.0,
                  "s": ""}
+
+
+def numpy_dtype(mapping: Union[List[str], Dict[str, Any], int, None], _format: str):  # -> numpy.dtype
+    """numpy dtype with the same memory layout as _format, using names from a Struct / MappedArray mapping"""
+    # NOTE: a mapping of None gives a scalar dtype (e.g. for BasicBspLump LumpClasses)
+    import numpy  # requires: pip install numpy
+    byte_order = _format[0] if _format[:1] in ("@", "=", "<", ">", "!") else "@"
+    types = split_format(_format)
+    sizes = [struct.calcsize(f"{byte_order}{t}") for t in types]
+    # NOTE: @ (native) byte order aligns each member, calcsize tells us where
+    offsets = [struct.calcsize(f"{byte_order}{''.join(types[:i + 1])}") - size for i, size in enumerate(sizes)]
+    endianness = {"@": "=", "=": "=", "<": "<", ">": ">", "!": ">"}[byte_order]
+
+    def scalar(index: int):  # -> numpy.dtype
+        type_char = types[index][-1]
+        if type_char in "cs":
+            return numpy.dtype(f"S{sizes[index]}")
+        elif type_char == "?":
+            return numpy.dtype("?")
+        kind = "u" if type_char in "BHILQN" else ("f" if type_char in "efd" else "i")
+        return numpy.dtype(f"{endianness}{kind}{sizes[index]}")
+
+    def build(child_mapping: Any, start: int):  # -> (numpy.dtype, int)
+        """returns dtype & number of types consumed"""
+        if child_mapping is None:
+            return scalar(start), 1
+        elif isinstance(child_mapping, int):
+            names, children = [str(i) for i in range(child_mapping)], [None] * child_mapping
+        elif isinstance(child_mapping, list):
+            names, children = child_mapping, [None] * len(child_mapping)
+        elif isinstance(child_mapping, dict):
+            names, children = [str(k) for k in child_mapping], list(child_mapping.values())
+        else:
+            raise RuntimeError(f"Unexpected mapping: {type(child_mapping)}")
+        formats, field_offsets, length = list(), list(), 0
+        for child in children:
+            child_dtype, child_length = build(child, start + length)
+            formats.append(child_dtype)
+            field_offsets.append(offsets[start + length] - offsets[start])
+            length += child_length
+        end = start + length - 1
+        itemsize = offsets[end] + sizes[end] - offsets[start]
+        indexed = isinstance(child_mapping, int) or all(isinstance(k, int) for k in child_mapping)
+        packed = all(o == i * formats[0].itemsize for i, o in enumerate(field_offsets))
+        if indexed and packed and all(f == formats[0] for f in formats):
+            return numpy.dtype((formats[0], (len(formats),))), length  # subarray
+        dtype = numpy.dtype({"names": names, "formats": formats, "offsets": field_offsets, "itemsize": itemsize})
+        return dtype, length
+
+    dtype, length = build(mapping, 0)
+    assert length == len(types), "Invalid mapping for format!"
+    return dtype
@@ -120,6 +120,10 @@ class Edge(list):  # LUMP 12
     def from_tuple(cls, _tuple):
         return cls(_tuple)
 
+    @classmethod
+    def numpy_dtype(cls):  # -> numpy.dtype
+        return base.numpy_dtype(2, cls._format)
+
 
 class Face(base.Struct):  # LUMP 7
     plane: int
@@ -133,7 +133,7 @@ class Face(base.Struct):  # LUMP 13
     normal: List[float]
     patch: List[float]  # for patches (displacement-like)
     __slots__ = ["texture", "effect", "surface_type", "first_vertex", "num_vertices",
-                 "first_mesh_vertex", "num_mesh_vertices", "lightmap", "normal", "size"]
+                 "first_mesh_vertex", "num_mesh_vertices", "lightmap", "normal", "patch"]
     _format = "12i12f2i"
     _arrays = {"lightmap": {"index": None, "top_left": [*"xy"], "size": ["width", "height"],
                             "origin": [*"xyz"], "vector": {"s": [*"xyz"], "t": [*"xyz"]}},
@@ -245,7 +245,7 @@ class Visibility:  # same as Quake / QuakeII?
 
     def as_bytes(self):
         vectors_bytes = f"{self.vector_count * self.vector_size}B"
-        return struct.pack(f"2i{vectors_bytes}", (self.vector_count, self.vector_size, *self.vectors))
+        return struct.pack(f"2i{vectors_bytes}", self.vector_count, self.vector_size, *self.vectors)
 
 
 BASIC_LUMP_CLASSES = {"LEAF_BRUSHES":  shared.Ints,
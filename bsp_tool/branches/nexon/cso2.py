@@ -98,6 +98,12 @@ def read_lump_header(file, LUMP: enum.Enum) -> CSO2LumpHeader:
     fourCC = int.from_bytes(file.read(4), "big")  # fourCC is big endian for some reason
     header = CSO2LumpHeader(offset, length, version, bool(compressed), fourCC)
     return header
+
+
+def write_lump_header(file, LUMP: enum.Enum, header: CSO2LumpHeader):
+    file.seek(lump_header_address[LUMP])
+    file.write(struct.pack("2I2H", header.offset, header.length, header.version, header.compressed))
+    file.write(header.fourCC.to_bytes(4, "big"))
 # NOTE: lump header formats could easily be a:  LumpClass(base.Struct)
 
 
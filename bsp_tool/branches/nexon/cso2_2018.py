@@ -20,6 +20,7 @@ LUMP = cso2.LUMP
 lump_header_address = {LUMP_ID: (8 + i * 16) for i, LUMP_ID in enumerate(LUMP)}
 
 read_lump_header = cso2.read_lump_header
+write_lump_header = cso2.write_lump_header
 
 
 # classes for each lump, in alphabetical order:
@@ -89,7 +89,7 @@ class LUMP(enum.Enum):
 
 
 # struct VindictusBspHeader { char file_magic[4]; int version; VindictusLumpHeader headers[64]; int revision; };
-lump_header_address = {LUMP_ID: (8 + i * 16) for i, LUMP_ID in enumerate(LUMP)}
+lump_header_address = {LUMP_ID: (8 + i * 20) for i, LUMP_ID in enumerate(LUMP)}
 
 VindictusLumpHeader = collections.namedtuple("VindictusLumpHeader", ["id", "flags", "version", "offset", "length"])
 
@@ -101,6 +101,13 @@ def read_lump_header(file, LUMP_ID: enum.Enum) -> VindictusLumpHeader:
     return header
 
 
+def write_lump_header(file, LUMP_ID: enum.Enum, header: VindictusLumpHeader):
+    if not isinstance(header, VindictusLumpHeader):  # new .bsps use base.LumpHeader
+        header = VindictusLumpHeader(LUMP_ID.value, 0, header.version, header.offset, header.length)
+    file.seek(lump_header_address[LUMP_ID])
+    file.write(struct.pack("5i", *header))
+
+
 # class for each lump in alphabetical order: [10 / 64] + orange_box.LUMP_CLASSES
 class Area(base.Struct):  # LUMP 20
     num_area_portals: int  # number or AreaPortals after first_area_portal in this Area
@@ -261,7 +268,11 @@ class GameLumpHeader(base.MappedArray):
     _format = "4s4i"
 
 
-class GameLump_SPRP:
+class GameLump_SPRP(shared.GameLump_SPRP):
+    model_names: List[str]
+    leaves: List[int]
+    scales: List[object]  # List[StaticPropScale]
+
     def __init__(self, raw_sprp_lump: bytes, StaticPropClass: object):
         """Get StaticPropClass from GameLump version"""
         # lambda raw_lump: GameLump_SPRP(raw_lump, StaticPropvXX)
@@ -275,34 +286,22 @@ class GameLump_SPRP:
         scale_count = int.from_bytes(sprp_lump.read(4), "little")
         read_size = struct.calcsize(StaticPropScale._format) * scale_count
         scales = struct.iter_unpack(StaticPropScale._format, sprp_lump.read(read_size))
-        setattr(self, "scales", list(scales))
+        setattr(self, "scales", list(map(StaticPropScale.from_tuple, scales)))
         prop_count = int.from_bytes(sprp_lump.read(4), "little")
-        if StaticPropClass is not None:
-            read_size = struct.calcsize(StaticPropClass._format) * prop_count
-            props = struct.iter_unpack(StaticPropClass._format, sprp_lump.read(read_size))
-            setattr(self, "props", list(map(StaticPropClass.from_tuple, props)))
-        else:
-            prop_bytes = sprp_lump.read()
-            prop_size = len(prop_bytes) // prop_count
-            # NOTE: will break if prop_size does not divide evenly by prop_count
-            setattr(self, "props", list(struct.iter_unpack(f"{prop_size}s", prop_bytes)))
+        self._read_props(sprp_lump, prop_count, StaticPropClass)
         here = sprp_lump.tell()
         end = sprp_lump.seek(0, 2)
         assert here == end, "Had some leftover bytes, bad format"
 
     def as_bytes(self) -> bytes:
-        if len(self.props) > 0:
-            prop_format = self.props[0]._format
-        else:
-            prop_format = ""
         return b"".join([int.to_bytes(len(self.model_names), 4, "little"),
-                         *[struct.pack("128s", n) for n in self.model_names],
+                         *[struct.pack("128s", n.encode("ascii")) for n in self.model_names],
                          int.to_bytes(len(self.leaves), 4, "little"),
                          *[struct.pack("H", L) for L in self.leaves],
                          int.to_bytes(len(self.scales), 4, "little"),
-                         *[struct.pack(StaticPropScale._format, s) for s in self.scales],
+                         *[struct.pack(StaticPropScale._format, *s.flat()) for s in self.scales],
                          int.to_bytes(len(self.props), 4, "little"),
-                         *[struct.pack(prop_format, *p.flat()) for p in self.props]])
+                         self._props_as_bytes()])
 
 
 class StaticPropScale(base.MappedArray):
@@ -416,46 +416,54 @@ GAME_LUMP_CLASSES = {"sprp": {bsp_version: ApexSPRP for bsp_version in (47, 48,
 
 # branch exclusive methods, in alphabetical order:
 def get_TextureData_SurfaceName(bsp, texture_data_index: int) -> str:
-    texture_data = bsp.TEXTURE_DATA[texture_data_index]
-    return bsp.SURFACE_NAMES.as_bytes()[texture_data.name_index:].lstrip(b"\0").partition(b"\0")[0].decode()
+    return bsp.material_index().texture_data_names[texture_data_index]
 
 
 def get_Mesh_SurfaceName(bsp, mesh_index: int) -> str:
     """Returns the name of the .vmt applied to bsp.MESHES[mesh_index]"""
-    mesh = bsp.MESHES[mesh_index]
-    material_sort = bsp.MATERIAL_SORT[mesh.material_sort]
-    return bsp.get_TextureData_SurfaceName(material_sort.texture_data)
+    return bsp.material_index().texture_of(mesh_index)
+
+
+def material_index(bsp, rebuild: bool = False) -> titanfall.MaterialIndex:
+    """SurfaceName -> TextureData -> MaterialSort -> Mesh lookups; built on first use"""
+    # NOTE: call with rebuild=True after editing TEXTURE_DATA, MATERIAL_SORT or MESHES
+    if rebuild or "_material_index" not in bsp.__dict__:
+        texture_data_names = [bsp.SURFACE_NAMES.at_offset(td.name_index) for td in bsp.TEXTURE_DATA[::]]
+        bsp._material_index = titanfall.MaterialIndex.from_bsp(bsp, texture_data_names)
+    return bsp._material_index
 
 
 # "debug" methods for investigating the compile process
 def debug_TextureData(bsp):
     print("# TextureData_index  TextureData.name_index  SURFACE_NAMES[name_index]  TextureData.flags")
+    texture_data_names = bsp.material_index().texture_data_names
     for i, td in enumerate(bsp.TEXTURE_DATA):
-        texture_name = bsp.get_TextureData_SurfaceName(i)
-        print(f"{i:02d} {td.name_index:03d} {texture_name:<48s} {source.Surface(td.flags)!r}")
+        print(f"{i:02d} {td.name_index:03d} {texture_data_names[i]:<48s} {source.Surface(td.flags)!r}")
 
 
 def debug_unused_SurfaceNames(bsp):
-    return set(bsp.SURFACE_NAMES).difference({bsp.get_TextureData_SurfaceName(i) for i in range(len(bsp.TEXTURE_DATA))})
+    return set(bsp.SURFACE_NAMES).difference(bsp.material_index().texture_data)
 
 
 def debug_Mesh_stats(bsp):
     print("# index  VERTEX_LUMP  texture_data_index  texture  mesh_indices_range")
+    index = bsp.material_index()
     for i, model in enumerate(bsp.MODELS):
         print(f"# MODELS[{i}]")
         for j in range(model.first_mesh, model.first_mesh + model.num_meshes):
             mesh = bsp.MESHES[j]
-            material_sort = bsp.MATERIAL_SORT[mesh.material_sort]
-            texture_name = bsp.get_TextureData_SurfaceName(material_sort.texture_data)
+            texture_data_index = index.material_sort_texture_data[mesh.material_sort]
+            texture_name = index.texture_data_names[texture_data_index]
             vertex_lump = (titanfall.Flags(mesh.flags) & titanfall.Flags.MASK_VERTEX).name
             indices = set(bsp.MESH_INDICES[mesh.first_mesh_index:mesh.first_mesh_index + mesh.num_triangles * 3])
             _min, _max = min(indices), max(indices)
             _range = f"({_min}->{_max})" if indices == {*range(_min, _max + 1)} else indices
-            print(f"{j:02d} {vertex_lump:<15s} {material_sort.texture_data:02d} {texture_name:<48s} {_range}")
+            print(f"{j:02d} {vertex_lump:<15s} {texture_data_index:02d} {texture_name:<48s} {_range}")
 
 
-methods = [titanfall.vertices_of_mesh, titanfall.vertices_of_model,
+methods = [titanfall.vertices_of_mesh, titanfall.vertices_of_model, titanfall.mesh_arrays,
            titanfall.search_all_entities, shared.worldspawn_volume,
            titanfall.shadow_meshes_as_obj,
+           titanfall.find_mesh_by_texture, titanfall.get_mesh_texture, material_index,
            get_TextureData_SurfaceName, get_Mesh_SurfaceName,
            debug_TextureData, debug_unused_SurfaceNames, debug_Mesh_stats]
@@ -1,8 +1,10 @@
 # https://developer.valvesoftware.com/wiki/Source_BSP_File_Format/Game-Specific#Titanfall
+from __future__ import annotations
+import collections
 import enum
 import io
 import struct
-from typing import Dict, List, Union
+from typing import Dict, List, Set, Union
 
 from .. import base
 from .. import shared
@@ -497,9 +499,9 @@ class VertexLitBump(base.Struct):  # LUMP 73 (0049)
     # {v[-2:] for v in mp_box.VERTEX_LIT_BUMP}}
     # {x[0] for x in _}.union({x[1] for x in _})  # all numbers
     # for "mp_box": {*range(27)} - {0, 1, 6, 17, 19, 22, 25}
-    __slots__ = ["position_index", "normal_index", "uv0", "unknown"]
+    __slots__ = ["position_index", "normal_index", "uv0", "negative_one", "uv1", "unknown"]
     _format = "2I2fi2f4i"  # 44 bytes
-    _arrays = {"uv0": [*"uv"], "unknown": 7}
+    _arrays = {"uv0": [*"uv"], "uv1": [*"uv"], "unknown": 4}
 
 
 class VertexLitFlat(base.Struct):  # LUMP 72 (0048)
@@ -548,30 +550,24 @@ class EntityPartitions(list):
         return " ".join(self).encode("ascii") + b"\0"
 
 
-class GameLump_SPRP:
+class GameLump_SPRP(shared.GameLump_SPRP):
     """unique to TitanFall"""
-    _static_prop_format: str  # StaticPropClass._format
     model_names: List[str]
     leaves: List[int]
     unknown_1: int
     unknown_2: int
-    props: List[object]  # List[StaticPropClass]
 
     def __init__(self, raw_sprp_lump: bytes, StaticPropClass: object):
-        self._static_prop_format = StaticPropClass._format
         sprp_lump = io.BytesIO(raw_sprp_lump)
         model_name_count = int.from_bytes(sprp_lump.read(4), "little")
         model_names = struct.iter_unpack("128s", sprp_lump.read(128 * model_name_count))
         setattr(self, "model_names", [t[0].replace(b"\0", b"").decode() for t in model_names])
         leaf_count = int.from_bytes(sprp_lump.read(4), "little")  # usually 0
-        leaves = list(struct.iter_unpack("H", sprp_lump.read(2 * leaf_count)))
+        leaves = [t[0] for t in struct.iter_unpack("H", sprp_lump.read(2 * leaf_count))]
         setattr(self, "leaves", leaves)
         prop_count, unknown_1, unknown_2 = struct.unpack("3i", sprp_lump.read(12))
         self.unknown_1, self.unknown_2 = unknown_1, unknown_2
-        # TODO: if StaticPropClass is None: split into appropriate groups of bytes
-        read_size = struct.calcsize(StaticPropClass._format) * prop_count
-        props = struct.iter_unpack(StaticPropClass._format, sprp_lump.read(read_size))
-        setattr(self, "props", list(map(StaticPropClass.from_tuple, props)))
+        self._read_props(sprp_lump, prop_count, StaticPropClass)
 
     def as_bytes(self) -> bytes:
         return b"".join([len(self.model_names).to_bytes(4, "little"),
@@ -579,7 +575,7 @@ class GameLump_SPRP:
                          len(self.leaves).to_bytes(4, "little"),
                          *[struct.pack("H", L) for L in self.leaves],
                          struct.pack("3I", len(self.props), self.unknown_1, self.unknown_2),
-                         *[struct.pack(self._static_prop_format, *p.flat()) for p in self.props]])
+                         self._props_as_bytes()])
 
 
 # {"LUMP_NAME": {version: LumpClass}}
@@ -652,6 +648,76 @@ GAME_LUMP_HEADER = source.GameLumpHeader
 GAME_LUMP_CLASSES = {"sprp": {12: lambda raw_lump: GameLump_SPRP(raw_lump, StaticPropv12)}}
 
 
+class MaterialIndex:
+    """Reverse lookups from texture names to TextureData, MaterialSorts & Meshes"""
+    texture_data: Dict[str, List[int]]
+    # ^ {"texture": [TextureData index]}
+    material_sorts: List[List[int]]
+    # ^ material_sorts[TextureData index] = [MaterialSort index]
+    meshes: List[List[int]]
+    # ^ meshes[MaterialSort index] = [Mesh index]
+    texture_data_names: List[str]  # texture name of each TextureData
+    material_sort_texture_data: List[int]  # MaterialSort.texture_data of each MaterialSort
+    mesh_material_sort: List[int]  # Mesh.material_sort of each Mesh
+
+    def __init__(self, texture_data_names: List[str], material_sort_texture_data: List[int],
+                 mesh_material_sort: List[int]):
+        self.texture_data_names = texture_data_names
+        self.material_sort_texture_data = material_sort_texture_data
+        self.mesh_material_sort = mesh_material_sort
+        # one pass over each lump; indices are appended in ascending order
+        self.texture_data = dict()
+        for i, name in enumerate(texture_data_names):
+            self.texture_data.setdefault(name, list()).append(i)
+        self.material_sorts = [list() for name in texture_data_names]
+        for i, texture_data_index in enumerate(material_sort_texture_data):
+            if 0 <= texture_data_index < len(self.material_sorts):
+                self.material_sorts[texture_data_index].append(i)
+        self.meshes = [list() for texture_data_index in material_sort_texture_data]
+        for i, material_sort_index in enumerate(mesh_material_sort):
+            if 0 <= material_sort_index < len(self.meshes):
+                self.meshes[material_sort_index].append(i)
+
+    def __repr__(self):
+        counts = f"{len(self.texture_data)} textures, {len(self.mesh_material_sort)} meshes"
+        return f"<{self.__class__.__name__} ({counts}) at 0x{id(self):016X}>"
+
+    @classmethod
+    def from_bsp(cls, bsp, texture_data_names: List[str]) -> MaterialIndex:
+        """texture_data_names are resolved by the caller; Titanfall & Apex store names differently"""
+        material_sort_texture_data = [ms.texture_data for ms in bsp.MATERIAL_SORT[::]]
+        mesh_material_sort = [mesh.material_sort for mesh in bsp.MESHES[::]]
+        return cls(texture_data_names, material_sort_texture_data, mesh_material_sort)
+
+    def meshes_of(self, texture: str) -> List[int]:
+        """Indices of every Mesh using texture"""
+        if texture not in self.texture_data:
+            raise ValueError(f"{texture!r} is not used by any TextureData")
+        return [mesh_index
+                for texture_data_index in self.texture_data[texture]
+                for material_sort_index in self.material_sorts[texture_data_index]
+                for mesh_index in self.meshes[material_sort_index]]
+
+    def texture_of(self, mesh_index: int) -> str:
+        """Name of the texture used by Mesh[mesh_index]"""
+        material_sort_index = self.mesh_material_sort[mesh_index]
+        return self.texture_data_names[self.material_sort_texture_data[material_sort_index]]
+
+    def unused_texture_data(self) -> Set[int]:
+        """Indices of TextureData which no Mesh uses"""
+        return {i for i, material_sorts in enumerate(self.material_sorts)
+                if not any(self.meshes[material_sort_index] for material_sort_index in material_sorts)}
+
+
+MeshArrays = collections.namedtuple("MeshArrays", ["positions", "normals", "uv0", "uv1", "colours",
+                                                   "indices", "materials"])
+# positions & normals: float32 (num_vertices, 3)
+# uv0 (albedo) & uv1 (lightmap): float32 (num_vertices, 2); uv1 is 0 for vertex lumps w/o lightmap uvs
+# colours: uint8 (num_vertices, 4); 255 for vertex lumps w/o colours
+# indices: uint32 (num_triangles * 3,); into the vertex arrays
+# materials: {"texture": slice}; the indices of triangles using each texture
+
+
 # branch exclusive methods, in alphabetical order:
 def vertices_of_mesh(bsp, mesh_index: int) -> List[VertexReservedX]:
     """gets the VertexReservedX linked to bsp.MESHES[mesh_index]"""
@@ -661,8 +727,12 @@ def vertices_of_mesh(bsp, mesh_index: int) -> List[VertexReservedX]:
     start = mesh.first_mesh_index
     finish = start + mesh.num_triangles * 3
     indices = [material_sort.vertex_offset + i for i in bsp.MESH_INDICES[start:finish]]
+    if len(indices) == 0:
+        return list()
     VERTEX_LUMP = getattr(bsp, (Flags(mesh.flags) & Flags.MASK_VERTEX).name)
-    return [VERTEX_LUMP[i] for i in indices]
+    first = min(indices)
+    vertices = VERTEX_LUMP[first:max(indices) + 1]  # one read for the whole mesh
+    return [vertices[i - first] for i in indices]
 
 
 def vertices_of_model(bsp, model_index: int) -> List[VertexReservedX]:
@@ -670,43 +740,97 @@ def vertices_of_model(bsp, model_index: int) -> List[VertexReservedX]:
     # NOTE: model 0 is worldspawn, other models are referenced by entities
     out = list()
     model = bsp.MODELS[model_index]
-    for i in range(model.first_mesh, model.num_meshes):
+    for i in range(model.first_mesh, model.first_mesh + model.num_meshes):
         out.extend(bsp.vertices_of_mesh(i))
     return out
 
 
+def mesh_arrays(bsp, model_index: int) -> MeshArrays:
+    """Every Mesh in bsp.MODELS[model_index] as numpy arrays, with triangles grouped by texture"""
+    import numpy  # requires: pip install numpy
+    from numpy.lib.recfunctions import structured_to_unstructured as unstructured
+    model = bsp.MODELS[model_index]
+    meshes = shared.lump_as_numpy(bsp, "MESHES")[model.first_mesh:model.first_mesh + model.num_meshes]
+    # sort meshes by texture name, keeping the original order for each texture
+    texture_data_names = bsp.material_index().texture_data_names
+    texture_ids = dict()
+    # ^ {"texture": id}; in order of first appearance in TEXTURE_DATA
+    texture_data_texture_id = numpy.array([texture_ids.setdefault(n, len(texture_ids)) for n in texture_data_names],
+                                          dtype=numpy.int64)
+    material_sorts = shared.lump_as_numpy(bsp, "MATERIAL_SORT")[meshes["material_sort"]]
+    mesh_texture_id = texture_data_texture_id[material_sorts["texture_data"]]
+    order = numpy.argsort(mesh_texture_id, kind="stable")
+    meshes, material_sorts, mesh_texture_id = meshes[order], material_sorts[order], mesh_texture_id[order]
+    # gather MESH_INDICES for every triangle corner at once
+    corner_counts = meshes["num_triangles"].astype(numpy.int64) * 3
+    first_corner = numpy.cumsum(corner_counts) - corner_counts
+    mesh_of_corner = numpy.repeat(numpy.arange(len(meshes)), corner_counts)
+    corners = numpy.arange(corner_counts.sum())
+    mesh_indices = shared.lump_as_numpy(bsp, "MESH_INDICES")
+    first_mesh_index = meshes["first_mesh_index"].astype(numpy.int64)[mesh_of_corner]
+    vertex_index = mesh_indices[first_mesh_index + corners - first_corner[mesh_of_corner]].astype(numpy.int64)
+    vertex_index += material_sorts["vertex_offset"].astype(numpy.int64)[mesh_of_corner]
+    # key corners by (vertex lump, index), so each used vertex is only gathered once
+    vertex_lump = (meshes["flags"].astype(numpy.int64) & Flags.MASK_VERTEX)[mesh_of_corner]
+    keys, indices = numpy.unique((vertex_lump << 32) | vertex_index, return_inverse=True)
+    positions = numpy.zeros((len(keys), 3), dtype=numpy.float32)
+    normals = numpy.zeros((len(keys), 3), dtype=numpy.float32)
+    uv0 = numpy.zeros((len(keys), 2), dtype=numpy.float32)
+    uv1 = numpy.zeros((len(keys), 2), dtype=numpy.float32)
+    colours = numpy.full((len(keys), 4), 255, dtype=numpy.uint8)
+    if len(keys) > 0:
+        all_positions = unstructured(shared.lump_as_numpy(bsp, "VERTICES"))
+        all_normals = unstructured(shared.lump_as_numpy(bsp, "VERTEX_NORMALS"))
+    key_lumps = keys >> 32
+    for flag in (Flags.VERTEX_LIT_FLAT, Flags.VERTEX_LIT_BUMP, Flags.VERTEX_UNLIT, Flags.VERTEX_UNLIT_TS):
+        start, stop = numpy.searchsorted(key_lumps, [flag, flag + 1])
+        if start == stop:
+            continue
+        vertices = shared.lump_as_numpy(bsp, flag.name)[keys[start:stop] & 0xFFFFFFFF]
+        positions[start:stop] = all_positions[vertices["position_index"]]
+        normals[start:stop] = all_normals[vertices["normal_index"]]
+        uv0[start:stop] = unstructured(vertices["uv0"])
+        if "uv1" in vertices.dtype.names:
+            uv1[start:stop] = unstructured(vertices["uv1"])
+        if "colour" in vertices.dtype.names:
+            colours[start:stop] = unstructured(vertices["colour"])
+    # {"texture": slice of indices}
+    texture_names = {i: name for name, i in texture_ids.items()}
+    used_texture_ids, first_mesh = numpy.unique(mesh_texture_id, return_index=True)
+    starts = [int(first_corner[i]) for i in first_mesh]
+    stops = [*starts[1:], len(corners)]
+    materials = {texture_names[int(t)]: slice(a, b) for t, a, b in zip(used_texture_ids, starts, stops)}
+    indices = indices.reshape(-1).astype(numpy.uint32)
+    return MeshArrays(positions, normals, uv0, uv1, colours, indices, materials)
+
+
 def replace_texture(bsp, texture: str, replacement: str):
     """Substitutes a texture name in the .bsp (if it is present)"""
     texture_index = bsp.TEXTURE_DATA_STRING_DATA.index(texture)  # fails if texture is not in bsp
-    bsp.TEXTURE_DATA_STRING_DATA.insert(texture_index, replacement)
-    bsp.TEXTURE_DATA_STRING_DATA.pop(texture_index + 1)
-    bsp.TEXTURE_DATA_STRING_TABLE = list()
-    offset = 0  # starting index of texture name in raw TEXTURE_DATA_STRING_DATA
-    for texture_name in bsp.TEXTURE_DATA_STRING_DATA:
-        bsp.TEXTURE_DATA_STRING_TABLE.append(offset)
-        offset += len(texture_name) + 1  # +1 for null byte
+    bsp.TEXTURE_DATA_STRING_DATA[texture_index] = replacement
+    bsp.TEXTURE_DATA_STRING_TABLE = bsp.TEXTURE_DATA_STRING_DATA.offsets
+    bsp.__dict__.pop("_material_index", None)  # texture names have changed
+
+
+def material_index(bsp, rebuild: bool = False) -> MaterialIndex:
+    """Texture name -> TextureData -> MaterialSort -> Mesh lookups; built on first use"""
+    # NOTE: call with rebuild=True after editing TEXTURE_DATA, MATERIAL_SORT or MESHES
+    if rebuild or "_material_index" not in bsp.__dict__:
+        texture_names = bsp.TEXTURE_DATA_STRING_DATA
+        texture_data_names = [texture_names[td.name_index] for td in bsp.TEXTURE_DATA[::]]
+        bsp._material_index = MaterialIndex.from_bsp(bsp, texture_data_names)
+    return bsp._material_index
 
 
 def find_mesh_by_texture(bsp, texture: str) -> Mesh:
-    """This is a generator, will yeild one Mesh at a time.  Very innefficient!"""
-    texture_index = bsp.TEXTURE_DATA_STRING_DATA.index(texture)  # fails if texture is not in bsp
-    for texture_data_index, texture_data in enumerate(bsp.TEXTURE_DATA):
-        if texture_data.name_index != texture_index:
-            continue
-        for material_sort_index, material_sort in enumerate(bsp.MATERIAL_SORT):
-            if material_sort.texture_data != texture_data_index:
-                continue
-            for mesh in bsp.MESHES:
-                if mesh.material_sort == material_sort_index:
-                    yield mesh
+    """This is a generator, will yeild one Mesh at a time"""
+    for mesh_index in bsp.material_index().meshes_of(texture):  # fails if texture is not in bsp
+        yield bsp.MESHES[mesh_index]
 
 
 def get_mesh_texture(bsp, mesh_index: int) -> str:
     """Returns the name of the .vmt applied to bsp.MESHES[mesh_index]"""
-    mesh = bsp.MESHES[mesh_index]
-    material_sort = bsp.MATERIAL_SORT[mesh.material_sort]
-    texture_data = bsp.TEXTURE_DATA[material_sort.texture_data]
-    return bsp.TEXTURE_DATA_STRING_DATA[texture_data.name_index]
+    return bsp.material_index().texture_of(mesh_index)
 
 
 def search_all_entities(bsp, **search: Dict[str, str]) -> Dict[str, List[Dict[str, str]]]:
@@ -749,32 +873,32 @@ def shadow_meshes_as_obj(bsp) -> str:
 # "debug" methods for investigating the compile process
 def debug_TextureData(bsp):
     print("# TD_index  TD.name  TextureData.flags")
+    texture_data_names = bsp.material_index().texture_data_names
     for i, td in enumerate(bsp.TEXTURE_DATA):
-        print(f"{i:02d} {bsp.TEXTURE_DATA_STRING_DATA[td.name_index]:<48s} {source.Surface(td.flags)!r}")
+        print(f"{i:02d} {texture_data_names[i]:<48s} {source.Surface(td.flags)!r}")
 
 
 def debug_unused_TextureData(bsp):
-    used_texture_datas = {bsp.MATERIAL_SORT[m.material_sort].texture_data for m in bsp.MESHES}
-    return used_texture_datas.difference({*range(len(bsp.TEXTURE_DATA))})
+    return bsp.material_index().unused_texture_data()
 
 
 def debug_Mesh_stats(bsp):
     print("# index  vertex_lump  texture_data_index  texture  mesh_indices_range")
+    index = bsp.material_index()
     for i, model in enumerate(bsp.MODELS):
         print(f"# MODELS[{i}]")
         for j in range(model.first_mesh, model.first_mesh + model.num_meshes):
             mesh = bsp.MESHES[j]
-            material_sort = bsp.MATERIAL_SORT[mesh.material_sort]
-            texture_data = bsp.TEXTURE_DATA[material_sort.texture_data]
-            texture_name = bsp.TEXTURE_DATA_STRING_DATA[texture_data.name_index]
+            texture_data_index = index.material_sort_texture_data[mesh.material_sort]
+            texture_name = index.texture_data_names[texture_data_index]
             vertex_lump = (Flags(mesh.flags) & Flags.MASK_VERTEX).name
             indices = set(bsp.MESH_INDICES[mesh.first_mesh_index:mesh.first_mesh_index + mesh.num_triangles * 3])
             _min, _max = min(indices), max(indices)
             _range = f"({_min}->{_max})" if indices == {*range(_min, _max + 1)} else indices
-            print(f"{j:02d} {vertex_lump:<15s} {material_sort.texture_data:02d} {texture_name:<48s} {_range}")
+            print(f"{j:02d} {vertex_lump:<15s} {texture_data_index:02d} {texture_name:<48s} {_range}")
 
 
-methods = [vertices_of_mesh, vertices_of_model,
-           replace_texture, find_mesh_by_texture, get_mesh_texture,
+methods = [vertices_of_mesh, vertices_of_model, mesh_arrays,
+           replace_texture, material_index, find_mesh_by_texture, get_mesh_texture,
            search_all_entities, shared.worldspawn_volume, shadow_meshes_as_obj,
            debug_TextureData, debug_unused_TextureData, debug_Mesh_stats]
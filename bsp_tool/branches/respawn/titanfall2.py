@@ -4,6 +4,7 @@ import struct
 from typing import List
 
 from .. import base
+from .. import shared
 from ..valve import source
 from . import titanfall
 
@@ -261,26 +262,20 @@ class StaticPropv13(base.Struct):  # sprp GAME_LUMP (0023)
 
 
 # classes for special lumps, in alphabetical order:
-class GameLump_SPRP:
+class GameLump_SPRP(shared.GameLump_SPRP):
     """New in Titanfall 2"""
-    _static_prop_format: str  # StaticPropClass._format
     model_names: List[str]  # filenames of all .mdl / .rmdl used
     unknown_1: int
     unknown_2: int  # indices?
-    props: List[object]  # List[StaticPropClass]
 
     def __init__(self, raw_sprp_lump: bytes, StaticPropClass: object):
-        self._static_prop_format = StaticPropClass._format
         sprp_lump = io.BytesIO(raw_sprp_lump)
         model_names_count = int.from_bytes(sprp_lump.read(4), "little")
         model_names = struct.iter_unpack("128s", sprp_lump.read(128 * model_names_count))
         setattr(self, "model_names", [t[0].replace(b"\0", b"").decode() for t in model_names])
         prop_count, unknown_1, unknown_2 = struct.unpack("3i", sprp_lump.read(12))
         self.unknown_1, self.unknown_2 = unknown_1, unknown_2
-        # TODO: if StaticPropClass is None: split into appropriate groups of bytes
-        read_size = struct.calcsize(StaticPropClass._format) * prop_count
-        props = struct.iter_unpack(StaticPropClass._format, sprp_lump.read(read_size))
-        setattr(self, "props", list(map(StaticPropClass.from_tuple, props)))
+        self._read_props(sprp_lump, prop_count, StaticPropClass)
         # TODO: check if are there any leftover bytes at the end?
 
     def as_bytes(self) -> bytes:
@@ -289,7 +284,7 @@ class GameLump_SPRP:
         return b"".join([len(self.model_names).to_bytes(4, "little"),
                         *[struct.pack("128s", n.encode("ascii")) for n in self.model_names],
                         struct.pack("3I", len(self.props), self.unknown_1, self.unknown_2),
-                        *[struct.pack(self._static_prop_format, *p.flat()) for p in self.props]])
+                        self._props_as_bytes()])
 
 
 # {"LUMP_NAME": {version: LumpClass}}
@@ -1,10 +1,15 @@
+import bisect
+import collections
+import functools
 import io
+import itertools
 import math
 import re
 import struct
 import zipfile
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Set, Union
 
+from . import base
 from . import physics  # noqa F401
 
 
@@ -46,67 +51,193 @@ class UnsignedShorts(int):
 
 
 # Special Lump Classes
+Entity = Dict[str, Union[str, List[str]]]
+# ^ {"key": "value"} or {"key": ["value", "value"]} for duplicate keys
+
+_whitespace = str.maketrans("", "", " \t\n\r\v\f\x00")  # str.translate deletes whitespace & null bytes
+_entity_token = re.compile(r'"([^"]*)"|([{}])|//[^\n]*|([^\s\x00"{}/]+|/|")')
+# ^ "string" | {brace} | //comment | unexpected
+
+
+def _entity(strings: List[str]) -> Entity:
+    """["key", "value", "key", "value"] -> {"key": "value"}"""
+    pairs = iter(strings)
+    entity = dict(zip(pairs, pairs))
+    if len(entity) * 2 != len(strings):  # don't override duplicate keys, share a list instead
+        # generally duplicate keys are ouputs
+        entity = dict()
+        pairs = iter(strings)
+        for key, value in zip(pairs, pairs):
+            if key not in entity:
+                entity[key] = value
+            elif isinstance(entity[key], list):  # more than 2 of this key
+                entity[key].append(value)
+            else:  # second occurance of key
+                entity[key] = [entity[key], value]
+    return entity
+
+
+def _parse_entities_quick(text: str) -> Union[List[Entity], None]:
+    """Splits on quotes; returns None if text contains anything besides entities (e.g. comments)"""
+    parts = text.split('"')  # odd indices are "strings"
+    if len(parts) % 2 == 0:  # unclosed quote
+        return None
+    entities = list()
+    start = 1  # index of the first string in the current entity
+    *chunks, tail = '"'.join(parts[::2]).split("}")  # strings removed, so each "}" closes an entity
+    for chunk in chunks:
+        head, brace, body = chunk.partition("{")
+        length = 2 * body.count('"')  # each quote is a string; parts also holds the text between
+        if brace == "" or head.translate(_whitespace) != "" or len(body.translate(_whitespace)) * 2 != length:
+            return None  # unexpected text
+        if length % 4 != 0:  # odd number of strings
+            return None
+        entities.append(_entity(parts[start:start + length:2]))
+        start += length
+    if tail.translate(_whitespace) != "":
+        return None
+    return entities
+
+
+def _parse_entities(text: str) -> List[Entity]:
+    """Tokenizes text in a single pass; handles comments & raises errors on unexpected text"""
+    entities = list()
+    strings = None  # strings in the current entity
+    for match in _entity_token.finditer(text):
+        string, brace, unexpected = match.groups()
+        if string is not None and strings is not None:
+            strings.append(string)
+        elif brace == "{" and strings is None:
+            strings = list()
+        elif brace == "}" and strings is not None and len(strings) % 2 == 0:
+            entities.append(_entity(strings))
+            strings = None
+        elif string is not None or brace is not None or unexpected is not None:
+            line_no = text.count("\n", 0, match.start()) + 1
+            raise RuntimeError(f"Unexpected {match.group()!r} in entities: L{line_no}")
+        # else: //comment
+    # NOTE: an unclosed entity at the end of the lump is ignored
+    return entities
+
+
+def _clears_indexes(method: Callable) -> Callable:
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.reindex()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _reindex_on_edit(cls: type) -> type:
+    """list subclass decorator; methods which modify the list call self.reindex() first"""
+    for method_name in ("__delitem__", "__iadd__", "__imul__", "__setitem__",
+                        "append", "clear", "extend", "insert", "pop", "remove", "reverse", "sort"):
+        setattr(cls, method_name, _clears_indexes(getattr(list, method_name)))
+    return cls
+
+
+@_reindex_on_edit
 class Entities(list):
+    """List of entity dicts, with lazily built indexes on classname, targetname & any other key added"""
     # TODO: match "classname" to python classes (optional)
     # -- use fgd-tools?
     # TODO: use a true __init__ & .from_bytes() @staticmethod
+    indexed_keys: Set[str]  # keys searches can look up in an index, rather than checking every entity
+    _indexes: Dict[str, Dict[str, List[int]]]
+    # ^ {"key": {"value": [entity_index]}}; cleared whenever the list is modified
+    _sorted_values: Dict[str, List[str]]
+    # ^ {"key": sorted(_indexes["key"])}; for prefix searches
+    # NOTE: indexes are not updated when an entity dict is edited; call .reindex() after doing so
+
     def __init__(self, raw_entities: bytes):
-        entities: List[Dict[str, str]] = list()
-        # ^ [{"key": "value"}]
-        # TODO: handle newlines in keys / values
-        enumerated_lines = enumerate(raw_entities.decode(errors="ignore").splitlines())
-        for line_no, line in enumerated_lines:
-            if re.match(r"^\s*$", line):  # line is blank / whitespace
-                continue
-            if "{" in line:  # new entity
-                ent = dict()
-            elif '"' in line:
-                key_value_pair = re.search(r'"([^"]*)"\s"([^"]*)"', line)
-                if not key_value_pair:
-                    open_key_value_pair = re.search(r'"([^"]*)"\s"([^"]*)', line)
-                    if not open_key_value_pair:
-                        RuntimeError(f"Unexpected line in entities: L{line_no}: {line.encode()}")
-                    key, value = open_key_value_pair.groups()
-                    # TODO: use regex to catch CRLF line endings & unexpected whitespace
-                    tail = re.search(r'([^"]*)"\s*$', line)
-                    while not tail:
-                        if "{" in line or "}" in line:
-                            RuntimeError(f"Unexpected line in entities: L{line_no}: {line.encode()}")
-                        line_no, line = next(enumerated_lines)
-                        # NOTE: ^ might've broken line numbers?
-                        value += line
-                        tail = re.search(r'([^"]*)"\s*$', line)
-                    value += tail.groups()[0]
-                    continue
-                key, value = key_value_pair.groups()
-                if key not in ent:
-                    ent[key] = value
-                else:  # don't override duplicate keys, share a list instead
-                    # generally duplicate keys are ouputs
-                    if isinstance(ent[key], list):  # more than 2 of this key
-                        ent[key].append(value)
-                    else:  # second occurance of key
-                        ent[key] = [ent[key], value]
-            elif "}" in line:  # close entity
-                entities.append(ent)
-            elif line.strip() == b"\x00".decode():  # ignore null bytes
-                continue
-            elif line.startswith("//"):  # ignore comments
-                continue
-            else:
-                raise RuntimeError(f"Unexpected line in entities: L{line_no}: {line.encode()}")
-            super().__init__(entities)
-
-    def search(self, **search: Dict[str, str]) -> List[Dict[str, str]]:
+        # NOTE: quoted keys & values can span multiple lines; // comments & null bytes are ignored
+        # NOTE: decoding once & splitting the str beats splitting bytes; every key & value has to be a str anyway
+        text = raw_entities.decode(errors="ignore")
+        entities = _parse_entities_quick(text)
+        if entities is None:  # comments / unexpected text
+            entities = _parse_entities(text)
+        super().__init__(entities)
+        self.indexed_keys = {"classname", "targetname"}
+        self._indexes = dict()
+        self._sorted_values = dict()
+
+    def add_index(self, *keys: str):
+        """.add_index("target", "parentname"); searches on these keys will use an index"""
+        self.indexed_keys.update(keys)
+
+    def reindex(self):
+        """Clear all indexes; they will be rebuilt when next searched"""
+        self._indexes.clear()
+        self._sorted_values.clear()
+
+    def _index(self, key: str) -> Dict[str, List[int]]:
+        if key not in self._indexes:
+            index = collections.defaultdict(list)
+            for i, entity in enumerate(self):
+                value = entity.get(key)
+                if isinstance(value, str):
+                    index[value].append(i)
+                elif isinstance(value, list):  # duplicate key
+                    for v in dict.fromkeys(value):
+                        index[v].append(i)
+            self._indexes[key] = dict(index)
+        return self._indexes[key]
+
+    def _select(self, search: Dict[str, Any], positions: Callable[[str, Any], Set[int]],
+                match: Callable[[Union[str, List[str], None], Any], bool], any_key: bool = False) -> List[Entity]:
+        """entities where match(entity.get(key), query) for all (or any) search keys; uses indexes where possible"""
+        indexed = {k: q for k, q in search.items() if k in self.indexed_keys}
+        found = [positions(k, q) for k, q in indexed.items()]
+        if any_key:
+            if len(indexed) == len(search):
+                candidates = sorted(set().union(*found))
+            else:  # non-indexed keys must check every entity
+                candidates = range(len(self))
+            return [self[i] for i in candidates if any(match(self[i].get(k), q) for k, q in search.items())]
+        if len(found) == 0:
+            candidates = range(len(self))
+        else:
+            candidates = sorted(set.intersection(*found))
+        return [self[i] for i in candidates if all(match(self[i].get(k), q) for k, q in search.items())]
+
+    def search(self, **search: Dict[str, str]) -> List[Entity]:
         """.search(classname="light_environment") -> [{"classname": "light_environment", ...}]"""
-        # NOTE: exact matches only!
-        return [e for e in self if all([e.get(k, "") == v for k, v in search.items()])]
-
-    # TODO: find_regex
-
-    # TODO: find_any  (any k == v, not all)
-
-    # TODO: find_any_regex
+        # NOTE: exact matches only! (keys w/ multiple values will only match a list of the same values)
+        return self._select(search, self._exact_positions, _exact_match)
+
+    def search_any(self, **search: Dict[str, str]) -> List[Entity]:
+        """.search_any(targetname="door", parentname="door") -> entities matching either key"""
+        return self._select(search, self._exact_positions, _exact_match, any_key=True)
+
+    def search_regex(self, **patterns: Dict[str, str]) -> List[Entity]:
+        """.search_regex(classname="info_player_.*") -> entities where every pattern matches a whole value"""
+        patterns = {k: re.compile(p) for k, p in patterns.items()}
+        return self._select(patterns, self._regex_positions, _regex_match)
+
+    def search_prefix(self, **prefixes: Dict[str, str]) -> List[Entity]:
+        """.search_prefix(classname="weapon_") -> entities where every value starts with it's prefix"""
+        return self._select(prefixes, self._prefix_positions, _prefix_match)
+
+    def _exact_positions(self, key: str, value: str) -> Set[int]:
+        if value == "":  # also matches entities without this key
+            return set(range(len(self)))
+        return set(self._index(key).get(value, ()))
+
+    def _regex_positions(self, key: str, pattern: re.Pattern) -> Set[int]:
+        index = self._index(key)
+        return {i for value in index if pattern.fullmatch(value) for i in index[value]}
+
+    def _prefix_positions(self, key: str, prefix: str) -> Set[int]:
+        if key not in self._sorted_values:
+            self._sorted_values[key] = sorted(self._index(key))
+        values = self._sorted_values[key]
+        index = self._indexes[key]
+        out = set()
+        for value in values[bisect.bisect_left(values, prefix):]:
+            if not value.startswith(prefix):
+                break
+            out.update(index[value])
+        return out
 
     def as_bytes(self) -> bytes:
         entities = []
@@ -124,6 +255,60 @@ class Entities(list):
         return b"\n".join(map(lambda e: e.encode("ascii"), entities)) + b"\n\x00"
 
 
+def _exact_match(value: Union[str, List[str], None], query: str) -> bool:
+    return (value if value is not None else "") == query
+
+
+def _regex_match(value: Union[str, List[str], None], pattern: re.Pattern) -> bool:
+    values = [value] if isinstance(value, str) else value if value is not None else list()
+    return any(pattern.fullmatch(v) for v in values)
+
+
+def _prefix_match(value: Union[str, List[str], None], prefix: str) -> bool:
+    values = [value] if isinstance(value, str) else value if value is not None else list()
+    return any(v.startswith(prefix) for v in values)
+
+
+class GameLump_SPRP:
+    """Static props; each branch's GameLump_SPRP reads it's own headers & calls _read_props"""
+    columnar: bool = False  # True: props is a numpy structured array (StaticPropClass.numpy_dtype)
+    # NOTE: set before the sprp game lump loads, e.g. shared.GameLump_SPRP.columnar = True (every branch)
+    # -- or source.GameLump_SPRP.columnar = True (source, orange_box etc. only)
+    StaticPropClass: Any  # base.Struct subclass; None if unknown
+    props: Union[List[Any], Any]  # List[StaticPropClass] | numpy.ndarray if columnar | List[bytes] if unknown
+
+    def _read_props(self, sprp_lump: io.BytesIO, prop_count: int, StaticPropClass: Any):
+        self.StaticPropClass = StaticPropClass
+        if StaticPropClass is None:
+            raw_props = sprp_lump.read()
+            prop_size = len(raw_props) // prop_count if prop_count > 0 else 0
+            # NOTE: will break if prop_count does not divide raw_props evenly
+            self.props = [raw_props[i:i + prop_size] for i in range(0, prop_size * prop_count, prop_size)]
+            return
+        raw_props = sprp_lump.read(struct.calcsize(StaticPropClass._format) * prop_count)
+        if self.columnar:
+            import numpy  # requires: pip install numpy
+            self.props = numpy.frombuffer(raw_props, StaticPropClass.numpy_dtype()).copy()  # writable
+        else:
+            props = struct.iter_unpack(StaticPropClass._format, raw_props)
+            self.props = list(map(StaticPropClass.from_tuple, props))
+
+    def _props_as_bytes(self) -> bytes:
+        if not isinstance(self.props, list):  # columnar
+            return self.props.tobytes()
+        elif self.StaticPropClass is None:
+            return b"".join(self.props)
+        _struct = struct.Struct(self.StaticPropClass._format)
+        return b"".join([_struct.pack(*p.flat()) for p in self.props])
+
+    def as_numpy(self):  # -> numpy.ndarray
+        """props as a numpy structured array; the array itself if columnar, otherwise a copy"""
+        import numpy  # requires: pip install numpy
+        if not isinstance(self.props, list):
+            return self.props
+        return numpy.frombuffer(self._props_as_bytes(), self.StaticPropClass.numpy_dtype()).copy()
+
+
 class PakFile(zipfile.ZipFile):
     def __init__(self, raw_zip: bytes):
         self._buffer = io.BytesIO(raw_zip)
@@ -133,9 +318,70 @@ class PakFile(zipfile.ZipFile):
         return self._buffer.getvalue()
 
 
+@_reindex_on_edit
 class TextureDataStringData(list):
+    """Null terminated texture names; indexed by byte offset (TEXTURE_DATA_STRING_TABLE & Apex TextureData)"""
+    _offsets: List[int]  # byte offset of each name, + the total size in bytes
+    _index_of_offset: Dict[int, int]
+    # ^ {offset: index}
+    _index_of_name: Dict[str, int]
+    # ^ {"name": index}  (first occurance)
+    # NOTE: all built on first use & cleared whenever the list is modified
+
     def __init__(self, raw_texture_data_string_data: bytes):
         super().__init__([t.decode("ascii", errors="ignore") for t in raw_texture_data_string_data[:-1].split(b"\0")])
+        self.reindex()
+
+    def reindex(self):
+        self._offsets = None
+        self._index_of_offset = None
+        self._index_of_name = None
+
+    def _build_indexes(self):
+        self._offsets = [0, *itertools.accumulate(len(t) + 1 for t in self)]  # +1 for null byte
+        self._index_of_offset = {offset: i for i, offset in enumerate(self._offsets[:-1])}
+        self._index_of_name = dict()
+        for i, name in enumerate(self):
+            self._index_of_name.setdefault(name, i)
+
+    @property
+    def offsets(self) -> List[int]:
+        """byte offset of each name in .as_bytes(); matches TEXTURE_DATA_STRING_TABLE"""
+        if self._offsets is None:
+            self._build_indexes()
+        return self._offsets[:-1]
+
+    def index(self, name: str, *args) -> int:
+        if len(args) != 0:  # start / stop
+            return super().index(name, *args)
+        if self._index_of_name is None:
+            self._build_indexes()
+        if name not in self._index_of_name:
+            raise ValueError(f"{name!r} is not in list")
+        return self._index_of_name[name]
+
+    def index_of_offset(self, offset: int) -> int:
+        """offset must be the first byte of a name"""
+        if self._index_of_offset is None:
+            self._build_indexes()
+        return self._index_of_offset[offset]
+
+    def at_offset(self, offset: int) -> str:
+        """name at a byte offset; same as .as_bytes()[offset:].lstrip(b"\\0").partition(b"\\0")[0].decode()"""
+        if self._offsets is None:
+            self._build_indexes()
+        if offset in self._index_of_offset and self[self._index_of_offset[offset]] != "":
+            return self[self._index_of_offset[offset]]
+        if offset < 0:  # rare, do it the slow way
+            return self.as_bytes()[offset:].lstrip(b"\0").partition(b"\0")[0].decode()
+        i = bisect.bisect_right(self._offsets, offset) - 1
+        if i >= len(self):  # out of range
+            return ""
+        tail = self[i][offset - self._offsets[i]:]  # offset may point into the middle of a name
+        if tail != "":
+            return tail
+        # offset points at a null byte; skip to the next name
+        return next((name for name in itertools.islice(self, i + 1, None) if name != ""), "")
 
     # TODO: use regex to search
     # def find(self, pattern: str) -> List[str]:
@@ -171,3 +417,21 @@ def worldspawn_volume(bsp):
     maxs = map(float, worldspawn["world_maxs"].split())
     mins = map(float, worldspawn["world_mins"].split())
     return math.sqrt(sum([(b - a) ** 2 for a, b in zip(mins, maxs)]))
+
+
+# helpers
+def lump_as_numpy(bsp, LUMP_NAME: str):  # -> numpy.ndarray
+    """Whole lump as a numpy array; lumps which aren't BspLumps (e.g. lists) are packed first"""
+    import numpy  # requires: pip install numpy
+    lump = getattr(bsp, LUMP_NAME)
+    if hasattr(lump, "as_numpy"):
+        return lump.as_numpy()
+    LumpClass = {**bsp.branch.BASIC_LUMP_CLASSES, **bsp.branch.LUMP_CLASSES}[LUMP_NAME]
+    if isinstance(LumpClass, dict):  # {version: LumpClass}
+        version = getattr(bsp.headers.get(LUMP_NAME), "version", None)
+        LumpClass = LumpClass.get(version, [*LumpClass.values()][-1])
+    if hasattr(LumpClass, "numpy_dtype"):
+        _struct = struct.Struct(LumpClass._format)
+        raw_lump = b"".join([_struct.pack(*entry.flat()) for entry in lump])
+        return numpy.frombuffer(raw_lump, LumpClass.numpy_dtype())
+    return numpy.array(lump, dtype=base.numpy_dtype(None, LumpClass._format))
@@ -160,17 +160,18 @@ class StaticPropv10(base.Struct):  # sprp GAME LUMP (LUMP 35)
     first_leaf: int  # index into Leaf lump
     num_leafs: int  # number of Leafs after first_leaf this StaticPropv10 is in
     solid_mode: int  # collision flags enum
+    flags: int  # other flags
     skin: int  # index of this StaticProp's skin in the .mdl
     fade_distance: List[float]  # min & max distances to fade out
     lighting_origin: List[float]  # xyz position to sample lighting from
     forced_fade_scale: float  # relative to pixels used to render on-screen?
     dx_level: List[int]  # supported directX level, will not render depending on settings
-    flags: int  # other flags
+    flags_ex: int  # more flags
     lightmap: List[int]  # dimensions of this StaticProp's lightmap (GAME_LUMP.static prop lighting?)
     __slots__ = ["origin", "angles", "name_index", "first_leaf", "num_leafs",
-                 "solid_mode", "skin", "fade_distance", "lighting_origin",
-                 "forced_fade_scale", "dx_level", "flags", "lightmap"]
-    _format = "6f3HBi6f2Hi2H"
+                 "solid_mode", "flags", "skin", "fade_distance", "lighting_origin",
+                 "forced_fade_scale", "dx_level", "flags_ex", "lightmap"]
+    _format = "6f3H2Bi6f2Hi2H"
     _arrays = {"origin": [*"xyz"], "angles": [*"yzx"], "fade_distance": ["min", "max"],
                "lighting_origin": [*"xyz"], "dx_level": ["min", "max"],
                "lightmap": ["width", "height"]}
@@ -190,7 +191,7 @@ SPECIAL_LUMP_CLASSES = source.SPECIAL_LUMP_CLASSES.copy()
 GAME_LUMP_HEADER = source.GAME_LUMP_HEADER
 
 # {"lump": {version: SpecialLumpClass}}
-GAME_LUMP_CLASSES = source.GAME_LUMP_CLASSES.copy()
+GAME_LUMP_CLASSES = {name: versions.copy() for name, versions in source.GAME_LUMP_CLASSES.items()}
 GAME_LUMP_CLASSES["sprp"].update({7: lambda raw_lump: source.GameLump_SPRP(raw_lump, StaticPropv10),  # 7*
                                  10: lambda raw_lump: source.GameLump_SPRP(raw_lump, StaticPropv10)})
 
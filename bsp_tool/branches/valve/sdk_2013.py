@@ -114,7 +114,7 @@ SPECIAL_LUMP_CLASSES = orange_box.SPECIAL_LUMP_CLASSES.copy()
 
 GAME_LUMP_HEADER = orange_box.GAME_LUMP_HEADER
 
-GAME_LUMP_CLASSES = orange_box.GAME_LUMP_CLASSES.copy()
+GAME_LUMP_CLASSES = {name: versions.copy() for name, versions in orange_box.GAME_LUMP_CLASSES.items()}
 GAME_LUMP_CLASSES["sprp"].pop(10)
 
 methods = [*orange_box.methods]
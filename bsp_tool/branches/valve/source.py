@@ -605,7 +605,10 @@ class GameLumpHeader(base.MappedArray):
     _format = "4s2H2i"
 
 
-class GameLump_SPRP:
+class GameLump_SPRP(shared.GameLump_SPRP):
+    model_names: List[str]
+    leaves: List[int]
+
     def __init__(self, raw_sprp_lump: bytes, StaticPropClass: object):
         """Get StaticPropClass from GameLump version"""
         # lambda raw_lump: GameLump_SPRP(raw_lump, StaticPropvXX)
@@ -617,32 +620,18 @@ class GameLump_SPRP:
         leaves = itertools.chain(*struct.iter_unpack("H", sprp_lump.read(2 * leaf_count)))
         setattr(self, "leaves", list(leaves))
         prop_count = int.from_bytes(sprp_lump.read(4), "little")
-        if StaticPropClass is None:
-            raw_props = sprp_lump.read()
-            prop_size = len(raw_props) // prop_count
-            props = list()
-            for i in range(prop_count):
-                props.append(raw_props[i * prop_size:(i + 1) * prop_size])
-            setattr(self, "props", props)
-        else:
-            read_size = struct.calcsize(StaticPropClass._format) * prop_count
-            props = struct.iter_unpack(StaticPropClass._format, sprp_lump.read(read_size))
-            setattr(self, "props", list(map(StaticPropClass.from_tuple, props)))
+        self._read_props(sprp_lump, prop_count, StaticPropClass)
         here = sprp_lump.tell()
         end = sprp_lump.seek(0, 2)
         assert here == end, "Had some leftover bytes; StaticPropClass._format is incorrect!"
 
     def as_bytes(self) -> bytes:
-        if len(self.props) > 0:
-            prop_format = self.props[0]._format
-        else:
-            prop_format = ""
         return b"".join([int.to_bytes(len(self.model_names), 4, "little"),
-                         *[struct.pack("128s", n) for n in self.model_names],
+                         *[struct.pack("128s", n.encode("ascii")) for n in self.model_names],
                          int.to_bytes(len(self.leaves), 4, "little"),
                          *[struct.pack("H", L) for L in self.leaves],
                          int.to_bytes(len(self.props), 4, "little"),
-                         *[struct.pack(prop_format, *p.flat()) for p in self.props]])
+                         self._props_as_bytes()])
 
 
 class StaticPropv4(base.Struct):  # sprp GAME LUMP (LUMP 35)
@@ -764,6 +753,12 @@ GAME_LUMP_CLASSES = {"sprp": {4: lambda raw_lump: GameLump_SPRP(raw_lump, Static
 # -- https://github.com/ValveSoftware/source-sdk-2013/blob/master/sp/src/public/gamebspfile.h#L25
 
 
+WorldMesh = collections.namedtuple("WorldMesh", ["positions", "normals", "uv0", "uv1", "texture_data"])
+# positions & normals: float32 (num_triangles * 3, 3); 3 vertices per triangle (not indexed)
+# uv0 (albedo) & uv1 (lightmap): float32 (num_triangles * 3, 2)
+# texture_data: int32 (num_triangles,); TEXTURE_DATA index of each triangle (-1 if it's face has no TextureInfo)
+
+
 # branch exclusive methods, in alphabetical order:
 def vertices_of_face(bsp, face_index: int) -> List[float]:
     """Format: [Position, Normal, TexCoord, LightCoord, Colour]"""
@@ -810,8 +805,8 @@ def vertices_of_face(bsp, face_index: int) -> List[float]:
         else:
             uv2[0] -= face.lightmap.mins.x
             uv2[1] -= face.lightmap.mins.y
-            uv2[0] /= face.lightmap.size.x
-            uv2[1] /= face.lightmap.size.y
+            uv2[0] /= face.lightmap.size.width
+            uv2[1] /= face.lightmap.size.height
         uv2s.append(uv2)
     normal = [bsp.PLANES[face.plane].normal] * len(positions)  # X Y Z
     colour = [texture_data.reflectivity] * len(positions)  # R G B
@@ -934,7 +929,104 @@ def vertices_of_displacement(bsp, face_index: int) -> List[List[float]]:
     return vertices
 
 
+def world_mesh(bsp, model_index: int = 0) -> WorldMesh:
+    """Triangulates every face & displacement of bsp.MODELS[model_index] into numpy arrays"""
+    # NOTE: same results as vertices_of_face & vertices_of_displacement, but for a whole model at once
+    import numpy  # requires: pip install numpy
+    from numpy.lib.recfunctions import structured_to_unstructured as unstructured
+    model = bsp.MODELS[model_index]
+    faces = shared.lump_as_numpy(bsp, "FACES")[model.first_face:model.first_face + model.num_faces]
+    # every corner of every face, in one gather
+    counts = faces["num_edges"].astype(numpy.int64)
+    first_corner = numpy.cumsum(counts) - counts
+    face_of_corner = numpy.repeat(numpy.arange(len(faces)), counts)
+    local_corner = numpy.arange(counts.sum()) - first_corner[face_of_corner]
+    first_edge = faces["first_edge"].astype(numpy.int64)[face_of_corner]
+    surfedges = shared.lump_as_numpy(bsp, "SURFEDGES")[first_edge + local_corner].astype(numpy.int64)
+    edges = shared.lump_as_numpy(bsp, "EDGES")
+    vertices = numpy.where(surfedges >= 0, edges[abs(surfedges), 0], edges[abs(surfedges), 1])
+    # t-junction patch (see t_junction_fixer); an edge goes out to one point & doubles back: delete it
+    previous_corner = first_corner[face_of_corner] + (local_corner - 1) % counts[face_of_corner]
+    next_corner = first_corner[face_of_corner] + (local_corner + 1) % counts[face_of_corner]
+    spike = vertices[previous_corner] == vertices[next_corner]
+    keep = ~(spike | spike[previous_corner])
+    vertices, face_of_corner = vertices[keep], face_of_corner[keep]
+    counts = numpy.bincount(face_of_corner, minlength=len(faces))
+    first_corner = numpy.cumsum(counts) - counts
+    # per corner attributes
+    positions = unstructured(shared.lump_as_numpy(bsp, "VERTICES")).astype(numpy.float32)[vertices]
+    normals = unstructured(shared.lump_as_numpy(bsp, "PLANES")["normal"])[faces["plane"]][face_of_corner]
+    texture_info = faces["texture_info"].astype(numpy.int64)
+    has_texture_info = texture_info != -1
+    texture_infos = shared.lump_as_numpy(bsp, "TEXTURE_INFO")[texture_info[has_texture_info]]
+    texture_data = numpy.full(len(faces), -1, dtype=numpy.int32)
+    texture_data[has_texture_info] = texture_infos["texture_data"]
+    view = numpy.ones((len(faces), 2), dtype=numpy.float32)
+    texture_datas = shared.lump_as_numpy(bsp, "TEXTURE_DATA")
+    view[has_texture_info] = unstructured(texture_datas["view"])[texture_data[has_texture_info]]
+    view[view == 0] = 1
+    projections = numpy.zeros((len(faces), 4, 4), dtype=numpy.float32)
+    # ^ [texture.s, texture.t, lightmap.s, lightmap.t]; [x, y, z, offset]
+    for i, (vecs, axis) in enumerate(itertools.product(("texture", "lightmap"), "st")):
+        projections[has_texture_info, i] = unstructured(texture_infos[vecs][axis])
+    projections = projections[face_of_corner]
+    uvs = numpy.einsum("ij,ikj->ik", positions, projections[:, :, :3]) + projections[:, :, 3]
+    # texture vector -> uv calculation discovered in:
+    # github.com/VSES/SourceEngine2007/blob/master/src_main/engine/matsys_interface.cpp
+    # SurfComputeTextureCoordinate & SurfComputeLightmapCoordinate
+    uv0 = uvs[:, :2] / view[face_of_corner]
+    lightmap_mins = unstructured(faces["lightmap"]["mins"]).astype(numpy.float32)[face_of_corner]
+    lightmap_size = unstructured(faces["lightmap"]["size"]).astype(numpy.float32)[face_of_corner]
+    lightmap_size[lightmap_size == 0] = 1
+    uv1 = (uvs[:, 2:] - lightmap_mins) / lightmap_size
+    uv1[(lightmap_mins == 0).any(axis=1)] = 0  # invalid / no lighting
+    # triangle fans of regular faces
+    is_displacement = faces["displacement_info"] != -1
+    triangle_counts = numpy.where(is_displacement, 0, numpy.maximum(counts - 2, 0))
+    face_of_triangle = numpy.repeat(numpy.arange(len(faces)), triangle_counts)
+    fan = numpy.arange(triangle_counts.sum()) - (numpy.cumsum(triangle_counts) - triangle_counts)[face_of_triangle]
+    fan_start = first_corner[face_of_triangle]
+    corners = numpy.stack([fan_start, fan_start + fan + 1, fan_start + fan + 2], axis=1).reshape(-1)
+    out = [(positions[corners], normals[corners], uv0[corners], uv1[corners], texture_data[face_of_triangle])]
+    # displacements; interpolated across the base quad, then offset
+    # NOTE: displacements w/o exactly 4 corners are skipped (vertices_of_displacement raises a RuntimeError)
+    displacement_faces = numpy.nonzero(is_displacement & (counts == 4))[0]
+    if len(displacement_faces) > 0:
+        displacement_infos = shared.lump_as_numpy(bsp, "DISPLACEMENT_INFO")
+        displacement_infos = displacement_infos[faces["displacement_info"][displacement_faces]]
+        displacement_vertices = shared.lump_as_numpy(bsp, "DISPLACEMENT_VERTICES")
+        offsets = unstructured(displacement_vertices["vector"]) * displacement_vertices["distance"][:, None]
+        quads = first_corner[displacement_faces][:, None] + numpy.arange(4)
+        # rotate so the point closest to start on the quad is index 0
+        start = unstructured(displacement_infos["start_position"])
+        starting_index = numpy.linalg.norm(positions[quads] - start[:, None], axis=2).argmin(axis=1)
+        quads = quads[numpy.arange(len(quads))[:, None], (starting_index[:, None] + numpy.arange(4)) % 4]
+        for power in sorted(set(displacement_infos["power"])):
+            of_power = displacement_infos["power"] == power
+            power2 = 2 ** power
+            grid = numpy.arange((power2 + 1) ** 2)
+            t1 = (grid % (power2 + 1) / power2)[None, :, None]
+            t2 = (grid // (power2 + 1) / power2)[None, :, None]
+            A, B, C, D = [quads[of_power, i] for i in range(4)]
+
+            def interpolate(attribute):  # -> numpy.ndarray
+                a, b, c, d = [attribute[corner][:, None] for corner in (A, B, C, D)]
+                left, right = a + (d - a) * t1, b + (c - b) * t1
+                return left + (right - left) * t2
+
+            first_vertex = displacement_infos["displacement_vert_start"][of_power].astype(numpy.int64)
+            grid_positions = interpolate(positions) + offsets[first_vertex[:, None] + grid]
+            grid_normals = numpy.broadcast_to(normals[A][:, None], grid_positions.shape)
+            triangles = numpy.array(displacement_indices(power))
+            num_triangles = len(triangles) // 3
+            out.append((grid_positions[:, triangles].reshape(-1, 3), grid_normals[:, triangles].reshape(-1, 3),
+                        interpolate(uv0)[:, triangles].reshape(-1, 2), interpolate(uv1)[:, triangles].reshape(-1, 2),
+                        texture_data[displacement_faces[of_power]].repeat(num_triangles)))
+    return WorldMesh(*[numpy.concatenate(arrays).astype(dtype) for arrays, dtype in zip(
+        zip(*out), (numpy.float32, numpy.float32, numpy.float32, numpy.float32, numpy.int32))])
+
+
 # TODO: vertices_of_model (walk the node tree)
 # TODO: vertices_of_node
 
-methods = [vertices_of_face, vertices_of_displacement, shared.worldspawn_volume]
+methods = [vertices_of_face, vertices_of_displacement, world_mesh, shared.worldspawn_volume]
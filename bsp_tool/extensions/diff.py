@@ -97,7 +97,7 @@ def diff_rbsps(rbsp1, rbsp2, external=True, full=False) -> str:
     if external:
         out.append("*** .bsp_lump files ***")
         out.append(diff_bsps(rbsp1.external, rbsp2.external, full))
-        # TODO: close each lump after reading to save memory & avoid the "Too many open files" OSError
+        # NOTE: .bsp_lump files share lumps.file_pool, so only file_pool.max_open are ever open at once
     return "\n".join(out)
 
 
@@ -0,0 +1,182 @@
+"""Stream .bsp geometry to .obj & .glb files, one model / material at a time
+(every material of the model being written is held in memory; worldspawn is the largest model)
+
+from bsp_tool.extensions import export
+with open("map.obj", "w") as obj_file:
+    export.write_obj(bsp, obj_file)
+with open("map.glb", "wb") as glb_file:
+    export.write_glb(bsp, glb_file)"""
+import collections
+import io
+import json
+import math
+import shutil
+import struct
+import tempfile
+from typing import Iterator
+
+import numpy  # requires: pip install numpy
+from numpy.lib.recfunctions import structured_to_unstructured as unstructured
+
+from ..branches import shared
+from ..branches.id_software import quake3
+
+
+Mesh = collections.namedtuple("Mesh", ["model", "material", "positions", "normals", "uvs", "indices"])
+# model: "model_0" etc.; consecutive Meshes w/ the same model belong to the same model
+# material: texture name
+# positions & normals: float32 (num_vertices, 3)
+# uvs: float32 (num_vertices, 2)
+# indices: uint32 (num_triangles * 3,); into this Mesh's vertices
+
+
+def meshes(bsp) -> Iterator[Mesh]:
+    """A Mesh for each material of each model; supports Respawn, Source & Quake 3 branches"""
+    # NOTE: each model is triangulated all at once (mesh_arrays / world_mesh), then split by material
+    # -- so peak memory is bounded per model, not per map
+    if hasattr(bsp, "mesh_arrays"):  # respawn.titanfall, titanfall2 & apex_legends
+        return respawn_meshes(bsp)
+    elif hasattr(bsp, "world_mesh"):  # valve.source & branches based on it
+        return source_meshes(bsp)
+    elif bsp.branch is quake3:
+        return quake3_meshes(bsp)
+    raise NotImplementedError(f"Cannot export geometry from {bsp.branch.__name__} .bsps")
+
+
+def respawn_meshes(bsp) -> Iterator[Mesh]:
+    for model_index in range(len(bsp.MODELS)):
+        arrays = bsp.mesh_arrays(model_index)
+        for texture, triangles in arrays.materials.items():
+            used, indices = numpy.unique(arrays.indices[triangles], return_inverse=True)
+            yield Mesh(f"model_{model_index}", texture, arrays.positions[used], arrays.normals[used],
+                       arrays.uv0[used], indices.reshape(-1).astype(numpy.uint32))
+
+
+def source_meshes(bsp) -> Iterator[Mesh]:
+    texture_data_names = [bsp.TEXTURE_DATA_STRING_DATA[td.name_index] for td in bsp.TEXTURE_DATA]
+    for model_index in range(len(bsp.MODELS)):
+        world_mesh = bsp.world_mesh(model_index)
+        order = numpy.argsort(world_mesh.texture_data, kind="stable")
+        texture_data, first_triangle, triangle_counts = numpy.unique(world_mesh.texture_data[order],
+                                                                     return_index=True, return_counts=True)
+        for texture_data_index, first, count in zip(texture_data, first_triangle, triangle_counts):
+            corners = (order[first:first + count, None] * 3 + numpy.arange(3)).reshape(-1)
+            texture = texture_data_names[texture_data_index] if texture_data_index != -1 else "none"
+            # world_mesh doesn't share vertices between triangles; merge identical vertices
+            vertices = numpy.hstack([world_mesh.positions[corners], world_mesh.normals[corners],
+                                     world_mesh.uv0[corners]])
+            vertices, indices = numpy.unique(vertices, axis=0, return_inverse=True)
+            yield Mesh(f"model_{model_index}", texture, vertices[:, :3], vertices[:, 3:6], vertices[:, 6:],
+                       indices.reshape(-1).astype(numpy.uint32))
+
+
+def quake3_meshes(bsp) -> Iterator[Mesh]:
+    # NOTE: only PLANAR & TRIANGLE_SOUP faces; PATCH faces (bezier curves) are not tessellated
+    vertices = shared.lump_as_numpy(bsp, "VERTICES")
+    positions = unstructured(vertices["position"])
+    normals = unstructured(vertices["normal"])
+    uvs = unstructured(vertices["uv"]["texture"])
+    mesh_vertices = shared.lump_as_numpy(bsp, "MESH_VERTICES").astype(numpy.int64)
+    textures = [texture.name.partition(b"\0")[0].decode("ascii", "replace") for texture in bsp.TEXTURES]
+    all_faces = shared.lump_as_numpy(bsp, "FACES")
+    for model_index, model in enumerate(bsp.MODELS):
+        faces = all_faces[model.first_face:model.first_face + model.num_faces]
+        surface_types = (quake3.SurfaceType.PLANAR.value, quake3.SurfaceType.TRIANGLE_SOUP.value)
+        faces = faces[numpy.isin(faces["surface_type"], surface_types)]
+        faces = faces[numpy.argsort(faces["texture"], kind="stable")]
+        counts = faces["num_mesh_vertices"].astype(numpy.int64)
+        first_corner = numpy.cumsum(counts) - counts
+        face_of_corner = numpy.repeat(numpy.arange(len(faces)), counts)
+        local_corner = numpy.arange(counts.sum()) - first_corner[face_of_corner]
+        corners = mesh_vertices[faces["first_mesh_vertex"].astype(numpy.int64)[face_of_corner] + local_corner]
+        corners += faces["first_vertex"].astype(numpy.int64)[face_of_corner]
+        texture_indices, first_face = numpy.unique(faces["texture"], return_index=True)
+        stops = [*first_corner[first_face[1:]], len(corners)]
+        for texture_index, start, stop in zip(texture_indices, first_corner[first_face], stops):
+            used, indices = numpy.unique(corners[start:stop], return_inverse=True)
+            yield Mesh(f"model_{model_index}", textures[texture_index], positions[used], normals[used],
+                       uvs[used], indices.reshape(-1).astype(numpy.uint32))
+
+
+def write_obj(bsp, obj_file: io.TextIOBase, chunk_size: int = 65536):
+    """Writes each Mesh as it is generated; nothing is kept after it is written"""
+    # NOTE: v is flipped (1 - v) for .obj uvs
+    obj_file.write(f"# generated with bsp_tool from {bsp.filename}\n")
+    model, num_vertices = None, 0
+    for mesh in meshes(bsp):
+        if mesh.model != model:
+            model = mesh.model
+            obj_file.write(f"o {model}\n")
+        obj_file.write(f"usemtl {mesh.material}\n")
+        for start in range(0, len(mesh.positions), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            numpy.savetxt(obj_file, mesh.positions[chunk], fmt="v %.9g %.9g %.9g")
+            uvs = mesh.uvs[chunk] * (1, -1) + (0, 1)
+            numpy.savetxt(obj_file, uvs, fmt="vt %.6g %.6g")
+            numpy.savetxt(obj_file, mesh.normals[chunk], fmt="vn %.6g %.6g %.6g")
+        for start in range(0, len(mesh.indices), chunk_size * 3):
+            triangles = mesh.indices[start:start + chunk_size * 3].reshape(-1, 3).astype(numpy.int64)
+            triangles += num_vertices + 1  # .obj indices start at 1
+            numpy.savetxt(obj_file, triangles.repeat(3, axis=1), fmt="f %d/%d/%d %d/%d/%d %d/%d/%d")
+        num_vertices += len(mesh.positions)
+
+
+def write_glb(bsp, glb_file: io.BufferedIOBase):
+    """Binary glTF 2.0; vertex data is staged in a temporary file, so only the JSON is kept in memory"""
+    # NOTE: .bsp is +Z up, glTF is +Y up; the root node is rotated to match
+    gltf = {"asset": {"version": "2.0", "generator": "bsp_tool"},
+            "scene": 0, "scenes": [{"nodes": [0]}],
+            "nodes": [{"name": bsp.filename, "rotation": [-math.sqrt(0.5), 0, 0, math.sqrt(0.5)], "children": []}],
+            "meshes": list(), "materials": list(), "accessors": list(), "bufferViews": list(), "buffers": list()}
+    materials = dict()
+    # ^ {"texture": index}
+    with tempfile.TemporaryFile() as bin_file:
+
+        def add_accessor(array: numpy.ndarray, component_type: int, target: int, _type: str) -> int:
+            raw = array.tobytes()
+            gltf["bufferViews"].append({"buffer": 0, "byteOffset": bin_file.tell(),
+                                        "byteLength": len(raw), "target": target})
+            bin_file.write(raw)
+            gltf["accessors"].append({"bufferView": len(gltf["bufferViews"]) - 1, "componentType": component_type,
+                                      "count": len(array), "type": _type})
+            return len(gltf["accessors"]) - 1
+
+        model = None
+        for mesh in meshes(bsp):
+            if len(mesh.indices) == 0:
+                continue
+            if mesh.model != model:
+                model = mesh.model
+                gltf["nodes"][0]["children"].append(len(gltf["nodes"]))
+                gltf["nodes"].append({"name": model, "mesh": len(gltf["meshes"])})
+                gltf["meshes"].append({"name": model, "primitives": list()})
+            if mesh.material not in materials:
+                materials[mesh.material] = len(gltf["materials"])
+                gltf["materials"].append({"name": mesh.material})
+            positions = add_accessor(mesh.positions.astype("<f4"), 5126, 34962, "VEC3")
+            gltf["accessors"][positions].update({"min": mesh.positions.min(axis=0).tolist(),
+                                                 "max": mesh.positions.max(axis=0).tolist()})
+            attributes = {"POSITION": positions,
+                          "NORMAL": add_accessor(mesh.normals.astype("<f4"), 5126, 34962, "VEC3"),
+                          "TEXCOORD_0": add_accessor(mesh.uvs.astype("<f4"), 5126, 34962, "VEC2")}
+            indices = add_accessor(mesh.indices.astype("<u4"), 5125, 34963, "SCALAR")
+            gltf["meshes"][-1]["primitives"].append({"attributes": attributes, "indices": indices,
+                                                     "material": materials[mesh.material]})
+        bin_length = bin_file.tell()
+        # NOTE: every accessor is made of 4 byte components, so each bufferView is already aligned
+        if bin_length > 0:
+            gltf["buffers"].append({"byteLength": bin_length})
+        # NOTE: the glTF schema doesn't allow empty arrays; e.g. if nothing was exported
+        if len(gltf["nodes"][0]["children"]) == 0:
+            del gltf["nodes"][0]["children"]
+        gltf = {key: value for key, value in gltf.items() if value != list()}
+        json_chunk = json.dumps(gltf, separators=(",", ":")).encode()
+        json_chunk += b" " * (-len(json_chunk) % 4)
+        bin_chunk_length = 8 + bin_length if bin_length > 0 else 0
+        glb_file.write(struct.pack("<4s2I", b"glTF", 2, 12 + 8 + len(json_chunk) + bin_chunk_length))
+        glb_file.write(struct.pack("<I4s", len(json_chunk), b"JSON"))
+        glb_file.write(json_chunk)
+        if bin_length > 0:
+            glb_file.write(struct.pack("<I4s", bin_length, b"BIN\0"))
+            bin_file.seek(0)
+            shutil.copyfileobj(bin_file, glb_file)
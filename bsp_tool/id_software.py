@@ -1,12 +1,12 @@
 import collections
 import enum  # for type hints
-import os
 import struct
 from types import ModuleType
-from typing import Dict
+from typing import Any, Dict, Union
 
 from . import base
 from . import lumps
+from . import profiling
 
 
 IdTechLumpHeader = collections.namedtuple("IdTechLumpHeader", ["offset", "length"])
@@ -15,8 +15,9 @@ IdTechLumpHeader = collections.namedtuple("IdTechLumpHeader", ["offset", "length
 class QuakeBsp(base.Bsp):
     file_magic = None
 
-    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True):
-        super(QuakeBsp, self).__init__(branch, filename, autoload)
+    def __init__(self, branch: ModuleType, filename: Union[str, base.BspSource] = "untitled.bsp",
+                 autoload: bool = True, mmap: bool = False, lazy: bool = False, workers: int = 1):
+        super(QuakeBsp, self).__init__(branch, filename, autoload, mmap, lazy, workers)
 
     def __repr__(self):
         branch_script = ".".join(self.branch.__name__.split(".")[-2:])
@@ -24,13 +25,15 @@ class QuakeBsp(base.Bsp):
         return f"<{self.__class__.__name__} '{self.filename}' {branch_script} {version}>"
 
     def _preload(self):
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self._open()
         self.bsp_version = int.from_bytes(self.file.read(4), "little")
         self.file.seek(0, 2)  # move cursor to end of file
         self.bsp_file_size = self.file.tell()
 
         self.headers = dict()
         self.loading_errors: Dict[str, Exception] = dict()
+        self.load_stats: Dict[str, profiling.LoadStats] = dict()
+        self._loadable_lumps = dict()
         for LUMP_enum in self.branch.LUMP:
             LUMP_NAME = LUMP_enum.name
             self.file.seek(self.branch.lump_header_address[LUMP_enum])
@@ -39,24 +42,31 @@ class QuakeBsp(base.Bsp):
             self.headers[LUMP_NAME] = lump_header
             if length == 0:
                 continue  # empty lump
-            try:
-                if LUMP_NAME in self.branch.LUMP_CLASSES:
-                    LumpClass = self.branch.LUMP_CLASSES[LUMP_NAME]
-                    BspLump = lumps.create_BspLump(self.file, lump_header, LumpClass)
-                elif LUMP_NAME in self.branch.SPECIAL_LUMP_CLASSES:
-                    SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_NAME]
-                    self.file.seek(offset)
-                    BspLump = SpecialLumpClass(self.file.read(length))
-                elif LUMP_NAME in self.branch.BASIC_LUMP_CLASSES:
-                    LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_NAME]
-                    BspLump = lumps.create_BasicBspLump(self.file, lump_header, LumpClass)
-                else:
-                    BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            except Exception as exc:
-                self.loading_errors[LUMP_NAME] = exc
-                BspLump = lumps.create_RawBspLump(self.file, lump_header)
-                # NOTE: doesn't decompress LZMA, fix that
-            setattr(self, LUMP_NAME, BspLump)
+            self._loadable_lumps[LUMP_NAME] = lump_header
+        if not self.lazy:
+            self._load_lumps()
+
+    def _load_lump(self, LUMP_NAME: str, lump_header: IdTechLumpHeader) -> Any:
+        """Creates the object for a lump; any errors are noted in self.loading_errors"""
+        try:
+            if LUMP_NAME in self.branch.LUMP_CLASSES:
+                LumpClass = self.branch.LUMP_CLASSES[LUMP_NAME]
+                BspLump = lumps.create_BspLump(self._lump_file, lump_header, LumpClass)
+            elif LUMP_NAME in self.branch.SPECIAL_LUMP_CLASSES:
+                SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_NAME]
+                self.file.seek(lump_header.offset)
+                lump_data = self.file.read(lump_header.length)
+                BspLump = SpecialLumpClass(lump_data)
+            elif LUMP_NAME in self.branch.BASIC_LUMP_CLASSES:
+                LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_NAME]
+                BspLump = lumps.create_BasicBspLump(self._lump_file, lump_header, LumpClass)
+            else:
+                BspLump = lumps.create_RawBspLump(self._lump_file, lump_header)
+        except Exception as exc:
+            self.loading_errors[LUMP_NAME] = exc
+            BspLump = lumps.create_RawBspLump(self._lump_file, lump_header)
+            # NOTE: doesn't decompress LZMA, fix that
+        return BspLump
 
     def _read_header(self, LUMP: enum.Enum) -> IdTechLumpHeader:
         """Reads bytes of lump"""
@@ -85,11 +95,9 @@ class IdTechBsp(base.Bsp):
 
     def _preload(self):
         """Loads filename using the format outlined in this .bsp's branch defintion script"""
-        local_files = os.listdir(self.folder)
-        def is_related(f): return f.startswith(os.path.splitext(self.filename)[0])
-        self.associated_files = [f for f in local_files if is_related(f)]
+        self.associated_files = self._find_associated_files()
         # open .bsp
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self._open()
         file_magic = self.file.read(4)
         assert file_magic == self.file_magic, f"{self.file} is not a valid .bsp!"
         self.bsp_version = int.from_bytes(self.file.read(4), "little")
@@ -98,6 +106,8 @@ class IdTechBsp(base.Bsp):
 
         self.headers = dict()
         self.loading_errors: Dict[str, Exception] = dict()
+        self.load_stats: Dict[str, profiling.LoadStats] = dict()
+        self._loadable_lumps = dict()
         for LUMP_enum in self.branch.LUMP:
             # CHECK: is lump external? (are associated_files overriding)
             lump_header = self._read_header(LUMP_enum)
@@ -105,24 +115,30 @@ class IdTechBsp(base.Bsp):
             self.headers[LUMP_name] = lump_header
             if lump_header.length == 0:
                 continue
-            try:
-                if LUMP_name in self.branch.LUMP_CLASSES:
-                    LumpClass = self.branch.LUMP_CLASSES[LUMP_name]
-                    BspLump = lumps.create_BspLump(self.file, lump_header, LumpClass)
-                elif LUMP_name in self.branch.SPECIAL_LUMP_CLASSES:
-                    SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_name]
-                    self.file.seek(lump_header.offset)
-                    lump_data = self.file.read(lump_header.length)
-                    BspLump = SpecialLumpClass(lump_data)
-                elif LUMP_name in self.branch.BASIC_LUMP_CLASSES:
-                    LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_name]
-                    BspLump = lumps.create_BasicBspLump(self.file, lump_header, LumpClass)
-                else:
-                    BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            except Exception as exc:
-                self.loading_errors[LUMP_name] = exc
-                BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            setattr(self, LUMP_name, BspLump)
+            self._loadable_lumps[LUMP_name] = lump_header
+        if not self.lazy:
+            self._load_lumps()
+
+    def _load_lump(self, LUMP_NAME: str, lump_header: IdTechLumpHeader) -> Any:
+        """Creates the object for a lump; any errors are noted in self.loading_errors"""
+        try:
+            if LUMP_NAME in self.branch.LUMP_CLASSES:
+                LumpClass = self.branch.LUMP_CLASSES[LUMP_NAME]
+                BspLump = lumps.create_BspLump(self._lump_file, lump_header, LumpClass)
+            elif LUMP_NAME in self.branch.SPECIAL_LUMP_CLASSES:
+                SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_NAME]
+                self.file.seek(lump_header.offset)
+                lump_data = self.file.read(lump_header.length)
+                BspLump = SpecialLumpClass(lump_data)
+            elif LUMP_NAME in self.branch.BASIC_LUMP_CLASSES:
+                LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_NAME]
+                BspLump = lumps.create_BasicBspLump(self._lump_file, lump_header, LumpClass)
+            else:
+                BspLump = lumps.create_RawBspLump(self._lump_file, lump_header)
+        except Exception as exc:
+            self.loading_errors[LUMP_NAME] = exc
+            BspLump = lumps.create_RawBspLump(self._lump_file, lump_header)
+        return BspLump
 
     def _read_header(self, LUMP: enum.Enum) -> IdTechLumpHeader:
         self.file.seek(self.branch.lump_header_address[LUMP])
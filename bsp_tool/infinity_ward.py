@@ -3,11 +3,12 @@ import enum
 import os
 import struct
 from types import ModuleType
-from typing import Dict
+from typing import Any, Dict, List, Union
 import warnings
 
 from . import base
 from . import lumps
+from . import profiling
 
 
 LumpHeader = collections.namedtuple("LumpHeader", ["length", "offset"])
@@ -20,16 +21,22 @@ class InfinityWardBsp(base.Bsp):
     # NOTE: Call of Duty 1 .bsp are stored in .pk3 (.zip) archives
     # NOTE: Call of Duty 2 .d3dbsp are stored in .iwd (.zip) archives
 
-    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True):
+    def __init__(self, branch: ModuleType, filename: Union[str, base.BspSource] = "untitled.bsp",
+                 autoload: bool = True, mmap: bool = False, lazy: bool = False, workers: int = 1):
+        filename = self._set_source(filename)
         if not (filename.lower().endswith(".bsp") or filename.lower().endswith(".d3dbsp")):
             # ^ slight alteration to allow .d3dbsp extension
             raise RuntimeError("Not a .bsp")
-        filename = os.path.realpath(filename)
+        if self._source is None:
+            filename = os.path.realpath(filename)
         self.folder, self.filename = os.path.split(filename)
         self.set_branch(branch)
         self.headers = dict()
+        self.mmap = mmap
+        self.lazy = lazy
+        self.workers = workers
         if autoload:
-            if os.path.exists(filename):
+            if self._source is not None or os.path.exists(filename):
                 self._preload()
             else:
                 warnings.warn(UserWarning(f"{filename} not found, creating a new .bsp"))
@@ -37,11 +44,9 @@ class InfinityWardBsp(base.Bsp):
 
     def _preload(self):
         """Loads filename using the format outlined in this .bsp's branch defintion script"""
-        local_files = os.listdir(self.folder)
-        def is_related(f): return f.startswith(os.path.splitext(self.filename)[0])
-        self.associated_files = [f for f in local_files if is_related(f)]
+        self.associated_files = self._find_associated_files()
         # open .bsp
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self._open()
         file_magic = self.file.read(4)
         assert file_magic == self.file_magic, f"{self.file} is not a valid .bsp!"
         self.bsp_version = int.from_bytes(self.file.read(4), "little")
@@ -50,6 +55,8 @@ class InfinityWardBsp(base.Bsp):
 
         self.headers = dict()
         self.loading_errors: Dict[str, Exception] = dict()
+        self.load_stats: Dict[str, profiling.LoadStats] = dict()
+        self._loadable_lumps = dict()
         for LUMP_enum in self.branch.LUMP:
             # CHECK: is lump external? (are associated_files overriding)
             lump_header = self._read_header(LUMP_enum)
@@ -57,24 +64,30 @@ class InfinityWardBsp(base.Bsp):
             self.headers[LUMP_NAME] = lump_header
             if lump_header.length == 0:
                 continue
-            try:
-                if LUMP_NAME in self.branch.LUMP_CLASSES:
-                    LumpClass = self.branch.LUMP_CLASSES[LUMP_NAME]
-                    BspLump = lumps.create_BspLump(self.file, lump_header, LumpClass)
-                elif LUMP_NAME in self.branch.SPECIAL_LUMP_CLASSES:
-                    SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_NAME]
-                    self.file.seek(lump_header.offset)
-                    lump_data = self.file.read(lump_header.length)
-                    BspLump = SpecialLumpClass(lump_data)
-                elif LUMP_NAME in self.branch.BASIC_LUMP_CLASSES:
-                    LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_NAME]
-                    BspLump = lumps.create_BasicBspLump(self.file, lump_header, LumpClass)
-                else:
-                    BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            except Exception as exc:
-                self.loading_errors[LUMP_NAME] = exc
-                BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            setattr(self, LUMP_NAME, BspLump)
+            self._loadable_lumps[LUMP_NAME] = lump_header
+        if not self.lazy:
+            self._load_lumps()
+
+    def _load_lump(self, LUMP_NAME: str, lump_header: LumpHeader) -> Any:
+        """Creates the object for a lump; any errors are noted in self.loading_errors"""
+        try:
+            if LUMP_NAME in self.branch.LUMP_CLASSES:
+                LumpClass = self.branch.LUMP_CLASSES[LUMP_NAME]
+                BspLump = lumps.create_BspLump(self._lump_file, lump_header, LumpClass)
+            elif LUMP_NAME in self.branch.SPECIAL_LUMP_CLASSES:
+                SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_NAME]
+                self.file.seek(lump_header.offset)
+                lump_data = self.file.read(lump_header.length)
+                BspLump = SpecialLumpClass(lump_data)
+            elif LUMP_NAME in self.branch.BASIC_LUMP_CLASSES:
+                LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_NAME]
+                BspLump = lumps.create_BasicBspLump(self._lump_file, lump_header, LumpClass)
+            else:
+                BspLump = lumps.create_RawBspLump(self._lump_file, lump_header)
+        except Exception as exc:
+            self.loading_errors[LUMP_NAME] = exc
+            BspLump = lumps.create_RawBspLump(self._lump_file, lump_header)
+        return BspLump
 
     def _read_header(self, LUMP: enum.Enum) -> LumpHeader:
         self.file.seek(self.branch.lump_header_address[LUMP])
@@ -97,16 +110,22 @@ class D3DBsp(base.Bsp):
     # NOTE: Call of Duty 4 .d3dbsp are stored in .ff archives (see extensions.archive.FastFile)
     # -- lumps are possibly divided into multiple files, quake3 map compilation generates many files
 
-    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True):
+    def __init__(self, branch: ModuleType, filename: Union[str, base.BspSource] = "untitled.bsp",
+                 autoload: bool = True, mmap: bool = False, lazy: bool = False, workers: int = 1):
+        filename = self._set_source(filename, "untitled.d3dbsp")
         if not filename.lower().endswith(".d3dbsp"):
             # ^ slight alteration to allow .d3dbsp extension
             raise RuntimeError("Not a .d3dbsp")
-        filename = os.path.realpath(filename)
+        if self._source is None:
+            filename = os.path.realpath(filename)
         self.folder, self.filename = os.path.split(filename)
         self.set_branch(branch)
         self.headers = dict()
+        self.mmap = mmap
+        self.lazy = lazy
+        self.workers = workers
         if autoload:
-            if os.path.exists(filename):
+            if self._source is not None or os.path.exists(filename):
                 self._preload()
             else:
                 warnings.warn(UserWarning(f"{filename} not found, creating a new .bsp"))
@@ -114,20 +133,27 @@ class D3DBsp(base.Bsp):
 
     def _preload(self):
         """Loads filename using the format outlined in this .bsp's branch defintion script"""
-        local_files = os.listdir(self.folder)
-        def is_related(f): return f.startswith(os.path.splitext(self.filename)[0])
-        self.associated_files = [f for f in local_files if is_related(f)]
+        self.associated_files = self._find_associated_files()
         # open .bsp
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self._open()
         file_magic = self.file.read(4)
         assert file_magic == self.file_magic, f"{self.file} is not a valid .bsp!"
         self.bsp_version = int.from_bytes(self.file.read(4), "little")
-        self.lump_count = int.from_bytes(self.file.read(4), "little")
         self.file.seek(0, 2)  # move cursor to end of file
         self.bsp_file_size = self.file.tell()
         # load headers & lumps
-        self.headers = list()  # order matters
+        self.headers = self._read_headers()  # order matters
         self.loading_errors: Dict[str, Exception] = dict()
+        self.load_stats: Dict[str, profiling.LoadStats] = dict()
+        self._loadable_lumps = {header.name: header for header in self.headers}
+        if not self.lazy:
+            self._load_lumps()
+
+    def _read_headers(self) -> List[CoD4LumpHeader]:
+        """Reads lump_count & all headers from self.file, in file order"""
+        self.file.seek(8)
+        self.lump_count = int.from_bytes(self.file.read(4), "little")
+        headers = list()
         cursor = 12 + (self.lump_count * 8)  # end of headers; for "reading" lumps
         for i in range(self.lump_count):
             # read header
@@ -139,28 +165,11 @@ class D3DBsp(base.Bsp):
             offset = cursor
             # NOTE: could be wrong
             cursor += length
-            LUMP_enum = self.branch.LUMP(_id)
-            LUMP_NAME = LUMP_enum.name
-            lump_header = CoD4LumpHeader(_id, length, offset, LUMP_NAME)
-            self.headers.append(lump_header)
-            try:
-                if LUMP_NAME in self.branch.LUMP_CLASSES:
-                    LumpClass = self.branch.LUMP_CLASSES[LUMP_NAME]
-                    BspLump = lumps.create_BspLump(self.file, lump_header, LumpClass)
-                elif LUMP_NAME in self.branch.SPECIAL_LUMP_CLASSES:
-                    SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_NAME]
-                    self.file.seek(lump_header.offset)
-                    lump_data = self.file.read(lump_header.length)
-                    BspLump = SpecialLumpClass(lump_data)
-                elif LUMP_NAME in self.branch.BASIC_LUMP_CLASSES:
-                    LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_NAME]
-                    BspLump = lumps.create_BasicBspLump(self.file, lump_header, LumpClass)
-                else:
-                    BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            except Exception as exc:
-                self.loading_errors[LUMP_NAME] = exc
-                BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            setattr(self, LUMP_NAME, BspLump)
+            LUMP_NAME = self.branch.LUMP(_id).name
+            headers.append(CoD4LumpHeader(_id, length, offset, LUMP_NAME))
+        return headers
+
+    _load_lump = InfinityWardBsp._load_lump
 
     def _read_header(self, LUMP: enum.Enum) -> CoD4LumpHeader:
         raise NotImplementedError("CoD4LumpHeaders aren't ordered")
@@ -1,11 +1,22 @@
 """handles dynamically loading entries from lumps of all kinds"""
 from __future__ import annotations
 
+import bisect
 import collections
+import concurrent.futures
+import hashlib
 import io
+import itertools
 import lzma
+import mmap
+import os
 import struct
-from typing import Any, Dict, Union
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Union
+
+from .. import profiling
+from ..branches.base import numpy_dtype
 
 
 def _remap_negative_index(index: int, length: int) -> int:
@@ -35,36 +46,413 @@ def _remap_slice(_slice: slice, length: int) -> slice:
     return slice(start, stop, step)
 
 
+def _slice_bounds(indices: range) -> (int, int):
+    "first & last+1 index of a range, regardless of step direction"
+    first, last = indices[0], indices[-1]
+    return min(first, last), max(first, last) + 1
+
+
+def _select(entries: Union[bytearray, list], indices: range, start: int) -> Union[bytearray, list]:
+    "entries[indices], where entries[0] is at index start"
+    stop = indices.stop - start
+    return entries[indices.start - start:stop if stop >= 0 else None:indices.step]
+
+
+class MappedFile(mmap.mmap):
+    """mmap which remembers the name of the file it maps"""
+    name: str
+
+
+def memory_map(file: io.BufferedReader) -> memoryview:
+    """Maps an open file into memory; lumps can then slice the file without any reads"""
+    # NOTE: the mmap stays open for as long as any view of it exists
+    mapped_file = MappedFile(file.fileno(), 0, access=mmap.ACCESS_READ)
+    mapped_file.name = file.name
+    return memoryview(mapped_file)
+
+
+class FilePool:
+    """Keeps up to max_open files (or memory maps) open; the least recently used are closed to make room"""
+    # NOTE: lumps hold PooledFiles, which reopen their file if it was closed
+    max_open: int
+    _open: collections.OrderedDict
+    # ^ {(filename, mmap): file or memoryview}; most recently used last
+    _lock: threading.Lock  # seek & read are one step, PooledFiles of the same file share handles
+
+    def __init__(self, max_open: int = 64):
+        self.max_open = max_open
+        self._open = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<FilePool {len(self._open)} / {self.max_open} files open>"
+
+    def open(self, filename: str, mmap: bool = False) -> PooledFile:
+        """file-like handle; mmap=True reads zero-copy views of a memory map"""
+        return PooledFile(self, filename, mmap)
+
+    def _acquire(self, filename: str, mmap: bool) -> Union[io.BufferedReader, memoryview]:
+        """open file (or memory map), opening it if needed; call with self._lock held"""
+        key = (filename, mmap)
+        if key in self._open:
+            self._open.move_to_end(key)
+            return self._open[key]
+        while len(self._open) >= self.max_open:
+            self._release(*self._open.popitem(last=False))
+        file = profiling.open_file(filename)
+        if mmap:
+            # NOTE: a closed mmap stays mapped until every view of it (e.g. RawBspLump._view) is released
+            with file:
+                file = memory_map(file) if os.path.getsize(filename) > 0 else memoryview(b"")
+        self._open[key] = file
+        return file
+
+    def _release(self, key: (str, bool), file: Union[io.BufferedReader, memoryview]):
+        if not isinstance(file, memoryview):
+            file.close()
+
+    def evict(self, filename: str):
+        """close filename (& any memory map of it); call before the file is rewritten, so it is reopened"""
+        # NOTE: a stale memory map would keep reading the old contents (& old length) of the file
+        filename = os.path.realpath(filename)
+        with self._lock:
+            for key in [k for k in self._open if os.path.realpath(k[0]) == filename]:
+                self._release(key, self._open.pop(key))
+
+    def close(self):
+        """close all open files; PooledFiles will reopen them if read again"""
+        with self._lock:
+            while len(self._open) > 0:
+                self._release(*self._open.popitem())
+
+
+class PooledFile:
+    """Looks like a file opened in "rb" mode, but only holds a FilePool's handle while reading"""
+    name: str  # filename
+    pool: FilePool
+    mmap: bool  # read returns views of a memory map
+    _position: int
+
+    def __init__(self, pool: FilePool, filename: str, mmap: bool = False):
+        self.pool = pool
+        self.name = filename
+        self.mmap = mmap
+        self._position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def __repr__(self):
+        return f"<PooledFile '{self.name}' at {self._position}>"
+
+    def close(self):
+        pass  # NOTE: the pool decides when to close the file
+
+    def read(self, size: int = -1) -> Union[bytes, memoryview]:
+        with self.pool._lock:
+            file = self.pool._acquire(self.name, self.mmap)
+            if self.mmap:
+                end = len(file) if size is None or size < 0 else min(self._position + size, len(file))
+                data = file[self._position:end]
+            else:
+                file.seek(self._position)
+                data = file.read(size)
+        self._position += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 1:
+            offset += self._position
+        elif whence == 2:
+            offset += os.path.getsize(self.name)
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
+
+
+file_pool = FilePool()
+# ^ shared by every ExternalLumpManager (RespawnBsp .bsp_lump files); set max_open to tune
+
+
+class BufferFile:
+    """Looks like a file opened in "rb" mode, but reads from memory; e.g. a .bsp inside a .pk3"""
+    name: str  # not a file on disk; e.g. the name of an archive member
+    view: memoryview  # lumps are slices of this view, like a memory map
+    _position: int
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview], name: str = None):
+        self.view = memoryview(data).cast("B")
+        self.name = name
+        self._position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def __repr__(self):
+        return f"<BufferFile '{self.name}' ({len(self.view)} bytes) at {self._position}>"
+
+    def close(self):
+        pass  # NOTE: lumps may still hold views of the buffer
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self.view) if size is None or size < 0 else min(self._position + size, len(self.view))
+        data = self.view[self._position:end].tobytes()
+        self._position += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 1:
+            offset += self._position
+        elif whence == 2:
+            offset += len(self.view)
+        self._position = offset
+        return offset
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+
+def copy_bytes(src_file: io.BufferedReader, dst_file: io.BufferedWriter, offset: int, length: int,
+               chunk_size: int = 1 << 20):
+    """Copies src_file[offset:offset + length] to the cursor of dst_file, without decoding anything"""
+    # NOTE: os.copy_file_range lets the kernel copy the bytes (Linux only); otherwise bytes are copied in chunks
+    view = getattr(src_file, "view", None)
+    if view is not None:  # BufferFile; already in memory
+        if offset + length > len(view):
+            raise EOFError(f"expected {length} bytes at {offset}, buffer ended after {max(len(view) - offset, 0)}")
+        dst_file.write(view[offset:offset + length])
+        return
+    try:
+        src_fileno = src_file.fileno()
+    except (AttributeError, io.UnsupportedOperation):  # not a file on disk
+        src_fileno = None
+    copied = 0
+    if hasattr(os, "copy_file_range") and src_fileno is not None:
+        dst_file.flush()
+        dst_offset = dst_file.tell()
+        try:
+            while copied < length:
+                count = os.copy_file_range(src_fileno, dst_file.fileno(), length - copied,
+                                           offset + copied, dst_offset + copied)
+                if count == 0:  # end of src_file
+                    break
+                copied += count
+        except OSError:  # unsupported filesystem etc.; copy the rest in python
+            pass
+        dst_file.seek(dst_offset + copied)
+    src_file.seek(offset + copied)
+    while copied < length:
+        chunk = src_file.read(min(chunk_size, length - copied))
+        if len(chunk) == 0:
+            raise EOFError(f"expected {length} bytes at {offset}, file ended after {copied}")
+        dst_file.write(chunk)
+        copied += len(chunk)
+
+
+def is_unchanged(lump: Any, length: int) -> bool:
+    """lump has not been edited since it was loaded; length is the size of the lump (in bytes) when loaded"""
+    # NOTE: SpecialLumpClasses & GameLumps don't track changes, so they are never considered unchanged
+    if isinstance(lump, BspLump):  # BasicBspLump or BspLump
+        return not lump.is_edited()
+    elif isinstance(lump, RawBspLump):
+        return not lump.is_edited() and lump._length == length
+    return False
+
+
+class DecompressionCache:
+    """Saves decompressed lumps to disk, so each lump is only decompressed once"""
+    folder: str
+    max_size: int  # in bytes; least recently used lumps are deleted to stay under this limit
+
+    def __init__(self, folder: str = None, max_size: int = 2 << 30):
+        if folder is None:
+            folder = os.path.join(tempfile.gettempdir(), "bsp_tool_lumps")
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.max_size = max_size
+
+    def __repr__(self):
+        return f"<DecompressionCache '{self.folder}' ({self.max_size} bytes max)>"
+
+    def filename(self, bsp_filename: str, lump_header: collections.namedtuple) -> str:
+        """cache filename for a compressed lump; changes if the .bsp is modified"""
+        key = "|".join(map(str, [os.path.realpath(bsp_filename), os.stat(bsp_filename).st_mtime_ns,
+                                 lump_header.offset, lump_header.fourCC]))
+        return os.path.join(self.folder, f"{hashlib.sha1(key.encode()).hexdigest()}.{lump_header.fourCC}.lump")
+
+    def get(self, bsp_filename: str, lump_header: collections.namedtuple) -> Union[memoryview, None]:
+        """memory map of the decompressed lump, if cached"""
+        filename = self.filename(bsp_filename, lump_header)
+        try:
+            cached_file = open(filename, "rb")
+        except FileNotFoundError:
+            return None
+        with cached_file:
+            if os.fstat(cached_file.fileno()).st_size != lump_header.fourCC:
+                return None  # incomplete / corrupt; will be overwritten
+            os.utime(filename)  # mark as recently used
+            return memory_map(cached_file)
+
+    def put(self, bsp_filename: str, lump_header: collections.namedtuple, data: bytes):
+        filename = self.filename(bsp_filename, lump_header)
+        temp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(temp_filename, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_filename, filename)  # atomic; other processes never see a partial lump
+        self.evict()
+
+    def evict(self):
+        """delete least recently used lumps until the cache is under max_size"""
+        cached = list()
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith(".lump"):
+                stat = entry.stat()
+                cached.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for mtime, size, path in cached)
+        for mtime, size, path in sorted(cached):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:  # still mapped (Windows) or already removed by another process
+                continue
+            total_size -= size
+
+    def clear(self):
+        max_size, self.max_size = self.max_size, 0
+        self.evict()
+        self.max_size = max_size
+
+
+decompression_cache: DecompressionCache = None
+# ^ set to a DecompressionCache to skip decompressing lumps which have been loaded before
+
+
+def _source_filename(file: Union[io.BufferedReader, memoryview]) -> Union[str, None]:
+    """name of the file on disk, if known"""
+    name = getattr(file.obj if isinstance(file, memoryview) else file, "name", None)
+    return name if isinstance(name, str) else None
+
+
+def decompress(data: bytes, actual_size: int = None) -> bytes:
+    """Decodes a Valve LZMA compressed lump"""
+    # have to remap lzma header format slightly
+    lzma_header = struct.unpack("4s2I5c", data[:17])
+    # b"LZMA" = lzma_header[0]
+    if actual_size is None:  # trust the lzma header
+        actual_size = lzma_header[1]
+    assert lzma_header[1] == actual_size
+    # compressed_size = lzma_header[2]
+    properties = b"".join(lzma_header[3:])
+    _filter = lzma._decode_filter_properties(lzma.FILTER_LZMA1, properties)
+    decompressor = lzma.LZMADecompressor(lzma.FORMAT_RAW, None, [_filter])
+    decoded_data = decompressor.decompress(data[17:])
+    decoded_data = decoded_data[:actual_size]  # trim any excess bytes
+    assert len(decoded_data) == actual_size
+    return decoded_data
+
+
+def compress(data: bytes) -> bytes:
+    """Encodes a Valve LZMA compressed lump"""
+    _filter = {"id": lzma.FILTER_LZMA1, "preset": lzma.PRESET_DEFAULT}
+    compressor = lzma.LZMACompressor(lzma.FORMAT_RAW, filters=[_filter])
+    encoded_data = compressor.compress(data) + compressor.flush()
+    properties = lzma._encode_filter_properties(_filter)
+    return struct.pack("4s2I", b"LZMA", len(data), len(encoded_data)) + properties + encoded_data
+
+
+def _compressed_data(file: Union[io.BufferedReader, memoryview], lump_header: collections.namedtuple) -> bytes:
+    if not hasattr(lump_header, "filename"):  # internal compressed lump
+        if isinstance(file, memoryview):
+            return bytes(file[lump_header.offset:lump_header.offset + lump_header.length])
+        file.seek(lump_header.offset)
+        return file.read(lump_header.length)
+    else:  # external compressed lump is unlikely, but possible
+        with open(lump_header.filename, "rb") as lump_file:
+            return lump_file.read()
+
+
+def _cached(file: Union[io.BufferedReader, memoryview], lump_header: collections.namedtuple) -> (str, memoryview):
+    """(source_filename, decompression_cache.get(...))"""
+    source_filename = getattr(lump_header, "filename", None) or _source_filename(file)
+    if decompression_cache is None or source_filename is None:
+        return source_filename, None
+    return source_filename, decompression_cache.get(source_filename, lump_header)
+
+
+def _wrap(file: Union[io.BufferedReader, memoryview], decoded_data: bytes) -> Union[io.BytesIO, memoryview]:
+    return memoryview(decoded_data) if isinstance(file, memoryview) else io.BytesIO(decoded_data)
+
+
 def decompressed(file: io.BufferedReader, lump_header: collections.namedtuple) -> io.BytesIO:
     """Takes a lump and decompresses it if nessecary. Also corrects lump_header offset & length"""
+    # NOTE: if file is a memoryview (see memory_map), the decompressed lump is returned as a memoryview
+    # NOTE: if decompression_cache is set, lumps found in the cache are returned as a memoryview
     if getattr(lump_header, "fourCC", 0) != 0:
-        if not hasattr(lump_header, "filename"):  # internal compressed lump
-            file.seek(lump_header.offset)
-            data = file.read(lump_header.length)
-        else:  # external compressed lump is unlikely, but possible
-            data = open(lump_header.filename, "rb").read()
-        # have to remap lzma header format slightly
-        lzma_header = struct.unpack("4s2I5c", data[:17])
-        # b"LZMA" = lzma_header[0]
-        actual_size = lzma_header[1]
-        assert actual_size == lump_header.fourCC
-        # compressed_size = lzma_header[2]
-        properties = b"".join(lzma_header[3:])
-        _filter = lzma._decode_filter_properties(lzma.FILTER_LZMA1, properties)
-        decompressor = lzma.LZMADecompressor(lzma.FORMAT_RAW, None, [_filter])
-        decoded_data = decompressor.decompress(data[17:])
-        decoded_data = decoded_data[:actual_size]  # trim any excess bytes
-        assert len(decoded_data) == actual_size
-        file = io.BytesIO(decoded_data)
+        source_filename, cached = _cached(file, lump_header)
+        if cached is not None:
+            file = cached
+        else:
+            compressed_data = _compressed_data(file, lump_header)
+            decoded_data = profiling.time_decompression(profiling.current(), decompress, compressed_data,
+                                                        lump_header.fourCC)
+            if decompression_cache is not None and source_filename is not None:
+                decompression_cache.put(source_filename, lump_header, decoded_data)
+            file = _wrap(file, decoded_data)
         # HACK: trick BspLump into recognisind the decompressed lump sze
-        LumpHeader = lump_header.__class__  # how2 edit a tuple
-        lump_header_dict = dict(zip(LumpHeader._fields, lump_header))
-        lump_header_dict["offset"] = 0
-        lump_header_dict["length"] = lump_header.fourCC
-        lump_header = LumpHeader(*[lump_header_dict[f] for f in LumpHeader._fields])
+        lump_header = lump_header._replace(offset=0, length=lump_header.fourCC)
     return file, lump_header
 
 
+def decompressed_all(file: io.BufferedReader, lump_headers: Dict[str, collections.namedtuple],
+                     workers: int = None, load_stats: Dict[str, profiling.LoadStats] = None
+                     ) -> Dict[str, (io.BytesIO, collections.namedtuple)]:
+    """Decompresses every compressed lump at once, across a pool of threads"""
+    # NOTE: lzma releases the GIL while decoding, so lumps are decompressed in parallel
+    # NOTE: if load_stats is given, decompression time is added to load_stats["LUMP_NAME"]
+    # NOTE: returned lump_headers have a fourCC of 0, so they won't be decompressed again
+    # NOTE: lumps which fail to decompress are skipped; decompressed(...) can raise the error later
+    out = dict()
+    # ^ {"LUMP_NAME": (decompressed_file, decompressed_header)}
+    futures = dict()
+    # ^ {"LUMP_NAME": (source_filename, Future)}
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        for lump_name, lump_header in lump_headers.items():
+            if getattr(lump_header, "fourCC", 0) == 0:
+                continue
+            decompressed_header = lump_header._replace(offset=0, length=lump_header.fourCC, fourCC=0)
+            source_filename, cached = _cached(file, lump_header)
+            if cached is not None:
+                out[lump_name] = (cached, decompressed_header)
+                continue
+            data = _compressed_data(file, lump_header)  # reads can't be shared across threads
+            stats = load_stats.setdefault(lump_name, profiling.LoadStats()) if load_stats is not None else None
+            future = executor.submit(profiling.time_decompression, stats, decompress, data, lump_header.fourCC)
+            futures[lump_name] = (source_filename, future)
+        for lump_name, (source_filename, future) in futures.items():
+            lump_header = lump_headers[lump_name]
+            try:
+                decoded_data = future.result()
+            except Exception:
+                continue
+            if decompression_cache is not None and source_filename is not None:
+                decompression_cache.put(source_filename, lump_header, decoded_data)
+            decompressed_header = lump_header._replace(offset=0, length=lump_header.fourCC, fourCC=0)
+            out[lump_name] = (_wrap(file, decoded_data), decompressed_header)
+    return out
+
+
 def create_BspLump(file: io.BufferedReader, lump_header: collections.namedtuple, LumpClass: object = None) -> BspLump:
     if hasattr(lump_header, "fourCC"):
         file, lump_header = decompressed(file, lump_header)
@@ -81,6 +469,11 @@ def create_BspLump(file: io.BufferedReader, lump_header: collections.namedtuple,
 
 
 def create_RawBspLump(file: io.BufferedReader, lump_header: collections.namedtuple) -> RawBspLump:
+    if getattr(lump_header, "fourCC", 0) != 0:
+        try:
+            file, lump_header = decompressed(file, lump_header)
+        except Exception:  # NOTE: lumps which fail to decompress are left compressed
+            pass
     if not hasattr(lump_header, "filename"):
         return RawBspLump(file, lump_header)
     else:
@@ -96,45 +489,85 @@ def create_BasicBspLump(file: io.BufferedReader, lump_header: collections.namedt
         return ExternalBasicBspLump(lump_header, LumpClass)
 
 
+Piece = collections.namedtuple("Piece", ["start", "length", "entries"])
+# ^ a run of consecutive entries in a RawBspLump / BspLump piece table
+# start: index of the first entry; in the original lump (if entries is None), or in entries
+# length: number of entries
+# entries: None if the run is read from the file, otherwise the inserted entries (shared w/ split pieces)
+
+
 class RawBspLump:
     """Maps an open binary file to a list-like object"""
     file: io.BufferedReader  # file opened in "rb" (read-bytes) mode
+    # NOTE: file can also be a memoryview of the whole file (see memory_map)
     offset: int  # position in file where lump begins
     _changes: Dict[int, bytes]
     # ^ {index: new_byte}
+    _entry_size: int = 1
     _length: int  # number of indexable entries
+    _original_length: int  # number of entries in file
+    _blocks: List[List[Piece]]  # runs of original & inserted entries, in order; insert & del only edit these
+    _block_ends: List[int]  # index after the last entry of each block; bisected to find entries
+    _block_size: int = 64  # blocks are split in half once they hold more than twice this many pieces
+    _view: memoryview = None  # file[offset:offset + length]; only if file is a memoryview
 
     def __init__(self, file: io.BufferedReader, lump_header: collections.namedtuple):
         self.file = file
         self.offset = lump_header.offset
-        self._changes = dict()
-        # ^ {index: new_value}
-        self._length = lump_header.length
+        self._reset(lump_header.length)
+        if isinstance(file, memoryview):
+            self._view = file[self.offset:self.offset + lump_header.length]
 
     def __repr__(self):
         return f"<{self.__class__.__name__}; {len(self)} bytes at 0x{id(self):016X}>"
 
+    def __delitem__(self, index: Union[int, slice]):
+        if isinstance(index, int):
+            index = _remap_negative_index(index, self._length)
+            self._delete(index, index + 1)
+        elif isinstance(index, slice):
+            indices = range(*index.indices(self._length))
+            if len(indices) == 0:
+                return
+            elif abs(indices.step) == 1:
+                self._delete(*_slice_bounds(indices))
+            else:  # back to front, so indices aren't shifted by each delete
+                for i in sorted(indices, reverse=True):
+                    self._delete(i, i + 1)
+        else:
+            raise TypeError(f"list indices must be integers or slices, not {type(index)}")
+
     def __getitem__(self, index: Union[int, slice]) -> bytes:
         """Reads bytes from the start of the lump"""
         if isinstance(index, int):
             index = _remap_negative_index(index, self._length)
             if index in self._changes:
                 return self._changes[index]
-            else:
-                self.file.seek(self.offset + index)
-                return self.file.read(1)[0]  # return 1 0-255 integer, matching bytes behaviour
+            piece, offset = self._locate(index)
+            if piece.entries is not None:
+                return piece.entries[piece.start + offset]
+            return self._read_entries(piece.start + offset, 1)[0]  # bytes[0] is a 0-255 integer
         elif isinstance(index, slice):
-            _slice = _remap_slice(index, self._length)
-            return bytes([self[i] for i in range(_slice.start, _slice.stop, _slice.step)])
+            indices = range(*index.indices(self._length))
+            if len(indices) == 0:
+                return self._join(list())
+            start, stop = _slice_bounds(indices)
+            entries = self._read_range(start, stop)
+            changes = [i for i in self._changes if start <= i < stop]
+            if indices.step == 1 and len(changes) == 0:
+                return entries  # zero-copy if memory mapped & unedited
+            entries = self._mutable(entries)
+            for i in changes:
+                entries[i - start] = self._changes[i]
+            return self._immutable(_select(entries, indices, start))
         else:
             raise TypeError(f"list indices must be integers or slices, not {type(index)}")
 
     def __iadd__(self, other_bytes: bytes):
         if not isinstance(other_bytes, bytes):
             raise TypeError(f"can't concat {other_bytes.__class__.__name__} to bytes")
-        start = self._length
-        self._length += len(other_bytes)
-        self[start:] = other_bytes
+        self._insert(self._length, other_bytes)
+        return self
 
     def __setitem__(self, index: Union[int, slice], value: Any):
         # TODO: allow slice assignment to act like insert/extend
@@ -149,11 +582,192 @@ class RawBspLump:
             raise TypeError(f"list indices must be integers or slices, not {type(index)}")
 
     def __iter__(self):
-        return iter([self[i] for i in range(self._length)])
+        return iter(self[::])
 
     def __len__(self):
         return self._length
 
+    def _reset(self, length: int):
+        """forget all edits; length is the number of entries in the file"""
+        self._changes = dict()
+        self._length = length
+        self._original_length = length
+        self._blocks = [[Piece(0, length, None)]] if length > 0 else list()
+        self._block_ends = [length] if length > 0 else list()
+
+    def _read(self, start: int, length: int) -> Union[bytes, memoryview]:
+        """Reads bytes from the lump, ignoring any changes"""
+        if self._view is not None:
+            return self._view[start:start + length]
+        self.file.seek(self.offset + start)
+        return self.file.read(length)
+
+    # NOTE: the methods below convert between entries & bytes; BspLump overrides them
+    def _read_entries(self, start: int, count: int) -> Union[bytes, memoryview]:
+        """count entries from the file, starting at the start-th entry"""
+        return self._read(start, count)
+
+    def _join(self, runs: List[Union[bytes, bytearray]]) -> Union[bytes, memoryview]:
+        if len(runs) == 1 and not isinstance(runs[0], bytearray):
+            return runs[0]
+        return b"".join(runs)
+
+    def _mutable(self, entries: Union[bytes, memoryview]) -> bytearray:
+        return bytearray(entries)
+
+    def _immutable(self, entries: bytearray) -> bytes:
+        return bytes(entries)
+
+    def _run(self, entries: bytes) -> bytearray:
+        """new list of inserted entries"""
+        return bytearray(entries)
+
+    def _pack(self, entries: bytearray) -> bytes:
+        return bytes(entries)
+
+    def _pack_into(self, raw: bytearray, offset: int, entry: int):
+        raw[offset] = entry
+
+    # piece table
+    def _find(self, index: int) -> (int, int, int):
+        """block, position in block & offset within that piece of entry index"""
+        b = bisect.bisect_right(self._block_ends, index)
+        start = self._block_ends[b - 1] if b > 0 else 0
+        for i, piece in enumerate(self._blocks[b]):
+            if index < start + piece.length:
+                return b, i, index - start
+            start += piece.length
+
+    def _locate(self, index: int) -> (Piece, int):
+        """the piece holding entry index & the position of that entry within the piece"""
+        b, i, offset = self._find(index)
+        return self._blocks[b][i], offset
+
+    def _split(self, index: int) -> (int, int):
+        """splits a piece so a piece starts at index; returns the block & position in block of that piece"""
+        if index >= self._length:
+            return len(self._blocks), 0
+        b, i, offset = self._find(index)
+        if offset == 0:
+            return b, i
+        piece = self._blocks[b][i]
+        self._blocks[b][i:i + 1] = [piece._replace(length=offset),
+                                    Piece(piece.start + offset, piece.length - offset, piece.entries)]
+        return b, i + 1
+
+    def _shift(self, b: int, count: int):
+        """moves the ends of blocks[b:] by count entries"""
+        self._block_ends[b:] = [end + count for end in self._block_ends[b:]]
+
+    def _rebalance(self, b: int):
+        """removes block b if empty, or splits it in half if it has grown too large"""
+        block = self._blocks[b]
+        if len(block) == 0:
+            del self._blocks[b]
+            del self._block_ends[b]
+        elif len(block) > 2 * self._block_size:
+            half = len(block) // 2
+            self._blocks[b:b + 1] = [block[:half], block[half:]]
+            self._block_ends.insert(b, self._block_ends[b] - sum(piece.length for piece in block[half:]))
+
+    def _read_range(self, start: int, stop: int) -> Union[bytes, list]:
+        """entries[start:stop], ignoring _changes; each piece is read in one go"""
+        runs = list()
+        b, i, offset = self._find(start)
+        remaining = stop - start
+        while remaining > 0:
+            piece = self._blocks[b][i]
+            count = min(piece.length - offset, remaining)
+            if piece.entries is None:
+                runs.append(self._read_entries(piece.start + offset, count))
+            else:
+                runs.append(piece.entries[piece.start + offset:piece.start + offset + count])
+            remaining -= count
+            i, offset = i + 1, 0
+            if i == len(self._blocks[b]):
+                b, i = b + 1, 0
+        return self._join(runs)
+
+    def _insert(self, index: int, entries: Union[bytes, List[Any]]):
+        """entries become self[index:index + len(entries)]; later entries & changes are shifted back"""
+        count = len(entries)
+        if count == 0:
+            return
+        last = self._blocks[-1][-1] if len(self._blocks) > 0 else None
+        if index == self._length and last is not None and last.entries is not None \
+                and last.start + last.length == len(last.entries):
+            last.entries.extend(entries)  # appending to the last inserted run; no new piece
+            self._blocks[-1][-1] = last._replace(length=last.length + count)
+            self._block_ends[-1] += count
+        else:
+            b, i = self._split(index)
+            if b == len(self._blocks):  # appending
+                if b == 0 or len(self._blocks[-1]) >= self._block_size:
+                    self._blocks.append(list())
+                    self._block_ends.append(self._length)
+                b, i = len(self._blocks) - 1, len(self._blocks[-1])
+            self._blocks[b].insert(i, Piece(0, count, self._run(entries)))
+            self._shift(b, count)
+            self._rebalance(b)
+        self._length += count
+        if len(self._changes) > 0:
+            self._changes = {(i + count if i >= index else i): e for i, e in self._changes.items()}
+
+    def _delete(self, start: int, stop: int):
+        """removes entries[start:stop]; later entries & changes are shifted forward"""
+        count = stop - start
+        if count <= 0:
+            return
+        b, i = self._split(start)
+        b2, i2 = self._split(stop)  # never moves the piece at start
+        if b == b2:
+            del self._blocks[b][i:i2]
+            self._shift(b, -count)
+        else:  # remove the tail of block b, whole blocks in between & the head of block b2
+            del self._blocks[b][i:]
+            self._block_ends[b] = start
+            if b2 < len(self._blocks):
+                del self._blocks[b2][:i2]
+            del self._blocks[b + 1:b2]
+            del self._block_ends[b + 1:b2]
+            self._shift(b + 1, -count)
+        for touched in reversed(range(b, min(b + 2, len(self._blocks)))):
+            self._rebalance(touched)
+        self._length -= count
+        if len(self._changes) > 0:
+            self._changes = {(i - count if i >= stop else i): e
+                             for i, e in self._changes.items() if not start <= i < stop}
+
+    def is_edited(self) -> bool:
+        """any entries have been changed, inserted or deleted since loading"""
+        if len(self._changes) != 0 or self._length != self._original_length:
+            return True
+        return self._original_length > 0 and self._blocks != [[Piece(0, self._original_length, None)]]
+
+    def iter_bytes(self, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+        """Streams the whole lump, with any changes applied; one piece (or chunk_size bytes of a piece) at a time"""
+        changed = sorted(self._changes)
+        chunk_length = max(chunk_size // self._entry_size, 1)
+        index = 0  # of the first entry in the chunk
+        for piece in itertools.chain.from_iterable(self._blocks):
+            for start in range(piece.start, piece.start + piece.length, chunk_length):
+                count = min(chunk_length, piece.start + piece.length - start)
+                if piece.entries is None:
+                    raw = self._read(start * self._entry_size, count * self._entry_size)
+                else:
+                    raw = self._pack(piece.entries[start:start + count])
+                first, last = bisect.bisect_left(changed, index), bisect.bisect_left(changed, index + count)
+                if first != last:
+                    raw = bytearray(raw)
+                    for i in changed[first:last]:
+                        self._pack_into(raw, (i - index) * self._entry_size, self._changes[i])
+                yield raw
+                index += count
+
+    def as_bytes(self) -> bytes:
+        """Reads the whole lump at once, with any changes applied"""
+        return b"".join(self.iter_bytes())
+
 
 class BspLump(RawBspLump):
     """Dynamically reads LumpClasses from a binary file"""
@@ -165,60 +779,73 @@ class BspLump(RawBspLump):
     # NOTE: there are no checks to ensure changes are the correct type or size
     _entry_size: int  # sizeof(LumpClass)
     _length: int  # number of indexable entries
+    _original_length: int  # number of entries in file (inserted entries are only in _blocks)
+    _struct: struct.Struct  # precompiled LumpClass._format
+    _view: memoryview = None  # file[offset:offset + length]; only if file is a memoryview
 
     def __init__(self, file: io.BufferedReader, lump_header: collections.namedtuple, LumpClass: object):
         self.file = file
         self.offset = lump_header.offset
-        self._changes = dict()  # changes must be applied externally
-        self._entry_size = struct.calcsize(LumpClass._format)
+        self._struct = struct.Struct(LumpClass._format)
+        self._entry_size = self._struct.size
         if lump_header.length % self._entry_size != 0:
             raise RuntimeError(f"LumpClass does not divide lump evenly! ({lump_header.length} / {self._entry_size})")
-        self._length = lump_header.length // self._entry_size
+        self._reset(lump_header.length // self._entry_size)  # changes must be applied externally
         self.LumpClass = LumpClass
+        if isinstance(file, memoryview):
+            self._view = file[self.offset:self.offset + lump_header.length]
 
     def __repr__(self):
         return f"<{self.__class__.__name__}({len(self)} {self.LumpClass.__name__}) at 0x{id(self):016X}>"
 
-    def __delitem__(self, index: Union[int, slice]):
-        if isinstance(index, int):
-            index = _remap_negative_index(index, self._length)
-            self[index:] = self[index + 1:]
-            self._length -= 1
-        elif isinstance(index, slice):
-            _slice = _remap_slice(index, self._length)
-            for i in range(_slice.start, _slice.stop, _slice.step):
-                del self[i]
-        else:
-            raise TypeError(f"list indices must be integers or slices, not {type(index)}")
+    # NOTE: __getitem__ (inherited) reads bytes from self.file & returns LumpClass(es)
+    # -- read bytes -> struct.unpack tuples -> LumpClass
 
-    def __getitem__(self, index: Union[int, slice]):
-        """Reads bytes from self.file & returns LumpClass(es)"""
-        # read bytes -> struct.unpack tuples -> LumpClass
-        # NOTE: BspLump[index] = LumpClass(entry)
-        if isinstance(index, int):
-            index = _remap_negative_index(index, self._length)
-            if index in self._changes:
-                return self._changes[index]
-            else:
-                self.file.seek(self.offset + (index * self._entry_size))
-                _tuple = struct.unpack(self.LumpClass._format, self.file.read(self._entry_size))
-                return self.LumpClass.from_tuple(_tuple)
-        elif isinstance(index, slice):  # LAZY HACK
-            _slice = _remap_slice(index, self._length)
-            out = list()
-            for i in range(_slice.start, _slice.stop, _slice.step):
-                out.append(self[i])
-            return out
-        else:
-            raise TypeError(f"list indices must be integers or slices, not {type(index)}")
+    def _entries(self, raw: bytes) -> List[Any]:
+        """Decodes consecutive entries from raw bytes"""
+        return list(map(self.LumpClass.from_tuple, self._struct.iter_unpack(raw)))
+
+    def _as_tuple(self, entry: Any) -> tuple:
+        return entry.flat()
+
+    def _read_entries(self, start: int, count: int) -> List[Any]:
+        return self._entries(self._read(start * self._entry_size, count * self._entry_size))
+
+    def _join(self, runs: List[List[Any]]) -> List[Any]:
+        if len(runs) == 1:
+            return runs[0]  # already a new list
+        return list(itertools.chain.from_iterable(runs))
+
+    def _mutable(self, entries: List[Any]) -> List[Any]:
+        return entries
+
+    def _immutable(self, entries: List[Any]) -> List[Any]:
+        return entries
+
+    def _run(self, entries: List[Any]) -> List[Any]:
+        return list(entries)
+
+    def _pack(self, entries: List[Any]) -> bytes:
+        return b"".join(self._struct.pack(*self._as_tuple(entry)) for entry in entries)
+
+    def _pack_into(self, raw: bytearray, offset: int, entry: Any):
+        self._struct.pack_into(raw, offset, *self._as_tuple(entry))
+
+    def as_numpy(self):  # -> numpy.ndarray
+        """Entire lump as a read-only numpy structured array (LumpClass.numpy_dtype)"""
+        import numpy  # requires: pip install numpy
+        if self._view is not None and not self.is_edited():
+            return numpy.frombuffer(self._view, self._dtype())  # zero-copy
+        return numpy.frombuffer(self.as_bytes(), self._dtype())
+
+    def _dtype(self):  # -> numpy.dtype
+        return self.LumpClass.numpy_dtype()
 
     def append(self, entry):
-        self._length += 1
-        self[-1] = entry
+        self._insert(self._length, [entry])
 
     def extend(self, entries: bytes):
-        for entry in entries:
-            self.append(entry)
+        self._insert(self._length, list(entries))
 
     def find(self, **kwargs):
         """Returns all lump entries which have the queried values [e.g. find(x=0)]"""
@@ -230,11 +857,12 @@ class BspLump(RawBspLump):
         return out
 
     def insert(self, index: int, entry: Any):
-        self._length += 1
-        self[index + 1:] = self[index:]
-        self[index] = entry
+        # NOTE: like list.insert, out of range indices insert at the start / end
+        if index < 0:
+            index = max(self._length + index, 0)
+        self._insert(min(index, self._length), [entry])
 
-    def pop(self, index: Union[int, slice]) -> Union[int, bytes]:
+    def pop(self, index: int = -1) -> Any:
         out = self[index]
         del self[index]
         return out
@@ -251,84 +879,67 @@ class BasicBspLump(BspLump):
     _entry_size: int  # sizeof(LumpClass)
     _length: int  # number of indexable entries
 
-    def __getitem__(self, index: Union[int, slice]):
-        """Reads bytes from self.file & returns LumpClass(es)"""
-        # read bytes -> struct.unpack tuples -> LumpClass
-        # NOTE: BspLump[index] = LumpClass(entry)
-        if isinstance(index, int):
-            index = _remap_negative_index(index, self._length)
-            self.file.seek(self.offset + (index * self._entry_size))
-            raw_entry = struct.unpack(self.LumpClass._format, self.file.read(self._entry_size))
-            # NOTE: only the following line has changed
-            return self.LumpClass(raw_entry[0])
-        elif isinstance(index, slice):
-            _slice = _remap_slice(index, self._length)
-            out = list()
-            for i in range(_slice.start, _slice.stop, _slice.step):
-                out.append(self[i])
-            return out
-        else:
-            raise TypeError(f"list indices must be integers or slices, not {type(index)}")
+    def _entries(self, raw: bytes) -> List[Any]:
+        """Decodes consecutive entries from raw bytes"""
+        # NOTE: only this method & _as_tuple differ from BspLump
+        return [self.LumpClass(_tuple[0]) for _tuple in self._struct.iter_unpack(raw)]
+
+    def _as_tuple(self, entry: Any) -> tuple:
+        return (entry,)
+
+    def _dtype(self):  # -> numpy.dtype
+        return numpy_dtype(None, self.LumpClass._format)
 
 
 class ExternalRawBspLump(RawBspLump):
-    """Maps an open binary file to a list-like object"""
-    file: io.BufferedReader  # file opened in "rb" (read-bytes) mode
-    offset: int  # position in file where lump begins
-    _changes: Dict[int, bytes]
-    # ^ {index: new_byte}
-    _length: int  # number of indexable entries
-    # -- should also override any returned entries with _changes
+    """RawBspLump of a whole .bsp_lump file; read through a FilePool (file_pool by default)"""
+    # NOTE: lump_header is an ExternalLumpHeader; the .bsp_lump file is the entire lump
 
-    def __init__(self, lump_header: collections.namedtuple):
-        self.file = open(lump_header.filename, "rb")
-        self.offset = 0
-        self._changes = dict()  # changes must be applied externally
-        self._length = lump_header.filesize
+    def __init__(self, lump_header: collections.namedtuple, pool: FilePool = None, mmap: bool = False):
+        pool = file_pool if pool is None else pool
+        external_header = lump_header._replace(offset=0, length=lump_header.filesize)
+        super(ExternalRawBspLump, self).__init__(pool.open(lump_header.filename, mmap), external_header)
 
 
 class ExternalBspLump(BspLump):
-    """Dynamically reads LumpClasses from a binary file"""
+    """BspLump of a whole .bsp_lump file; read through a FilePool (file_pool by default)"""
     # NOTE: this class does not handle compressed lumps
-    file: io.BufferedReader  # file opened in "rb" (read-bytes) mode
-    offset: int  # position in file where lump begins
-    LumpClass: object
-    _changes: Dict[int, Any]
-    # ^ {index: LumpClass(new_entry)}
-    # NOTE: there are no checks to ensure changes are the correct type or size
-    _entry_size: int  # sizeof(LumpClass)
-    _length: int  # number of indexable entries
 
-    def __init__(self, lump_header: collections.namedtuple, LumpClass: object):
-        super(ExternalBspLump, self).__init__(None, lump_header, LumpClass)
-        self.file = open(lump_header.filename, "rb")
-        self.offset = 0  # NOTE: 16 if ValveBsp
-        self._changes = dict()  # changes must be applied externally
+    def __init__(self, lump_header: collections.namedtuple, LumpClass: object, pool: FilePool = None,
+                 mmap: bool = False):
+        pool = file_pool if pool is None else pool
+        external_header = lump_header._replace(offset=0, length=lump_header.filesize)
+        super(ExternalBspLump, self).__init__(pool.open(lump_header.filename, mmap), external_header, LumpClass)
 
 
 class ExternalBasicBspLump(BasicBspLump):
-    """Dynamically reads LumpClasses from a binary file"""
+    """BasicBspLump of a whole .bsp_lump file; read through a FilePool (file_pool by default)"""
     # NOTE: this class does not handle compressed lumps
-    file: io.BufferedReader  # file opened in "rb" (read-bytes) mode
-    offset: int  # position in file where lump begins
-    _changes: Dict[int, Any]
-    # ^ {index: LumpClass(new_entry)}
-    _length: int  # number of indexable entries
 
-    def __init__(self, lump_header: collections.namedtuple, LumpClass: object):
-        super(ExternalBasicBspLump, self).__init__(None, lump_header, LumpClass)
-        self.file = open(lump_header.filename, "rb")
-        self.offset = 0
-        self._changes = dict()  # changes must be applied externally
+    def __init__(self, lump_header: collections.namedtuple, LumpClass: object, pool: FilePool = None,
+                 mmap: bool = False):
+        pool = file_pool if pool is None else pool
+        external_header = lump_header._replace(offset=0, length=lump_header.filesize)
+        super(ExternalBasicBspLump, self).__init__(pool.open(lump_header.filename, mmap), external_header, LumpClass)
+
+
+ChildLumpHeader = collections.namedtuple("ChildLumpHeader", ["offset", "length"])
+# ^ decompressed GameLump child lump
 
 
 class GameLump:
     GameLumpHeaderClass: Any  # used for reads / writes
+    LumpClasses: Dict[str, Dict[int, Any]]
+    # ^ {"child_lump": {version: SpecialLumpClass}}
     headers: Dict[str, Any]
     # ^ {"child_lump": GameLumpHeader}
     is_external = False
     loading_errors: Dict[str, Any]
-    # ^ {"child_lump": Error}
+    # ^ {"child_lump": Error}; filled in as child lumps are loaded
+    _raw_children: Dict[str, memoryview]
+    # ^ {"child_lump": raw_bytes}; still compressed if (header.flags & 1)
+    _decompressed: Dict[str, bytes]
+    # ^ {"child_lump": decompressed_bytes}; decompressed ahead of time (workers > 1)
 
     # NOTE: https://github.com/ValveSoftware/source-sdk-2013/blob/master/sp/src/public/gamebspfile.h#L25
     # -- ^ lists a few possible child lumps:
@@ -336,48 +947,105 @@ class GameLump:
     # -- dplt: Detail Prop Lighting
     # -- dprp: Detail Props (procedural grass)
     # -- sprp: Static Props
+    # NOTE: child lumps are loaded on first access (see __getattr__)
 
-    def __init__(self, file: io.BufferedReader, lump_header: collections.namedtuple,
-                 LumpClasses: Dict[str, object], GameLumpHeaderClass: object):
+    def __init__(self, file: Union[io.BufferedReader, memoryview], lump_header: collections.namedtuple,
+                 LumpClasses: Dict[str, object], GameLumpHeaderClass: object, workers: int = 1):
         self.GameLumpHeaderClass = GameLumpHeaderClass
+        self.LumpClasses = LumpClasses
         self.loading_errors = dict()
-        lump_offset = 0
-        if not hasattr(lump_header, "filename"):
-            lump_offset = lump_header.offset
-            file.seek(lump_offset)
+        self.is_external = hasattr(lump_header, "filename")
+        # read the whole lump at once; child lumps are views of it
+        if self.is_external:
+            data = memoryview(file.read())
+            file.close()
+        elif isinstance(file, memoryview):
+            data = file[lump_header.offset:lump_header.offset + lump_header.length]
         else:
-            self.is_external = True
-        game_lumps_count = int.from_bytes(file.read(4), "little")
+            file.seek(lump_header.offset)
+            data = memoryview(file.read(lump_header.length))
+        game_lumps_count = int.from_bytes(data[:4], "little")
+        header_size = struct.calcsize(GameLumpHeaderClass._format)
         self.headers = dict()
         # {"child_name": child_header}
         for i in range(game_lumps_count):
-            child_header = GameLumpHeaderClass.from_stream(file)
-            if self.is_external:  # HACK (does this ever happen?)
-                child_header.offset = child_header.offset - lump_header.offset
+            child_header = GameLumpHeaderClass.from_bytes(bytes(data[4 + i * header_size:4 + (i + 1) * header_size]))
             child_name = child_header.id.decode("ascii")[::-1]  # b"prps" -> "sprp"
             self.headers[child_name] = child_header
-        # load child lumps (SpecialLumpClasses)
-        # TODO: check for skipped bytes / padding
-        # TODO: defer loading to __getattr__ ?
+        # NOTE: child lump offsets are relative to the .bsp, even in .bsp_lump files
+        # NOTE: compressed child lumps have flags & 1; length is the decompressed size
+        # -- compressed size is the distance to the next child lump (an empty child lump is added to mark the end)
+        child_ends = sorted({*[h.offset for h in self.headers.values()], lump_header.offset + len(data)})
+        self._raw_children = dict()
         for child_name, child_header in self.headers.items():
-            child_LumpClass = LumpClasses.get(child_name, dict()).get(child_header.version, None)
-            if child_LumpClass is None:
-                setattr(self, child_name, create_RawBspLump(file, child_header))
+            start = child_header.offset - lump_header.offset
+            if getattr(child_header, "flags", 0) & 1:
+                end = min(e for e in child_ends if e > child_header.offset) - lump_header.offset
             else:
-                file.seek(child_header.offset)
+                end = start + child_header.length
+            self._raw_children[child_name] = data[start:end]
+        self._decompressed = dict()
+        if workers != 1:
+            self._decompressed = self._decompressed_children(workers)
+
+    def __getattr__(self, child_name: str) -> Any:
+        """Loads child lumps on first access"""
+        # NOTE: only called if child_name isn't already an attribute; i.e. the child lump isn't loaded
+        if child_name not in self.__dict__.get("headers", dict()):
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{child_name}'")
+        child_lump = self._load_child(child_name)
+        setattr(self, child_name, child_lump)
+        return child_lump
+
+    def _load_child(self, child_name: str) -> Any:
+        """Creates the object for a child lump; any errors are noted in self.loading_errors"""
+        child_header = self.headers[child_name]
+        raw_child = self._raw_children[child_name]
+        if getattr(child_header, "flags", 0) & 1:
+            try:
+                raw_child = self._decompressed.pop(child_name, None)
+                if raw_child is None:
+                    compressed = bytes(self._raw_children[child_name])
+                    raw_child = profiling.time_decompression(profiling.current(), decompress, compressed)
+                raw_child = memoryview(raw_child)
+            except Exception as exc:
+                self.loading_errors[child_name] = exc
+                compressed = self._raw_children[child_name]
+                return RawBspLump(compressed, ChildLumpHeader(0, len(compressed)))
+        child_LumpClass = self.LumpClasses.get(child_name, dict()).get(child_header.version, None)
+        if child_LumpClass is not None:
+            try:
+                return child_LumpClass(bytes(raw_child))
+            except Exception as exc:
+                self.loading_errors[child_name] = exc
+        return RawBspLump(raw_child, ChildLumpHeader(0, len(raw_child)))
+
+    def _decompressed_children(self, workers: int = 1) -> Dict[str, bytes]:
+        """Decompresses all compressed child lumps at once, across a pool of threads"""
+        compressed = [n for n, h in self.headers.items() if getattr(h, "flags", 0) & 1]
+        if len(compressed) == 0:
+            return dict()
+        futures = dict()
+        # ^ {"child_name": Future}
+        stats = profiling.current()  # GAME_LUMP's LoadStats
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            for child_name in compressed:
+                data = bytes(self._raw_children[child_name])
+                futures[child_name] = executor.submit(profiling.time_decompression, stats, decompress, data)
+            out = dict()
+            for child_name, future in futures.items():
                 try:
-                    child_lump = child_LumpClass(file.read(child_header.length))
-                except Exception as exc:
-                    self.loading_errors[child_name] = exc
-                    child_lump = create_RawBspLump(file, child_header)
-                setattr(self, child_name, child_lump)
-        if self.is_external:
-            file.close()
+                    out[child_name] = future.result()
+                except Exception:  # NOTE: _load_child will raise the error again & note it in loading_errors
+                    continue
+        return out
 
     def as_bytes(self, lump_offset=0):
         """lump_offset makes headers relative to the file"""
         # NOTE: ValveBsp .lmp external lumps have a 16 byte header
         # NOTE: RespawnBsp .bsp_lump offsets are relative to the internal .bsp GAME_LUMP.offset
+        # NOTE: child lumps which were never loaded are copied as-is (still compressed, if they were)
+        # -- loaded child lumps are re-encoded & saved uncompressed
         out = []
         out.append(len(self.headers).to_bytes(4, "little"))
         headers = []
@@ -385,16 +1053,19 @@ class GameLump:
         cursor_offset = lump_offset + 4 + len(self.headers) * struct.calcsize(self.GameLumpHeaderClass._format)
         # write child lumps
         for child_name, child_header in self.headers.items():
-            child_lump = getattr(self, child_name)
-            if isinstance(child_lump, RawBspLump):
-                child_lump_bytes = child_lump[::]
+            child_header = self.GameLumpHeaderClass.from_bytes(child_header.as_bytes())  # copy
+            child_lump = self.__dict__.get(child_name, None)
+            if child_lump is None or (isinstance(child_lump, RawBspLump) and not child_lump.is_edited()):  # untouched
+                child_lump_bytes = self._raw_children[child_name]
             else:
-                child_lump_bytes = child_lump.as_bytes()  # SpecialLumpClass method
+                child_lump_bytes = child_lump.as_bytes()  # RawBspLump or SpecialLumpClass method
+                child_header.length = len(child_lump_bytes)
+                if hasattr(child_header, "flags"):
+                    child_header.flags &= ~1  # no longer compressed
             out.append(child_lump_bytes)
             # recalculate header
             child_header.offset = cursor_offset
-            child_header.length = len(child_lump_bytes)
-            cursor_offset += child_header.length
+            cursor_offset += len(child_lump_bytes)
             headers.append(child_header)
         # and finally inject the headers back in before "writing"
         headers = [h.as_bytes() for h in headers]
@@ -0,0 +1,160 @@
+"""Opt-in measurements of each lump as it loads; does nothing unless enabled
+
+from bsp_tool import load_bsp, profiling
+profiling.enable()  # or profiling.enable(hook, trace_allocations=True)
+bsp = load_bsp("map.bsp")
+bsp.load_stats["ENTITIES"]  # LoadStats(wall_time=..., bytes_read=..., ...)"""
+from __future__ import annotations
+import contextlib
+import contextvars
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Union
+
+
+class LoadStats:
+    """Measurements taken while loading a single lump"""
+    wall_time: float = 0.0  # seconds
+    bytes_read: int = 0  # from files opened w/ open_file; memory mapped lumps read nothing while loading
+    seeks: int = 0
+    reads: int = 0
+    decompression_time: float = 0.0  # seconds (LZMA), summed across threads
+    # NOTE: load_bsp(..., workers=n) decompresses lumps before they load; this time isn't part of wall_time
+    peak_allocation: Union[int, None] = None  # bytes; only measured if tracemalloc is tracing (Python 3.9+)
+
+    def __repr__(self):
+        fields = ", ".join(f"{attr}={getattr(self, attr)!r}" for attr in self.__annotations__)
+        return f"LoadStats({fields})"
+
+    def as_dict(self) -> Dict[str, Union[int, float, None]]:
+        return {attr: getattr(self, attr) for attr in self.__annotations__}
+
+
+enabled: bool = False
+hooks: List[Callable[[Any, str, LoadStats], None]] = list()
+# ^ [hook(bsp, "LUMP_NAME", LoadStats)]; called after each lump is loaded (e.g. to forward to metrics)
+_current = contextvars.ContextVar("current_lump_stats", default=None)
+# ^ LoadStats of the lump being loaded; reads & decompression are added to this
+_lock = threading.Lock()  # decompression_time is added from many threads
+_started_tracemalloc: bool = False
+
+
+def enable(hook: Callable[[Any, str, LoadStats], None] = None, trace_allocations: bool = False):
+    """Measure lumps loaded from now on in bsp.load_stats; trace_allocations starts tracemalloc (slow!)"""
+    global enabled, _started_tracemalloc
+    enabled = True
+    if hook is not None and hook not in hooks:
+        hooks.append(hook)
+    if trace_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+
+
+def disable():
+    """Stop measuring lumps & remove all hooks"""
+    global enabled, _started_tracemalloc
+    enabled = False
+    hooks.clear()
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def current() -> Union[LoadStats, None]:
+    """LoadStats of the lump being loaded (if any)"""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def measure(bsp: Any, lump_name: str) -> Iterator[Union[LoadStats, None]]:
+    """Measures everything inside the with block as loading bsp.load_stats[lump_name]"""
+    # NOTE: peak_allocation needs tracemalloc.reset_peak (Python 3.9+); otherwise it is left as None
+    # NOTE: tracemalloc's peak is process-wide; lumps loaded at the same time (workers > 1) skew each other's peaks
+    if not enabled:
+        yield None
+        return
+    stats = bsp.load_stats.setdefault(lump_name, LoadStats())
+    token = _current.set(stats)
+    tracing = tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak")
+    if tracing:
+        allocated = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.wall_time += time.perf_counter() - start
+        if tracing:
+            peak = tracemalloc.get_traced_memory()[1] - allocated
+            stats.peak_allocation = max(stats.peak_allocation or 0, peak)
+        _current.reset(token)
+        for hook in hooks:
+            hook(bsp, lump_name, stats)
+
+
+def load_lump(bsp: Any, lump_name: str, lump_header: Any) -> Any:
+    """bsp._load_lump(lump_name, lump_header), measured in bsp.load_stats"""
+    with measure(bsp, lump_name):
+        return bsp._load_lump(lump_name, lump_header)
+
+
+def time_decompression(stats: Union[LoadStats, None], decompress: Callable, *args) -> Any:
+    """decompress(*args), adding the time taken to stats.decompression_time; safe to call from any thread"""
+    if stats is None:
+        return decompress(*args)
+    start = time.perf_counter()
+    try:
+        return decompress(*args)
+    finally:
+        duration = time.perf_counter() - start
+        with _lock:
+            stats.decompression_time += duration
+
+
+class CountingFile:
+    """Wraps a file opened in "rb" mode; seeks & reads are counted in the LoadStats of the lump being loaded"""
+    file: Any  # io.BufferedReader
+
+    def __init__(self, file: Any):
+        self.file = file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.file.close()
+
+    def __getattr__(self, attr: str) -> Any:  # name, fileno, tell, close etc.
+        return getattr(self.file, attr)
+
+    def __repr__(self):
+        return f"<CountingFile {self.file!r}>"
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.file.read(size)
+        stats = _current.get()
+        if stats is not None:
+            stats.reads += 1
+            stats.bytes_read += len(data)
+        return data
+
+    def readline(self, size: int = -1) -> bytes:
+        line = self.file.readline(size)
+        stats = _current.get()
+        if stats is not None:
+            stats.reads += 1
+            stats.bytes_read += len(line)
+        return line
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        stats = _current.get()
+        if stats is not None:
+            stats.seeks += 1
+        return self.file.seek(offset, whence)
+
+
+def open_file(filename: str) -> Any:
+    """open(filename, "rb"); wrapped in a CountingFile if profiling is enabled"""
+    file = open(filename, "rb")
+    return CountingFile(file) if enabled else file
@@ -5,11 +5,12 @@ import os
 import shutil
 import struct
 from types import MethodType, ModuleType
-from typing import Dict
+from typing import Any, Dict, Union
 
 from . import lumps
+from . import profiling
 from . import valve
-from .base import LumpHeader
+from .base import BspSource, LumpHeader
 from .branches import shared
 
 
@@ -24,11 +25,15 @@ class ExternalLumpManager:
     file_magic: bytes
     filename: str
     folder: str
+    mmap: bool  # lumps read views of memory mapped .bsp_lump files
     # unique to external lumps
+    file_pool: lumps.FilePool  # opens (& closes) .bsp_lump files; lumps.file_pool unless replaced
     headers: Dict[str, ExternalLumpHeader]
     # ^ {"LUMP_NAME": ExternalLumpHeader}
     loading_errors: Dict[str, Exception]
     # ^ {"LUMP_NAME": Error}
+    load_stats: Dict[str, profiling.LoadStats]
+    # ^ {"LUMP_NAME": LoadStats}; only filled in if profiling is enabled
 
     def __init__(self, bsp: RespawnBsp):
         self.filename = bsp.filename
@@ -36,9 +41,12 @@ class ExternalLumpManager:
         self.branch = bsp.branch
         self.bsp_version = bsp.bsp_version
         self.file_magic = bsp.file_magic
+        self.mmap = bsp.mmap
+        self.file_pool = lumps.file_pool
         # generate headers
         self.headers = dict()
         self.loading_errors = dict()
+        self.load_stats = dict()
         for LUMP in bsp.branch.LUMP:
             lump_filename = f"{bsp.filename}.{LUMP.value:04x}.bsp_lump"
             if lump_filename not in bsp.associated_files:
@@ -69,45 +77,51 @@ class ExternalLumpManager:
         lump_header = self.headers[lump_name]
         if lump_header.filesize == 0:
             raise RuntimeError(f"{lump_name} lump's .bsp_lump is empty!")
+        if profiling.enabled:
+            ExternalBspLump = profiling.load_lump(self, lump_name, lump_header)
+        else:
+            ExternalBspLump = self._load_lump(lump_name, lump_header)
+        setattr(self, lump_name, ExternalBspLump)
+        return getattr(self, lump_name)  # uses __getattribute__
+
+    def _load_lump(self, lump_name: str, lump_header: ExternalLumpHeader) -> Any:
+        """Creates the object for a lump; any errors are noted in self.loading_errors"""
+        # NOTE: .bsp_lump files are opened through self.file_pool, which limits how many are open at once
         try:
             if lump_name == "GAME_LUMP":  # NOTE: lump_header.version is ignored in this case
                 GameLumpClasses = getattr(self.branch, "GAME_LUMP_CLASSES", dict())
-                lump_file = open(lump_header.filename, "rb")
+                lump_file = self.file_pool.open(lump_header.filename, self.mmap)
                 ExternalBspLump = lumps.GameLump(lump_file, lump_header, GameLumpClasses, self.branch.GAME_LUMP_HEADER)
-                # TODO: test we didn't break this with the new ExternalLumpHeader
             elif lump_name in self.branch.LUMP_CLASSES:
                 LumpClass = self.branch.LUMP_CLASSES[lump_name][lump_header.version]
-                ExternalBspLump = lumps.BspLump(self.file, lump_header, LumpClass)
+                ExternalBspLump = lumps.ExternalBspLump(lump_header, LumpClass, self.file_pool, self.mmap)
             elif lump_name in self.branch.BASIC_LUMP_CLASSES:
                 LumpClass = self.branch.BASIC_LUMP_CLASSES[lump_name][lump_header.version]
-                ExternalBspLump = lumps.BasicBspLump(self.file, lump_header, LumpClass)
+                ExternalBspLump = lumps.ExternalBasicBspLump(lump_header, LumpClass, self.file_pool, self.mmap)
             elif lump_name in self.branch.SPECIAL_LUMP_CLASSES:
                 SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[lump_name][lump_header.version]
-                with open(lump_header.filename, "rb") as bsp_lump_file:
-                    ExternalBspLump = SpecialLumpClass(bsp_lump_file.read())
+                with self.file_pool.open(lump_header.filename, self.mmap) as bsp_lump_file:
+                    ExternalBspLump = SpecialLumpClass(bytes(bsp_lump_file.read()))
             else:
-                ExternalBspLump = lumps.RawBspLump(self.file, lump_header)
+                ExternalBspLump = lumps.ExternalRawBspLump(lump_header, self.file_pool, self.mmap)
         except KeyError:  # lump version not supported
-            ExternalBspLump = lumps.RawBspLump(self.file, lump_header)
+            ExternalBspLump = lumps.ExternalRawBspLump(lump_header, self.file_pool, self.mmap)
         except Exception as exc:
             self.loading_errors[lump_name] = exc
-            ExternalBspLump = lumps.RawBspLump(self.file, lump_header)
-        setattr(self, lump_name, ExternalBspLump)
-        return getattr(self, lump_name)  # uses __getattribute__
+            ExternalBspLump = lumps.ExternalRawBspLump(lump_header, self.file_pool, self.mmap)
+        return ExternalBspLump
 
     # NOTE: hasattr won't list available external lumps, but self.headers will
 
     def lump_as_bytes(self, lump_name: str) -> bytes:
         """based on base.Bsp.lump_as_bytes()"""
-        if lump_name in self.loading_errors:
-            # opened file, but failed to parse
-            assert isinstance(getattr(self, lump_name), lumps.ExternalRawBspLump), "idk how this happened"
-            return bytes(getattr(self, lump_name))
-        if lump_name in self.headers and not hasattr(self, lump_name):
+        if lump_name in self.headers and lump_name not in self.__dict__:
             # found file, but haven't opened
             with open(self.headers[lump_name].filename, "rb") as bsp_lump_file:
                 return bsp_lump_file.read()
         lump_entries = getattr(self, lump_name)
+        if isinstance(lump_entries, lumps.RawBspLump):  # RawBspLump, BasicBspLump or BspLump
+            return lump_entries.as_bytes()  # also covers lumps which failed to parse (see self.loading_errors)
         # NOTE: changing the version won't convert the format, but we respect the header version
         lump_version = self.headers[lump_name].version
         all_lump_classes = {**self.branch.BASIC_LUMP_CLASSES,
@@ -140,9 +154,10 @@ class RespawnBsp(valve.ValveBsp):
     entity_headers: Dict[str, str]
     # {"LUMP_NAME": "header text"}
 
-    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True):
+    def __init__(self, branch: ModuleType, filename: Union[str, BspSource] = "untitled.bsp",
+                 autoload: bool = True, mmap: bool = False, lazy: bool = False, workers: int = 1):
         self.entity_headers = dict()
-        super(RespawnBsp, self).__init__(branch, filename, autoload)
+        super(RespawnBsp, self).__init__(branch, filename, autoload, mmap, lazy, workers)
         # NOTE: bsp revision appears before headers, not after (as in Valve's variant)
 
     def _read_header(self, LUMP: enum.Enum) -> LumpHeader:
@@ -157,10 +172,8 @@ class RespawnBsp(valve.ValveBsp):
 
     def _preload(self):
         """Loads filename using the format outlined in this .bsp's branch defintion script"""
-        local_files = os.listdir(self.folder)
-        def is_related(f): return f.startswith(os.path.splitext(self.filename)[0])
-        self.associated_files = [f for f in local_files if is_related(f)]
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self.associated_files = self._find_associated_files()
+        self._open()
         file_magic = self.file.read(4)
         assert file_magic == self.file_magic, f"{self.file} is not a valid .bsp!"
         self.bsp_version = int.from_bytes(self.file.read(4), "little")
@@ -176,33 +189,16 @@ class RespawnBsp(valve.ValveBsp):
         self.bsp_file_size = self.file.tell()
 
         self.loading_errors: Dict[str, Exception] = dict()
+        self.load_stats: Dict[str, profiling.LoadStats] = dict()
+        self._loadable_lumps = dict()
         for LUMP in self.branch.LUMP:
             lump_header = self._read_header(LUMP)
             self.headers[LUMP.name] = lump_header
             if lump_header.length == 0 or lump_header.offset >= self.bsp_file_size:
                 continue  # skip empty lumps
-            try:
-                if LUMP.name == "GAME_LUMP":  # NOTE: lump_header.version is ignored in this case
-                    GameLumpClasses = getattr(self.branch, "GAME_LUMP_CLASSES", dict())
-                    BspLump = lumps.GameLump(self.file, lump_header, GameLumpClasses, self.branch.GAME_LUMP_HEADER)
-                elif LUMP.name in self.branch.LUMP_CLASSES:
-                    LumpClass = self.branch.LUMP_CLASSES[LUMP.name][lump_header.version]
-                    BspLump = lumps.BspLump(self.file, lump_header, LumpClass)
-                elif LUMP.name in self.branch.BASIC_LUMP_CLASSES:
-                    LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP.name][lump_header.version]
-                    BspLump = lumps.BasicBspLump(self.file, lump_header, LumpClass)
-                elif LUMP.name in self.branch.SPECIAL_LUMP_CLASSES:
-                    SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP.name][lump_header.version]
-                    self.file.seek(lump_header.offset)
-                    BspLump = SpecialLumpClass(self.file.read(lump_header.length))
-                else:
-                    BspLump = lumps.RawBspLump(self.file, lump_header)
-            except KeyError:  # lump version not supported
-                BspLump = lumps.RawBspLump(self.file, lump_header)
-            except Exception as exc:
-                self.loading_errors[LUMP.name] = exc
-                BspLump = lumps.RawBspLump(self.file, lump_header)
-            setattr(self, LUMP.name, BspLump)
+            self._loadable_lumps[LUMP.name] = lump_header
+        if not self.lazy:
+            self._load_lumps()
 
         self.external = ExternalLumpManager(self)
 
@@ -212,99 +208,164 @@ class RespawnBsp(valve.ValveBsp):
         for ent_filetype in ("env", "fx", "script", "snd", "spawn"):
             entity_file = f"{self.filename[:-4]}_{ent_filetype}.ent"  # e.g. "mp_glitch_env.ent"
             if entity_file in self.associated_files:
-                with open(os.path.join(self.folder, entity_file), "rb") as ent_file:
-                    LUMP_name = f"ENTITIES_{ent_filetype}"
+                LUMP_name = f"ENTITIES_{ent_filetype}"
+                with profiling.measure(self, LUMP_name), \
+                        profiling.open_file(os.path.join(self.folder, entity_file)) as ent_file:
                     self.entity_headers[LUMP_name] = ent_file.readline().decode().rstrip("\n")
                     # Titanfall:  ENTITIES01
                     # Apex Legends:  ENTITIES02 num_models=0
                     setattr(self, LUMP_name, shared.Entities(ent_file.read()))
                     # each .ent file also has a null byte at the very end
 
+    def _load_lump(self, LUMP_NAME: str, lump_header: LumpHeader) -> Any:
+        """Creates the object for a lump; any errors are noted in self.loading_errors"""
+        try:
+            if LUMP_NAME == "GAME_LUMP":  # NOTE: lump_header.version is ignored in this case
+                GameLumpClasses = getattr(self.branch, "GAME_LUMP_CLASSES", dict())
+                BspLump = lumps.GameLump(self._lump_file, lump_header, GameLumpClasses, self.branch.GAME_LUMP_HEADER)
+            elif LUMP_NAME in self.branch.LUMP_CLASSES:
+                LumpClass = self.branch.LUMP_CLASSES[LUMP_NAME][lump_header.version]
+                BspLump = lumps.BspLump(self._lump_file, lump_header, LumpClass)
+            elif LUMP_NAME in self.branch.BASIC_LUMP_CLASSES:
+                LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_NAME][lump_header.version]
+                BspLump = lumps.BasicBspLump(self._lump_file, lump_header, LumpClass)
+            elif LUMP_NAME in self.branch.SPECIAL_LUMP_CLASSES:
+                SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_NAME][lump_header.version]
+                self.file.seek(lump_header.offset)
+                BspLump = SpecialLumpClass(self.file.read(lump_header.length))
+            else:
+                BspLump = lumps.RawBspLump(self._lump_file, lump_header)
+        except KeyError:  # lump version not supported
+            BspLump = lumps.RawBspLump(self._lump_file, lump_header)
+        except Exception as exc:
+            self.loading_errors[LUMP_NAME] = exc
+            BspLump = lumps.RawBspLump(self._lump_file, lump_header)
+        return BspLump
+
     def save_as(self, filename: str):
-        lump_order = sorted([L for L in self.branch.LUMP],
-                            key=lambda L: (self.headers[L.name].offset, self.headers[L.name].length))
-        # ^ {"lump.name": LumpHeader}
-        # NOTE: messes up a little on empty lumps, so we can't get an exact 1:1 copy /;
-        # -- the engine works just fine though
+        """Writes .bsp, .bsp_lump & .ent files; lumps which haven't been edited are copied, not re-serialised"""
+        # NOTE: saving over the loaded .bsp only rewrites edited lumps, if they still fit where they were
+        # NOTE: accessed special lumps & GAME_LUMP are re-encoded to check for edits; they're copied if unchanged
+        filename = os.path.realpath(filename)
+        source_file = self.__dict__.get("file")
+        overwrite = self._is_source(filename)
+        old_headers = {L.name: self.headers.get(L.name, LumpHeader(0, 0, 0, 0)) for L in self.branch.LUMP}
+        loadable = self.__dict__.get("_loadable_lumps", dict())
+        # sort lumps into: copied from the loaded .bsp, re-serialised & out of bounds (only in .bsp_lump)
+        copied = self._unchanged_lumps()
+        # ^ {"LUMP_NAME": LumpHeader}
         raw_lumps: Dict[str, bytes] = dict()
-        # ^ {"LUMP.name": b"raw lump data]"}
+        # ^ {"LUMP_NAME": b"raw lump data"}
+        edited = list()  # names of all lumps which will be re-serialised, including those which are now empty
         for LUMP in self.branch.LUMP:
+            if LUMP.name in copied or LUMP.name not in self.__dict__:
+                continue
+            edited.append(LUMP.name)
             lump_bytes = self.lump_as_bytes(LUMP.name)
             if lump_bytes != b"":  # don't write empty lumps
                 raw_lumps[LUMP.name] = lump_bytes
-        # recalculate headers
-        current_offset = 0
-        headers = dict()
         # NOTE: 50.1 / 49.1 rBSP (apex_legends) still have lump offsets, just only headers in the .bsp
-        for LUMP in lump_order:
-            if LUMP.name in self.external.headers:
-                external_lump_filename = f"{os.path.basename(filename)}.{LUMP.value:04x}.bsp_lump"
-                if LUMP.name == "GAME_LUMP":
-                    with open(external_lump_filename, "wb") as bsp_lump_file:
-                        raw_external_lump = self.external.GAME_LUMP.as_bytes(headers["GAME_LUMP"].offset)
-                        bsp_lump_file.write(raw_external_lump)
-                elif not hasattr(self.external, LUMP.name):  # unopened, no changes
-                    shutil.copyfile(self.external.headers[LUMP.name].filename, external_lump_filename)
+        out_of_bounds = {n for n, h in old_headers.items() if h.length != 0 and n not in loadable and n not in edited}
+        # can edited lumps be written over their old selves?
+        lump_starts = sorted({h.offset for h in loadable.values()})
+
+        def slot_size(lump_header: LumpHeader) -> int:
+            next_offset = min([o for o in lump_starts if o > lump_header.offset], default=self.bsp_file_size)
+            return next_offset - lump_header.offset
+
+        in_place = overwrite and all(n in loadable and len(r) <= slot_size(loadable[n]) for n, r in raw_lumps.items())
+        if in_place:
+            headers = {**old_headers}
+            for LUMP_NAME in edited:
+                headers[LUMP_NAME] = old_headers[LUMP_NAME]._replace(length=len(raw_lumps.get(LUMP_NAME, b"")))
+            if "GAME_LUMP" in raw_lumps:  # NOTE: child lump offsets are relative to the file
+                raw_lumps["GAME_LUMP"] = self.GAME_LUMP.as_bytes(headers["GAME_LUMP"].offset)
+            with open(filename, "r+b") as outfile:
+                for LUMP_NAME in edited:
+                    old_header = old_headers[LUMP_NAME]
+                    outfile.seek(old_header.offset)
+                    outfile.write(raw_lumps.get(LUMP_NAME, b"").ljust(old_header.length, b"\0"))
+                    outfile.seek(self.branch.lump_header_address[self.branch.LUMP[LUMP_NAME]])
+                    outfile.write(struct.pack("4I", *headers[LUMP_NAME]))
+        else:
+            if "GAME_LUMP" in copied:  # child lump offsets are relative to the file, & GAME_LUMP might move
+                del copied["GAME_LUMP"]
+                raw_lumps["GAME_LUMP"] = self.lump_as_bytes("GAME_LUMP")
+            # recalculate headers
+            lump_order = sorted(self.branch.LUMP,
+                                key=lambda L: (old_headers[L.name].offset, old_headers[L.name].length))
+            # NOTE: messes up a little on empty lumps, so we can't get an exact 1:1 copy /;
+            # -- the engine works just fine though
+            current_offset = 0
+            headers = dict()
+            for LUMP in lump_order:
+                old_header = old_headers[LUMP.name]
+                if LUMP.name in out_of_bounds:
+                    headers[LUMP.name] = old_header
+                    continue
+                elif LUMP.name in copied:
+                    length, fourCC = old_header.length, old_header.fourCC
+                elif LUMP.name in raw_lumps:
+                    length, fourCC = len(raw_lumps[LUMP.name]), 0  # fourCC is 0 because we aren't compressing
+                else:  # lump is not present in bsp
+                    # NOTE: PHYSICS_LEVEL needs version preserved
+                    headers[LUMP.name] = LumpHeader(current_offset, 0, old_header.version, 0)
+                    continue
+                # wierd hack to align unused lump offsets correctly
+                if current_offset == 0:
+                    current_offset = 16 + (16 * 128)  # first byte after headers
+                headers[LUMP.name] = LumpHeader(current_offset, length, old_header.version, fourCC)
+                current_offset += length
+                # pad to start at the next multiple of 4 bytes
+                if current_offset % 4 != 0:
+                    current_offset += 4 - current_offset % 4
+            del current_offset
+            if "GAME_LUMP" in raw_lumps:  # NOTE: child lump offsets are relative to the file
+                raw_lumps["GAME_LUMP"] = self.GAME_LUMP.as_bytes(headers["GAME_LUMP"].offset)
+            # make file
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            out_filename = f"{filename}.{os.getpid()}.tmp" if overwrite else filename
+            with open(out_filename, "wb") as outfile:
+                bsp_version = self.bsp_version
+                if isinstance(self.bsp_version, tuple):
+                    bsp_version = bsp_version[0] | bsp_version[1] << 16
+                outfile.write(struct.pack("4s3I", self.file_magic, bsp_version, getattr(self, "revision", 0), 127))
+                for LUMP in self.branch.LUMP:
+                    outfile.write(struct.pack("4I", *headers[LUMP.name]))
+                # write lump contents (cannot be done until headers allocate padding)
+                for LUMP in lump_order:
+                    if LUMP.name not in copied and LUMP.name not in raw_lumps:
+                        continue
+                    padding_length = headers[LUMP.name].offset - outfile.tell()
+                    outfile.write(b"\0" * padding_length)  # NOTE: padding_length should not exceed 3
+                    if LUMP.name in copied:
+                        lumps.copy_bytes(source_file, outfile, copied[LUMP.name].offset, copied[LUMP.name].length)
+                    else:
+                        outfile.write(raw_lumps[LUMP.name])
+                outfile.write(b"\0" * (-outfile.tell() % 4))  # final padding
+            if overwrite:
+                source_file.close()  # can't replace an open file on Windows
+                os.replace(out_filename, filename)
+        # write external lumps
+        external = self.__dict__.get("external")
+        for LUMP_NAME, external_header in getattr(external, "headers", dict()).items():
+            LUMP = self.branch.LUMP[LUMP_NAME]
+            lump_filename = f"{filename}.{LUMP.value:04x}.bsp_lump"
+            external_lump = external.__dict__.get(LUMP_NAME)
+            changed = external_lump is not None and not lumps.is_unchanged(external_lump, external_header.filesize)
+            if LUMP_NAME == "GAME_LUMP" and headers["GAME_LUMP"].offset != old_headers["GAME_LUMP"].offset:
+                changed = True  # NOTE: .bsp_lump child lump offsets are relative to the internal GAME_LUMP
+            if changed:
+                if LUMP_NAME == "GAME_LUMP":
+                    raw_external_lump = external.GAME_LUMP.as_bytes(headers["GAME_LUMP"].offset)
                 else:
-                    with open(external_lump_filename, "wb") as bsp_lump_file:
-                        raw_external_lump = self.external.lump_as_bytes(LUMP.name)
-                        bsp_lump_file.write(raw_external_lump)
-            if LUMP.name not in raw_lumps:  # lump is not present in bsp
-                version = self.headers[LUMP.name].version  # PHYSICS_LEVEL needs version preserved
-                headers[LUMP.name] = LumpHeader(current_offset, 0, version, 0)
-                continue
-            # wierd hack to align unused lump offsets correctly
-            if current_offset == 0:
-                current_offset = 16 + (16 * 128)  # first byte after headers
-            offset = current_offset
-            length = len(raw_lumps[LUMP.name])
-            version = self.headers[LUMP.name].version
-            fourCC = 0  # fourCC is always 0 because we aren't compressing
-            header = LumpHeader(offset, length, version, fourCC)
-            headers[LUMP.name] = header  # recorded for noting padding
-            current_offset += length
-            # pad to start at the next multiple of 4 bytes
-            # TODO: note the padding so we can remove it when writing .bsp_lump
-            if current_offset % 4 != 0:
-                current_offset += 4 - current_offset % 4
-        del current_offset
-        # set GAME_LUMP offsets
-        if "GAME_LUMP" in raw_lumps:
-            raw_lumps["GAME_LUMP"] = self.GAME_LUMP.as_bytes(headers["GAME_LUMP"].offset)
-        # make file
-        os.makedirs(os.path.dirname(os.path.realpath(filename)), exist_ok=True)
-        outfile = open(filename, "wb")
-        bsp_version = self.bsp_version
-        if isinstance(self.bsp_version, tuple):
-            bsp_version = bsp_version[0] + bsp_version[1] << 16
-        outfile.write(struct.pack("4s3I", self.file_magic, bsp_version, self.revision, 127))
-        # write headers
-        for LUMP in self.branch.LUMP:
-            header = headers[LUMP.name]
-            outfile.write(struct.pack("4I", header.offset, header.length, header.version, header.fourCC))
-        # write lump contents (cannot be done until headers allocate padding)
-        for LUMP in lump_order:
-            if LUMP.name not in raw_lumps:
-                continue
-            # write external lump
-            if LUMP.name in self.external.headers:
-                external_lump = f"{filename}.{LUMP.value:04x}.bsp_lump"
-                if not hasattr(self.external, LUMP.name):
-                    shutil.copy()
-                with open(external_lump, "wb") as out_lumpfile:
-                    out_lumpfile.write(raw_lumps[LUMP.name])
-            else:  # write lump to file
-                padding_length = headers[LUMP.name].offset - outfile.tell()
-                if padding_length > 0:  # NOTE: padding_length should not exceed 3
-                    outfile.write(b"\0" * padding_length)
-                outfile.write(raw_lumps[LUMP.name])
-        # final padding
-        end = outfile.tell()
-        padding_length = 0
-        if end % 4 != 0:
-            padding_length = 4 - end % 4
-        outfile.write(b"\0" * padding_length)
-        outfile.close()  # main .bsp is written
+                    raw_external_lump = external.lump_as_bytes(LUMP_NAME)
+                external.file_pool.evict(lump_filename)
+                with open(lump_filename, "wb") as bsp_lump_file:
+                    bsp_lump_file.write(raw_external_lump)
+            elif not (os.path.exists(lump_filename) and os.path.samefile(lump_filename, external_header.filename)):
+                external.file_pool.evict(lump_filename)
+                shutil.copyfile(external_header.filename, lump_filename)
         # write .ent lumps
         # NOTE: the ENTITY_PARTITIONS lump should list all used .ent lumps
         for ent_variant in ("env", "fx", "script", "snd", "spawn"):
@@ -321,7 +382,7 @@ class RespawnBsp(valve.ValveBsp):
                 ent_file.write(header)
                 ent_file.write(b"\n")
                 ent_file.write(getattr(self, LUMP_name).as_bytes())
-
-    def save(self, single_file: bool = False):
-        self.save_as(os.path.join(self.folder, self.filename), single_file)
-        self._preload()  # reload lumps, clearing all BspLump._changes
+        if overwrite:
+            for external_header in getattr(external, "headers", dict()).values():
+                external.file_pool.evict(external_header.filename)  # .bsp_lump files may have been rewritten
+            self._reload()
@@ -1,8 +1,7 @@
-import os
 from typing import Dict
 
 from . import id_software
-from . import lumps
+from . import profiling
 
 
 class RitualBsp(id_software.IdTechBsp):
@@ -11,11 +10,9 @@ class RitualBsp(id_software.IdTechBsp):
 
     def _preload(self):  # big copy-paste, should use super + dheader_t
         """Loads filename using the format outlined in this .bsp's branch defintion script"""
-        local_files = os.listdir(self.folder)
-        def is_related(f): return f.startswith(os.path.splitext(self.filename)[0])
-        self.associated_files = [f for f in local_files if is_related(f)]
+        self.associated_files = self._find_associated_files()
         # open .bsp
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self._open()
         # struct { int file_magic, bsp_version, checksum; lump_t lumps[20] };
         self.file_magic = self.file.read(4)
         assert self.file_magic in self._file_magics, f"{self.file} is not a valid .bsp!"
@@ -28,6 +25,8 @@ class RitualBsp(id_software.IdTechBsp):
         # NOTE: this section should be it's own method
         self.headers = dict()
         self.loading_errors: Dict[str, Exception] = dict()
+        self.load_stats: Dict[str, profiling.LoadStats] = dict()
+        self._loadable_lumps = dict()
         for LUMP_enum in self.branch.LUMP:
             # CHECK: is lump external? (are associated_files overriding)
             lump_header = self._read_header(LUMP_enum)
@@ -35,21 +34,6 @@ class RitualBsp(id_software.IdTechBsp):
             self.headers[LUMP_name] = lump_header
             if lump_header.length == 0:
                 continue
-            try:
-                if LUMP_name in self.branch.LUMP_CLASSES:
-                    LumpClass = self.branch.LUMP_CLASSES[LUMP_name]
-                    BspLump = lumps.create_BspLump(self.file, lump_header, LumpClass)
-                elif LUMP_name in self.branch.SPECIAL_LUMP_CLASSES:
-                    SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_name]
-                    self.file.seek(lump_header.offset)
-                    lump_data = self.file.read(lump_header.length)
-                    BspLump = SpecialLumpClass(lump_data)
-                elif LUMP_name in self.branch.BASIC_LUMP_CLASSES:
-                    LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_name]
-                    BspLump = lumps.create_BasicBspLump(self.file, lump_header, LumpClass)
-                else:
-                    BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            except Exception as exc:
-                self.loading_errors[LUMP_name] = exc
-                BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            setattr(self, LUMP_name, BspLump)
+            self._loadable_lumps[LUMP_name] = lump_header
+        if not self.lazy:
+            self._load_lumps()
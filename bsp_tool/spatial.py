@@ -0,0 +1,182 @@
+"""Spatial indices of static props, world lights, cubemaps & entities; requires numpy
+
+from bsp_tool import load_bsp, spatial
+bsp = load_bsp("map.bsp")
+props = spatial.static_props(bsp)
+props.within_radius((0, 0, 64), 256)  # indices into bsp.GAME_LUMP.sprp.props
+props.nearest((0, 0, 64), k=4)  # closest first
+props.within_box((-128, -128, 0), (128, 128, 128))"""
+from __future__ import annotations
+import itertools
+import math
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .branches import shared
+
+
+Point = Iterable[float]  # xyz
+
+
+class PointIndex:
+    """Uniform grid of 3D points; queries return the ids of matching points (lump indices)"""
+    points: Any  # numpy.ndarray (n, 3) float64
+    ids: Any  # numpy.ndarray (n,) int64; id of each point
+    cell_size: float
+    _cells: Dict[Tuple[int, int, int], Any]  # {(x, y, z): numpy.ndarray of indices into points}
+    _origin: List[float]  # mins of points; corner of cell (0, 0, 0)
+    _max_cell: List[int]  # xyz of the last occupied cell on each axis
+
+    def __init__(self, points: Iterable[Point], ids: Iterable[int] = None, cell_size: float = None):
+        """cell_size defaults to ~2 points per occupied cell"""
+        import numpy  # requires: pip install numpy
+        self.points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 3)
+        self.ids = numpy.arange(len(self.points)) if ids is None else numpy.asarray(ids, dtype=numpy.int64)
+        assert len(self.ids) == len(self.points), "need an id for each point"
+        self._all = numpy.arange(len(self.points))
+        self._origin = self.points.min(axis=0).tolist() if len(self.points) > 0 else [0.0] * 3
+        if cell_size is None:
+            cell_size = self._default_cell_size()
+        assert cell_size > 0, "cell_size must be positive"
+        self.cell_size = float(cell_size)
+        # bucket points by cell
+        cells = numpy.floor((self.points - self._origin) / self.cell_size).astype(numpy.int64)
+        order = numpy.lexsort(cells.T[::-1])
+        cells = cells[order]
+        starts = numpy.flatnonzero(numpy.any(cells[1:] != cells[:-1], axis=1)) + 1
+        self._cells = {tuple(cells[start].tolist()): indices
+                       for start, indices in zip([0, *starts], numpy.split(order, starts)) if len(indices) > 0}
+        self._max_cell = cells.max(axis=0).tolist() if len(cells) > 0 else [-1] * 3
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __repr__(self) -> str:
+        return f"<PointIndex {len(self)} points in {len(self._cells)} cells of {self.cell_size:.6g} units>"
+
+    def _default_cell_size(self) -> float:
+        import numpy  # requires: pip install numpy
+        if len(self.points) == 0:
+            return 1.0
+        extents = self.points.max(axis=0) - self._origin
+        cell_size = max(float(extents.max()), 1.0)
+        for _ in range(16):  # flat axes (e.g. props on a floor) are at least one cell deep
+            volume = float(numpy.prod(numpy.maximum(extents, cell_size)))
+            cell_size, previous = (volume / len(self.points) * 2) ** (1 / 3), cell_size
+            if abs(cell_size - previous) < previous * 0.01:
+                break
+        return max(cell_size, 1.0)
+
+    def _candidates(self, mins: List[float], maxs: List[float]) -> Any:  # -> numpy.ndarray
+        """indices of all points in cells touching the box mins-maxs"""
+        import numpy  # requires: pip install numpy
+        lows = [max(math.floor((a - o) / self.cell_size), 0) for a, o in zip(mins, self._origin)]
+        highs = [min(math.floor((b - o) / self.cell_size), last)
+                 for b, o, last in zip(maxs, self._origin, self._max_cell)]
+        spans = [high - low + 1 for low, high in zip(lows, highs)]
+        if any(span <= 0 for span in spans):
+            return self._all[:0]
+        elif spans[0] * spans[1] * spans[2] > len(self.points) // 8:  # cheaper to test every point in numpy
+            return self._all
+        found = [self._cells[cell] for cell in itertools.product(*map(range, lows, [h + 1 for h in highs]))
+                 if cell in self._cells]
+        return numpy.concatenate(found) if len(found) > 0 else self._all[:0]
+
+    def _distances(self, candidates: Any, point: List[float]) -> Any:  # -> numpy.ndarray
+        """squared distance from point to each candidate"""
+        import numpy  # requires: pip install numpy
+        offsets = (self.points if candidates is self._all else self.points[candidates]) - point
+        return numpy.einsum("ij,ij->i", offsets, offsets)
+
+    def within_radius(self, point: Point, radius: float) -> List[int]:
+        """ids of all points within radius of point, in ascending order"""
+        point = [float(axis) for axis in point]
+        candidates = self._candidates([a - radius for a in point], [a + radius for a in point])
+        distances = self._distances(candidates, point)
+        return sorted(self.ids[candidates[distances <= radius * radius]].tolist())
+
+    def nearest(self, point: Point, k: int = 1) -> List[int]:
+        """ids of the k points closest to point, closest first"""
+        import numpy  # requires: pip install numpy
+        point = [float(axis) for axis in point]
+        k = min(k, len(self))
+        if k <= 0:
+            return list()
+        # start w/ the distance to the grid, plus enough cells to hold ~k points
+        maxs = [o + (last + 1) * self.cell_size for o, last in zip(self._origin, self._max_cell)]
+        outside = [max(o - a, a - b, 0) for a, o, b in zip(point, self._origin, maxs)]
+        radius = math.sqrt(sum(axis ** 2 for axis in outside)) + self.cell_size * max((k / 2) ** (1 / 3), 1)
+        while True:
+            candidates = self._candidates([a - radius for a in point], [a + radius for a in point])
+            distances = self._distances(candidates, point)
+            # NOTE: the box holds every point within radius, but not every point within the box's corners
+            if candidates is self._all or numpy.count_nonzero(distances <= radius * radius) >= k:
+                break
+            radius *= 2
+        if k < len(candidates):  # only sort the closest
+            nearby = distances <= numpy.partition(distances, k - 1)[k - 1]
+            candidates, distances = candidates[nearby], distances[nearby]
+        closest = numpy.lexsort((self.ids[candidates], distances))[:k]  # ties: lowest id first
+        return self.ids[candidates[closest]].tolist()
+
+    def within_box(self, mins: Point, maxs: Point) -> List[int]:
+        """ids of all points inside the axis aligned box mins-maxs (inclusive), in ascending order"""
+        import numpy  # requires: pip install numpy
+        mins, maxs = [float(axis) for axis in mins], [float(axis) for axis in maxs]
+        candidates = self._candidates(mins, maxs)
+        points = self.points[candidates]
+        inside = numpy.all((points >= mins) & (points <= maxs), axis=1)
+        return sorted(self.ids[candidates[inside]].tolist())
+
+
+def _xyz(origins: Any) -> Any:  # numpy.ndarray -> numpy.ndarray (n, 3)
+    """structured origins (x, y & z fields) -> columns"""
+    import numpy  # requires: pip install numpy
+    if origins.dtype.names is not None:
+        return numpy.stack([origins[axis] for axis in origins.dtype.names], axis=1)
+    return origins.reshape(-1, 3)
+
+
+# indices of specific lumps
+def cubemaps(bsp, cell_size: float = None) -> PointIndex:
+    """ids are indices into bsp.CUBEMAPS"""
+    if not hasattr(bsp, "CUBEMAPS"):
+        return PointIndex([], cell_size=cell_size)
+    return PointIndex(_xyz(shared.lump_as_numpy(bsp, "CUBEMAPS")["origin"]), cell_size=cell_size)
+
+
+def entities(bsp, cell_size: float = None) -> PointIndex:
+    """ids are indices into bsp.ENTITIES; entities without a valid "origin" are skipped"""
+    points, ids = list(), list()
+    for i, entity in enumerate(getattr(bsp, "ENTITIES", list())):
+        origin = entity.get("origin")
+        if isinstance(origin, list):  # duplicate keys
+            origin = origin[0]
+        try:
+            point = [float(axis) for axis in origin.split()]
+        except (AttributeError, ValueError):
+            continue
+        if len(point) == 3:
+            points.append(point)
+            ids.append(i)
+    return PointIndex(points, ids, cell_size=cell_size)
+
+
+def static_props(bsp, cell_size: float = None) -> PointIndex:
+    """ids are indices into bsp.GAME_LUMP.sprp.props"""
+    sprp = getattr(getattr(bsp, "GAME_LUMP", None), "sprp", None)
+    if sprp is None or len(sprp.props) == 0:
+        return PointIndex([], cell_size=cell_size)
+    return PointIndex(_xyz(sprp.as_numpy()["origin"]), cell_size=cell_size)
+
+
+def world_lights(bsp, lump_name: str = "WORLD_LIGHTS", cell_size: float = None) -> PointIndex:
+    """ids are indices into bsp.WORLD_LIGHTS (or lump_name, e.g. "WORLD_LIGHTS_HDR")"""
+    import numpy  # requires: pip install numpy
+    if not hasattr(bsp, lump_name):
+        return PointIndex([], cell_size=cell_size)
+    world_lights = shared.lump_as_numpy(bsp, lump_name)
+    if "origin" in (world_lights.dtype.names or ()):
+        return PointIndex(_xyz(world_lights["origin"]), cell_size=cell_size)
+    # NOTE: Respawn WorldLights aren't mapped yet; origin comes first, like source.WorldLight
+    raw_floats = numpy.frombuffer(world_lights.tobytes(), dtype="<f4").reshape(len(world_lights), -1)
+    return PointIndex(raw_floats[:, :3], cell_size=cell_size)
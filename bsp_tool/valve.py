@@ -1,13 +1,16 @@
 from collections import namedtuple  # for type hints
+import concurrent.futures
 import enum  # for type hints
+import io  # for type hints
 import os
 import struct
 from types import ModuleType
-from typing import Dict
+from typing import Dict, Union
 
 from . import base
 from . import id_software
 from . import lumps
+from . import profiling
 
 
 GoldSrcLumpHeader = namedtuple("GoldSrcLumpHeader", ["offset", "length"])
@@ -24,13 +27,15 @@ class GoldSrcBsp(id_software.IdTechBsp):  # TODO: QuakeBsp subclass?
         return f"<{self.__class__.__name__} '{self.filename}' {branch_script} {version}>"
 
     def _preload(self):
-        self.file = open(os.path.join(self.folder, self.filename), "rb")
+        self._open()
         self.bsp_version = int.from_bytes(self.file.read(4), "little")
         self.file.seek(0, 2)  # move cursor to end of file
         self.bsp_file_size = self.file.tell()
 
         self.headers = dict()
         self.loading_errors: Dict[str, Exception] = dict()
+        self.load_stats: Dict[str, profiling.LoadStats] = dict()
+        self._loadable_lumps = dict()
         for LUMP_enum in self.branch.LUMP:
             LUMP_NAME = LUMP_enum.name
             self.file.seek(self.branch.lump_header_address[LUMP_enum])
@@ -39,24 +44,9 @@ class GoldSrcBsp(id_software.IdTechBsp):  # TODO: QuakeBsp subclass?
             self.headers[LUMP_NAME] = lump_header
             if length == 0:
                 continue  # empty lump
-            try:
-                if LUMP_NAME in self.branch.LUMP_CLASSES:
-                    LumpClass = self.branch.LUMP_CLASSES[LUMP_NAME]
-                    BspLump = lumps.create_BspLump(self.file, lump_header, LumpClass)
-                elif LUMP_NAME in self.branch.SPECIAL_LUMP_CLASSES:
-                    SpecialLumpClass = self.branch.SPECIAL_LUMP_CLASSES[LUMP_NAME]
-                    self.file.seek(offset)
-                    BspLump = SpecialLumpClass(self.file.read(length))
-                elif LUMP_NAME in self.branch.BASIC_LUMP_CLASSES:
-                    LumpClass = self.branch.BASIC_LUMP_CLASSES[LUMP_NAME]
-                    BspLump = lumps.create_BasicBspLump(self.file, lump_header, LumpClass)
-                else:
-                    BspLump = lumps.create_RawBspLump(self.file, lump_header)
-            except Exception as exc:
-                self.loading_errors[LUMP_NAME] = exc
-                BspLump = lumps.create_RawBspLump(self.file, lump_header)
-                # NOTE: doesn't decompress LZMA, fix that
-            setattr(self, LUMP_NAME, BspLump)
+            self._loadable_lumps[LUMP_NAME] = lump_header
+        if not self.lazy:
+            self._load_lumps()
 
     def _read_header(self, LUMP: enum.Enum) -> GoldSrcLumpHeader:
         """Reads bytes of lump"""
@@ -70,8 +60,9 @@ class ValveBsp(base.Bsp):
     # https://developer.valvesoftware.com/wiki/Source_BSP_File_Format
     file_magic = b"VBSP"
 
-    def __init__(self, branch: ModuleType, filename: str = "untitled.bsp", autoload: bool = True):
-        super(ValveBsp, self).__init__(branch, filename, autoload)
+    def __init__(self, branch: ModuleType, filename: Union[str, base.BspSource] = "untitled.bsp",
+                 autoload: bool = True, mmap: bool = False, lazy: bool = False, workers: int = 1):
+        super(ValveBsp, self).__init__(branch, filename, autoload, mmap, lazy, workers)
 
     # TODO: migrate Source specific functionality from base.Bsp to ValveBsp
 
@@ -82,67 +73,107 @@ class ValveBsp(base.Bsp):
         # TODO: move to a system of using header LumpClasses instead of the above
         return self.branch.read_lump_header(self.file, LUMP)
 
-    def save_as(self, filename: str = None):
-        raise NotImplementedError()
-        # # TODO: get LumpHeaderClass from branch
-        # lump_order = sorted([L for L in self.branch.LUMP],
-        #                     key=lambda L: (self.headers[L.name].offset, self.headers[L.name].length))
-        # # ^ {"lump.name": LumpHeader / ExternalLumpHeader}
-        # # NOTE: messes up on empty lumps, so we can't get an exact 1:1 copy /;
-        # raw_lumps: Dict[str, bytes] = dict()
-        # # ^ {"LUMP.name": b"raw lump data]"}
-        # for LUMP in self.branch.LUMP:
-        #     lump_bytes = self.lump_as_bytes(LUMP.name)
-        #     if lump_bytes != b"":  # don't write empty lumps
-        #         raw_lumps[LUMP.name] = lump_bytes
-        # # recalculate headers
-        # current_offset = 0
-        # headers = dict()
-        # for LUMP in lump_order:
-        #     if LUMP.name not in raw_lumps:  # lump is not present
-        #          version = self.headers[LUMP.name].version  # PHYSICS_LEVEL needs version preserved
-        #          headers[LUMP.name] = LumpHeader(current_offset, 0, version, 0)
-        #          continue
-        #     # wierd hack to align unused lump offsets correctly
-        #     if current_offset == 0:
-        #         current_offset = 16 + (16 * 128)  # first byte after headers
-        #     offset = current_offset
-        #     length = len(raw_lumps[LUMP.name])
-        #     version = self.headers[LUMP.name].version
-        #     fourCC = 0  # fourCC is always 0 because we aren't encoding
-        #     header = LumpHeader(offset, length, version, fourCC)
-        #     headers[LUMP.name] = header  # recorded for noting padding
-        #     current_offset += length
-        #     # pad to start at the next multiple of 4 bytes
-        #     # TODO: note the padding so we can remove it when writing .bsp_lump
-        #     if current_offset % 4 != 0:
-        #         current_offset += 4 - current_offset % 4
-        # del current_offset
-        # if "GAME_LUMP" in raw_lumps:
-        #     raw_lumps["GAME_LUMP"] = self.GAME_LUMP.as_bytes(headers["GAME_LUMP"].offset)
-        # # make file
-        # os.makedirs(os.path.dirname(os.path.realpath(filename)), exist_ok=True)
-        # outfile = open(filename, "wb")
-        # bsp_version = self.bsp_version
-        # if isinstance(self.bsp_version, tuple):
-        #     bsp_version = bsp_version[0] + bsp_version[1] << 16
-        # outfile.write(struct.pack("4s2I", self.file_magic, bsp_version, self.revision))
-        # # write headers
-        # for LUMP in self.branch.LUMP:
-        #     header = headers[LUMP.name]
-        #     outfile.write(struct.pack("4I", header.offset, header.length, header.version, header.fourCC))
-        # # write lump contents (cannot be done until headers allocate padding)
-        # for LUMP in lump_order:
-        #    if LUMP.name not in raw_lumps:
-        #        continue
-        #    padding_length = headers[LUMP.name].offset - outfile.tell()
-        #    if padding_length > 0:  # NOTE: padding_length should not exceed 3
-        #        outfile.write(b"\0" * padding_length)
-        #    outfile.write(raw_lumps[LUMP.name])
-        # # final padding
-        # end = outfile.tell()
-        # padding_length = 0
-        # if end % 4 != 0:
-        #     padding_length = 4 - end % 4
-        # outfile.write(b"\0" * padding_length)
-        # outfile.close()  # main .bsp is written
+    def _preload(self):
+        super(ValveBsp, self)._preload()
+        self.file.seek(self._revision_address())
+        self.revision = int.from_bytes(self.file.read(4), "little")
+
+    def _revision_address(self) -> int:
+        # struct SourceBspHeader { char file_magic[4]; int version; SourceLumpHeader headers[64]; int revision; };
+        # NOTE: assumes lump headers are evenly spaced, one after the other
+        first, second, *_, last = sorted(self.branch.lump_header_address.values())
+        return last + (second - first)
+
+    def _write_header(self, file: io.BufferedWriter, LUMP: enum.Enum, header: namedtuple):
+        """Inverse of _read_header"""
+        if hasattr(self.branch, "write_lump_header"):  # branch has an irregular LumpHeader
+            self.branch.write_lump_header(file, LUMP, header)
+        else:  # LumpHeader fields are in the order they are read, & each is an unsigned int
+            file.seek(self.branch.lump_header_address[LUMP])
+            file.write(struct.pack(f"{len(header)}I", *header))
+
+    def save_as(self, filename: str, compress: bool = False, workers: int = 1):
+        """Writes lumps in the order they appear in the loaded file; unchanged lumps are copied, not re-serialised"""
+        # NOTE: compress=True LZMA compresses every lump (except GAME_LUMP & PAKFILE) across `workers` threads
+        # -- lumps which compression wouldn't shrink are written uncompressed
+        # -- unchanged lumps which are already compressed are copied as-is
+        # NOTE: accessed special lumps & GAME_LUMP are re-encoded to check for edits; they're copied if unchanged
+        if compress and "fourCC" not in self.branch.read_lump_header.__annotations__["return"]._fields:
+            raise NotImplementedError(f"{self.branch.__name__} LumpHeaders cannot mark lumps as compressed")
+        filename = os.path.realpath(filename)
+        source_file = self.__dict__.get("file")
+        overwrite = self._is_source(filename)
+        old_headers = {L.name: self.headers.get(L.name, base.LumpHeader(0, 0, 0, 0)) for L in self.branch.LUMP}
+        # NOTE: new .bsps use base.LumpHeader, which might not match the branch's LumpHeader
+        lump_order = sorted(self.branch.LUMP, key=lambda L: (old_headers[L.name].offset, old_headers[L.name].length))
+        unchanged = self._unchanged_lumps()
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        out_filename = f"{filename}.{os.getpid()}.tmp" if overwrite else filename
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor, open(out_filename, "wb") as outfile:
+            compressed = dict()
+            # ^ {"LUMP_NAME": Future}
+            if compress:  # NOTE: every compressed lump is held in memory until it is written
+                for LUMP in lump_order:
+                    if LUMP.name in ("GAME_LUMP", "PAKFILE"):
+                        continue
+                    if LUMP.name in unchanged and getattr(old_headers[LUMP.name], "fourCC", 0) != 0:
+                        continue  # already compressed
+                    raw_lump = self.lump_as_bytes(LUMP.name)  # reads can't be shared across threads
+                    if raw_lump != b"":
+                        compressed[LUMP.name] = executor.submit(_compress_if_smaller, raw_lump)
+            # lumps are written first; headers are written once each lump's offset & length are known
+            outfile.write(b"\0" * (self._revision_address() + 4))
+            headers = dict()
+            for LUMP in lump_order:
+                old_header = old_headers[LUMP.name]
+                offset = outfile.tell()
+                if LUMP.name == "GAME_LUMP" and offset != old_header.offset:
+                    unchanged.pop("GAME_LUMP", None)  # child lump offsets are relative to the file
+                if LUMP.name in unchanged and LUMP.name not in compressed:
+                    lumps.copy_bytes(source_file, outfile, old_header.offset, old_header.length)
+                    headers[LUMP.name] = old_header._replace(offset=offset)
+                else:
+                    fourCC = 0
+                    if LUMP.name in compressed:
+                        raw_lump, fourCC = compressed.pop(LUMP.name).result()
+                        chunks = [raw_lump]
+                    elif LUMP.name == "GAME_LUMP" and isinstance(getattr(self, "GAME_LUMP", None), lumps.GameLump):
+                        chunks = [self.GAME_LUMP.as_bytes(offset)]
+                    elif isinstance(self.__dict__.get(LUMP.name), lumps.RawBspLump):
+                        chunks = self.__dict__[LUMP.name].iter_bytes()  # streamed, one piece at a time
+                    else:
+                        chunks = [self.lump_as_bytes(LUMP.name)]
+                    for chunk in chunks:
+                        outfile.write(chunk)
+                    length = outfile.tell() - offset
+                    if length == 0:  # empty lumps which were at offset 0 stay there
+                        offset = offset if old_header.offset != 0 else 0
+                    headers[LUMP.name] = _replace_header(old_header, offset=offset, length=length, fourCC=fourCC)
+                outfile.write(b"\0" * (-outfile.tell() % 4))  # pad to start at the next multiple of 4 bytes
+            # file header
+            outfile.seek(0)
+            bsp_version = self.bsp_version
+            if isinstance(self.bsp_version, tuple):
+                bsp_version = bsp_version[0] | bsp_version[1] << 16
+            outfile.write(struct.pack("4sI", self.file_magic, bsp_version))
+            for LUMP in self.branch.LUMP:
+                self._write_header(outfile, LUMP, headers[LUMP.name])
+            outfile.seek(self._revision_address())
+            outfile.write(getattr(self, "revision", 0).to_bytes(4, "little"))
+        if overwrite:
+            source_file.close()  # can't replace an open file on Windows
+            os.replace(out_filename, filename)
+            self._reload()
+
+
+def _compress_if_smaller(raw_lump: bytes) -> (bytes, int):
+    """(LZMA compressed lump, uncompressed size); or (raw_lump, 0) if compressing doesn't save any space"""
+    compressed = lumps.compress(raw_lump)
+    if len(compressed) < len(raw_lump):
+        return compressed, len(raw_lump)
+    return raw_lump, 0
+
+
+def _replace_header(header: namedtuple, **kwargs) -> namedtuple:
+    """header._replace(**kwargs), skipping any fields header doesn't have"""
+    return header._replace(**{k: v for k, v in kwargs.items() if k in header._fields})
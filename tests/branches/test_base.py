@@ -1,5 +1,7 @@
 import struct
 
+import numpy
+
 from bsp_tool.branches import base
 
 
@@ -9,6 +11,11 @@ class Example(base.Struct):
     _arrays = {"position": [*"xyz"], "data": 4}
 
 
+class ExampleArray(base.MappedArray):
+    _mapping = {"id": None, "position": [*"xyz"], "data": 2}
+    _format = "i3f2i"
+
+
 class TestStruct:
     def test_unpack(self):
         raw_struct = b"\x00\x00\x00\x00" b"\xDE\xAD\xBE\xEF" \
@@ -34,6 +41,36 @@ class TestStruct:
         recreated_struct = struct.pack(Example._format, *flattened_struct)
         assert raw_struct == recreated_struct
 
+    def test_specialised(self):
+        assert Example.from_tuple.__func__._generated
+        assert isinstance(Example._struct, struct.Struct)
+        raw_tuple = (1, 2.0, 3.0, 4.0, 5, 6, 7, 8)
+        generic_from_tuple = base.Struct.__dict__["from_tuple"].__func__
+        test_struct = Example.from_tuple(raw_tuple)
+        generic_struct = generic_from_tuple(Example, raw_tuple)
+        assert test_struct == generic_struct
+        assert test_struct.position._mapping is Example._arrays["position"]
+        assert test_struct.position._format == generic_struct.position._format
+        assert test_struct.data == generic_struct.data == (5, 6, 7, 8)
+        assert test_struct.flat() == base.Struct.flat(generic_struct)
+        assert test_struct.as_bytes() == struct.pack(Example._format, *raw_tuple)
+
+    def test_numpy_dtype(self):
+        dtype = Example.numpy_dtype()
+        assert dtype.itemsize == struct.calcsize(Example._format)
+        assert dtype.names == ("id", "position", "data")
+        assert dtype["position"].names == (*"xyz",)
+        assert dtype["data"].shape == (4,)
+        raw_struct = struct.pack(Example._format, 1, 2.0, 3.0, 4.0, 5, 6, 7, 8)
+        array = numpy.frombuffer(raw_struct, dtype)
+        assert array["id"][0] == 1
+        assert array["position"]["z"][0] == 4.0
+        assert list(array["data"][0]) == [5, 6, 7, 8]
+        # native alignment
+        dtype = base.MappedArray.numpy_dtype(_mapping={"a": None, "b": None}, _format="bi")
+        assert dtype.fields["b"][1] == 4
+        assert dtype.itemsize == struct.calcsize("bi")
+
 
 class TestMappedArray:
     def test_init(self):
@@ -90,3 +127,19 @@ class TestMappedArray:
         assert test_MappedArray.x == base.type_defaults["f"]
         assert test_MappedArray.y == base.type_defaults["f"]
         assert test_MappedArray.z == 1.0
+
+    def test_specialised(self):
+        assert ExampleArray.from_tuple.__func__._generated
+        raw_tuple = (1, 2.0, 3.0, 4.0, 5, 6)
+        generic_from_tuple = base.MappedArray.__dict__["from_tuple"].__func__
+        test_array = ExampleArray.from_tuple(raw_tuple)
+        generic_array = generic_from_tuple(ExampleArray, raw_tuple)
+        assert test_array.__dict__ == generic_array.__dict__
+        assert test_array.position.__dict__ == generic_array.position.__dict__
+        assert test_array.data == [5, 6]
+        assert test_array.flat() == base.MappedArray.flat(generic_array)
+        assert test_array.as_bytes() == struct.pack(ExampleArray._format, 1, 2.0, 3.0, 4.0, 5, 6)
+        # other mappings use the generic methods
+        other_array = ExampleArray.from_tuple((1, 2), _mapping=[*"xy"], _format="2i")
+        assert other_array.flat() == [1, 2]
+        assert other_array.as_bytes() == struct.pack("2i", 1, 2)
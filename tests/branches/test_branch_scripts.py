@@ -1,6 +1,7 @@
 """These tests cannot fail, but they will provide warnings for unused LumpClasses"""
 # TODO: identify SubLumpClasses used in some way
 import inspect
+import io
 from types import ModuleType
 from typing import List
 import warnings
@@ -100,6 +101,16 @@ def test_branch_script(branch_script):
     # TODO: catch misnamed/unused attrs/type hints
 
 
+def test_vindictus_write_lump_header():
+    """write_lump_header must be the inverse of read_lump_header; headers are 20 bytes & signed"""
+    vindictus = branches.nexon.vindictus
+    file = io.BytesIO()
+    headers = {L: vindictus.VindictusLumpHeader(L.value, -1, -2, L.value * 20, -L.value) for L in vindictus.LUMP}
+    for LUMP, header in headers.items():
+        vindictus.write_lump_header(file, LUMP, header)
+    assert {L: vindictus.read_lump_header(file, L) for L in vindictus.LUMP} == headers
+
+
 # TODO: use maplist to look at headers to ensure UNUSED_* lumps are correctly marked
 
 # TODO: verify __slots__, _format, _arrays & _mapping line up correctly
@@ -0,0 +1,193 @@
+import struct
+
+import numpy
+import pytest
+
+from bsp_tool import load_bsp
+from bsp_tool.branches import shared
+from bsp_tool.branches.respawn import titanfall2
+from bsp_tool.branches.valve import orange_box, source
+
+
+raw_entities = b"""{
+"classname" "worldspawn"
+"skyname" "sky_tf2_04"
+}
+{
+"classname" "logic_relay"
+"OnTrigger" "door,Open,,0,-1"
+"OnTrigger" "door,Close,,5,-1"
+"OnTrigger" "light,TurnOn,,0,-1"
+"message" "{braces} in a value"
+}
+\x00"""
+
+
+class TestEntities:
+    def test_parse(self):
+        entities = shared.Entities(raw_entities)
+        assert len(entities) == 2
+        assert entities[0] == {"classname": "worldspawn", "skyname": "sky_tf2_04"}
+        assert entities[1]["OnTrigger"] == ["door,Open,,0,-1", "door,Close,,5,-1", "light,TurnOn,,0,-1"]
+        assert entities[1]["message"] == "{braces} in a value"
+
+    def test_as_bytes(self):
+        entities = shared.Entities(raw_entities)
+        assert shared.Entities(entities.as_bytes()) == entities
+
+    def test_multiline_value(self):
+        entities = shared.Entities(b'{\r\n"classname" "info_target"\r\n"script" "line 1\r\nline 2"\r\n}\r\n')
+        assert entities == [{"classname": "info_target", "script": "line 1\r\nline 2"}]
+
+    def test_comments(self):
+        entities = shared.Entities(b'// comment\n{\n"classname" "info_null" // another comment\n}\n')
+        assert entities == [{"classname": "info_null"}]
+        assert shared.Entities(b'{\n"url" "http://example.com"\n}') == [{"url": "http://example.com"}]
+
+    def test_quick_parse(self):  # quick path must agree with the tokenizer
+        text = raw_entities.decode()
+        assert shared._parse_entities_quick(text) == shared._parse_entities(text)
+        assert shared._parse_entities_quick("// comment\n{\n}") is None  # falls back to the tokenizer
+
+    def test_unexpected(self):
+        for raw in (b'{\n"key" "value"\nkey\n}', b'{\n"key"\n}', b'"key" "value"', b'}', b'{\n"unclosed\n}'):
+            with pytest.raises(RuntimeError):
+                shared.Entities(raw)
+
+
+class TestEntitiesSearch:
+    entities = shared.Entities(b"""{
+"classname" "info_player_teamspawn"
+"targetname" "spawn_red"
+}
+{
+"classname" "info_player_teamspawn"
+"targetname" "spawn_blue"
+"parentname" "train"
+}
+{
+"classname" "func_tracktrain"
+"targetname" "train"
+"OnStart" "spawn_red,Enable,,0,-1"
+"OnStart" "spawn_blue,Enable,,0,-1"
+}
+{
+"classname" "info_target"
+}""")
+
+    def test_search(self):
+        spawns = self.entities.search(classname="info_player_teamspawn")
+        assert [e["targetname"] for e in spawns] == ["spawn_red", "spawn_blue"]
+        assert self.entities.search(classname="info_player_teamspawn", parentname="train") == [self.entities[1]]
+        assert self.entities.search(targetname="") == [self.entities[3]]  # missing key
+        assert self.entities.search(classname="nothing") == []
+        assert "classname" in self.entities._indexes
+
+    def test_search_any(self):
+        results = self.entities.search_any(targetname="train", parentname="train")
+        assert results == self.entities[1:3]
+        self.entities.add_index("parentname")
+        assert self.entities.search_any(targetname="train", parentname="train") == results
+
+    def test_search_regex(self):
+        assert len(self.entities.search_regex(classname="info_.*")) == 3
+        assert len(self.entities.search_regex(classname="info_")) == 0  # must match the whole value
+        assert self.entities.search_regex(OnStart="spawn_red,.*") == [self.entities[2]]  # duplicate keys
+
+    def test_search_prefix(self):
+        assert len(self.entities.search_prefix(classname="info_")) == 3
+        assert self.entities.search_prefix(classname="info_", targetname="spawn_b") == [self.entities[1]]
+        assert self.entities.search_prefix(targetname="zzz") == []
+
+    def test_indexes_cleared(self):
+        entities = shared.Entities(self.entities.as_bytes())
+        assert len(entities.search(classname="info_target")) == 1
+        entities.append({"classname": "info_target"})
+        assert len(entities.search(classname="info_target")) == 2
+        del entities[0]
+        assert len(entities.search_prefix(targetname="spawn_")) == 1
+        entities[0]["targetname"] = "renamed"  # edited in place, index is stale
+        entities.reindex()
+        assert entities.search(targetname="renamed") == [entities[0]]
+
+
+class TestTextureDataStringData:
+    raw_names = b"TOOLS/TOOLSNODRAW\0\0WORLD/DEV/GRID\0WORLD/DEV/GRID\0SKY\0"
+
+    def test_offsets(self):
+        names = shared.TextureDataStringData(self.raw_names)
+        assert names.offsets == [0, 18, 19, 34, 49]
+        assert [names.index_of_offset(o) for o in names.offsets] == [*range(5)]
+        assert names.index("WORLD/DEV/GRID") == 2  # first occurance
+        with pytest.raises(ValueError):
+            names.index("missing")
+
+    def test_at_offset(self):
+        names = shared.TextureDataStringData(self.raw_names)
+        raw = names.as_bytes()
+        for offset in range(-4, len(raw) + 4):
+            assert names.at_offset(offset) == raw[offset:].lstrip(b"\0").partition(b"\0")[0].decode(), offset
+
+    def test_edits(self):
+        names = shared.TextureDataStringData(self.raw_names)
+        assert names.at_offset(34) == "WORLD/DEV/GRID"
+        names[0] = "TOOLS/TOOLSSKIP"
+        assert names.offsets == [0, 16, 17, 32, 47]
+        assert names.at_offset(32) == "WORLD/DEV/GRID"
+        names.append("NEW")
+        assert names.index("NEW") == 5
+        assert names.offsets[-1] == 51
+
+
+@pytest.fixture
+def columnar():
+    shared.GameLump_SPRP.columnar = True
+    yield
+    shared.GameLump_SPRP.columnar = False
+
+
+class TestGameLump_SPRP:
+    def raw_sprp(self) -> bytes:
+        return bytes(load_bsp("tests/maps/Team Fortress 2/test2.bsp").GAME_LUMP._raw_children["sprp"])
+
+    def test_as_bytes(self):
+        raw_sprp = self.raw_sprp()
+        sprp = source.GameLump_SPRP(raw_sprp, orange_box.StaticPropv10)
+        assert isinstance(sprp.props[0], orange_box.StaticPropv10)
+        assert sprp.as_bytes() == raw_sprp
+        assert sprp.as_numpy().tobytes() == raw_sprp[-len(sprp.props) * 72:]
+
+    def test_columnar(self, columnar):
+        raw_sprp = self.raw_sprp()
+        sprp = source.GameLump_SPRP(raw_sprp, orange_box.StaticPropv10)
+        props = sprp.props
+        assert isinstance(props, numpy.ndarray)
+        assert sprp.as_numpy() is props
+        assert sprp.as_bytes() == raw_sprp
+        raw_props = struct.iter_unpack(orange_box.StaticPropv10._format, props.tobytes())
+        structs = list(map(orange_box.StaticPropv10.from_tuple, raw_props))
+        assert props["origin"]["x"].tolist() == [p.origin.x for p in structs]
+        assert props["flags"].tolist() == [p.flags for p in structs]
+        # bulk edits
+        name_index = structs[0].name_index
+        assert set(numpy.flatnonzero(props["name_index"] == name_index)) == {
+            i for i, p in enumerate(structs) if p.name_index == name_index}
+        props["origin"]["z"] += 64
+        edited = source.GameLump_SPRP(sprp.as_bytes(), orange_box.StaticPropv10)
+        assert edited.props["origin"]["z"].tolist() == [p.origin.z + 64 for p in structs]
+
+    def test_titanfall2(self, columnar):
+        titanfall2.GameLump_SPRP.columnar = False  # overrides shared.GameLump_SPRP.columnar
+        try:
+            props = [titanfall2.StaticPropv13(origin=[i, 0, 0], model_name=i % 2) for i in range(4)]
+            raw_sprp = b"".join([(2).to_bytes(4, "little"), b"a.mdl".ljust(128, b"\0"), b"b.mdl".ljust(128, b"\0"),
+                                 struct.pack("3i", len(props), 0, 0),
+                                 *[struct.pack(titanfall2.StaticPropv13._format, *p.flat()) for p in props]])
+            sprp = titanfall2.GameLump_SPRP(raw_sprp, titanfall2.StaticPropv13)
+            assert sprp.props == props
+        finally:
+            del titanfall2.GameLump_SPRP.columnar
+        sprp = titanfall2.GameLump_SPRP(raw_sprp, titanfall2.StaticPropv13)
+        assert sprp.props["model_name"].tolist() == [0, 1, 0, 1]
+        assert sprp.props.dtype.itemsize == 64
+        assert sprp.as_bytes() == raw_sprp
@@ -0,0 +1,100 @@
+import pytest
+
+from bsp_tool import RespawnBsp
+from bsp_tool.branches import shared
+from bsp_tool.branches.id_software import quake
+from bsp_tool.branches.respawn import titanfall
+
+
+def material_bsp() -> RespawnBsp:
+    """TextureData -> MaterialSort -> Mesh, without loading a .bsp"""
+    bsp = RespawnBsp(titanfall, "untitled.bsp", autoload=False)
+    bsp.TEXTURE_DATA_STRING_DATA = shared.TextureDataStringData(b"TOOLS/TOOLSNODRAW\0WORLD/DEV/GRID\0UNUSED\0")
+    bsp.TEXTURE_DATA = [titanfall.TextureData(name_index=i) for i in (1, 0, 1, 2)]
+    bsp.MATERIAL_SORT = [titanfall.MaterialSort(texture_data=i) for i in (2, 0, 1, 0)]
+    bsp.MESHES = [titanfall.Mesh(material_sort=i) for i in (1, 3, 0, 2, 1)]
+    return bsp
+
+
+class TestMaterialIndex:
+    def test_index(self):
+        index = material_bsp().material_index()
+        assert index.texture_data == {"WORLD/DEV/GRID": [0, 2], "TOOLS/TOOLSNODRAW": [1], "UNUSED": [3]}
+        assert index.material_sorts == [[1, 3], [2], [0], []]
+        assert index.meshes == [[2], [0, 4], [3], [1]]
+        assert index.unused_texture_data() == {3}
+
+    def test_methods(self):
+        bsp = material_bsp()
+        # matches the order of a nested scan over TEXTURE_DATA, MATERIAL_SORT & MESHES
+        expected = [mesh for td_index, td in enumerate(bsp.TEXTURE_DATA) if td.name_index == 1
+                    for ms_index, ms in enumerate(bsp.MATERIAL_SORT) if ms.texture_data == td_index
+                    for mesh in bsp.MESHES if mesh.material_sort == ms_index]
+        assert list(bsp.find_mesh_by_texture("WORLD/DEV/GRID")) == expected
+        with pytest.raises(ValueError):
+            list(bsp.find_mesh_by_texture("UNKNOWN"))
+        assert [bsp.get_mesh_texture(i) for i in range(5)] == ["WORLD/DEV/GRID", "WORLD/DEV/GRID",
+                                                               "WORLD/DEV/GRID", "TOOLS/TOOLSNODRAW",
+                                                               "WORLD/DEV/GRID"]
+        assert bsp.debug_unused_TextureData() == {3}
+
+    def test_cache(self):
+        bsp = material_bsp()
+        assert bsp.material_index() is bsp.material_index()
+        bsp.replace_texture("TOOLS/TOOLSNODRAW", "TOOLS/TOOLSSKIP")
+        assert bsp.get_mesh_texture(3) == "TOOLS/TOOLSSKIP"
+        bsp.MESHES[0] = titanfall.Mesh(material_sort=2)
+        assert bsp.get_mesh_texture(0) == "WORLD/DEV/GRID"  # stale until rebuilt
+        bsp.material_index(rebuild=True)
+        assert bsp.get_mesh_texture(0) == "TOOLS/TOOLSSKIP"
+
+
+def mesh_bsp() -> RespawnBsp:
+    """2 models; model 1 has meshes in 2 vertex lumps & 2 materials"""
+    bsp = material_bsp()
+    bsp.VERTICES = [quake.Vertex(i, i * 2, i * 3) for i in range(8)]
+    bsp.VERTEX_NORMALS = [quake.Vertex(0, 0, 1), quake.Vertex(0, 1, 0)]
+    bsp.VERTEX_LIT_BUMP = [titanfall.VertexLitBump(i, i % 2, [i, -i], -1, [0.5, 0.25], [0] * 4) for i in range(8)]
+    bsp.VERTEX_UNLIT = [titanfall.VertexUnlit(7 - i, 0, [0, 1], -1) for i in range(4)]
+    bsp.MESH_INDICES = [0, 1, 2, 2, 1, 3, 0, 1, 2, 0, 2, 1]
+    bump, unlit = titanfall.Flags.VERTEX_LIT_BUMP, titanfall.Flags.VERTEX_UNLIT
+    bsp.MATERIAL_SORT = [titanfall.MaterialSort(texture_data=0, vertex_offset=0),
+                         titanfall.MaterialSort(texture_data=1, vertex_offset=4),
+                         titanfall.MaterialSort(texture_data=1, vertex_offset=0)]
+    bsp.MESHES = [titanfall.Mesh(first_mesh_index=0, num_triangles=1, material_sort=0, flags=bump),
+                  titanfall.Mesh(first_mesh_index=6, num_triangles=1, material_sort=1, flags=bump),  # TOOLSNODRAW
+                  titanfall.Mesh(first_mesh_index=0, num_triangles=2, material_sort=0, flags=bump),
+                  titanfall.Mesh(first_mesh_index=9, num_triangles=1, material_sort=2, flags=unlit)]  # TOOLSNODRAW
+    bsp.MODELS = [titanfall.Model(first_mesh=0, num_meshes=1), titanfall.Model(first_mesh=1, num_meshes=3)]
+    return bsp
+
+
+class TestMeshArrays:
+    def test_vertices_of_model(self):
+        bsp = mesh_bsp()
+        assert len(bsp.vertices_of_model(0)) == 3
+        assert len(bsp.vertices_of_model(1)) == 12  # not range(first_mesh, num_meshes)
+
+    def test_mesh_arrays(self):
+        bsp = mesh_bsp()
+        arrays = bsp.mesh_arrays(1)
+        assert list(arrays.materials) == ["WORLD/DEV/GRID", "TOOLS/TOOLSNODRAW"]
+        assert arrays.materials["WORLD/DEV/GRID"] == slice(0, 6)
+        assert arrays.materials["TOOLS/TOOLSNODRAW"] == slice(6, 12)
+        assert len(arrays.positions) == 7 + 3  # each vertex used is only gathered once
+        # each triangle corner matches the slow path, grouped by texture
+        expected = [*bsp.vertices_of_mesh(2), *bsp.vertices_of_mesh(1), *bsp.vertices_of_mesh(3)]
+        for i, vertex in zip(arrays.indices, expected):
+            assert arrays.positions[i].tolist() == bsp.VERTICES[vertex.position_index]
+            assert arrays.normals[i].tolist() == bsp.VERTEX_NORMALS[vertex.normal_index]
+            assert arrays.uv0[i].tolist() == vertex.uv0
+            assert arrays.uv1[i].tolist() == (vertex.uv1 if hasattr(vertex, "uv1") else [0, 0])
+        assert arrays.colours.tolist() == [[255] * 4] * 10
+
+    def test_empty(self):
+        bsp = mesh_bsp()
+        bsp.MODELS.append(titanfall.Model(first_mesh=4, num_meshes=0))
+        arrays = bsp.mesh_arrays(2)
+        assert arrays.positions.shape == (0, 3)
+        assert arrays.indices.shape == (0,)
+        assert arrays.materials == dict()
@@ -0,0 +1,77 @@
+import io
+import json
+import struct
+
+import pytest
+
+from bsp_tool import load_bsp
+from bsp_tool.extensions import export
+
+from ..branches.test_titanfall import mesh_bsp
+
+
+maps = ["tests/maps/Team Fortress 2/test_displacement_decompile.bsp",
+        "tests/maps/Quake 3 Arena/mp_lobby.bsp"]
+
+
+def load(filename):
+    return mesh_bsp() if filename is None else load_bsp(filename)
+
+
+@pytest.mark.parametrize("filename", [*maps, None])
+def test_obj(filename):
+    bsp = load(filename)
+    meshes = list(export.meshes(bsp))
+    obj_file = io.StringIO()
+    export.write_obj(bsp, obj_file, chunk_size=16)
+    if filename is not None:
+        bsp.file.close()
+    lines = obj_file.getvalue().split("\n")
+    assert sum(line.startswith("v ") for line in lines) == sum(len(m.positions) for m in meshes)
+    assert sum(line.startswith("f ") for line in lines) == sum(len(m.indices) // 3 for m in meshes)
+    assert sum(line.startswith("usemtl ") for line in lines) == len(meshes)
+    num_vertices = sum(len(m.positions) for m in meshes)
+    for line in lines:
+        if line.startswith("f "):
+            assert all(1 <= int(i) <= num_vertices for corner in line.split()[1:] for i in corner.split("/"))
+
+
+@pytest.mark.parametrize("filename", [*maps, None])
+def test_glb(filename):
+    bsp = load(filename)
+    meshes = [m for m in export.meshes(bsp) if len(m.indices) > 0]
+    glb_file = io.BytesIO()
+    export.write_glb(bsp, glb_file)
+    if filename is not None:
+        bsp.file.close()
+    raw = glb_file.getvalue()
+    magic, version, length = struct.unpack("<4s2I", raw[:12])
+    assert (magic, version, length) == (b"glTF", 2, len(raw))
+    json_length, json_type = struct.unpack("<I4s", raw[12:20])
+    assert json_type == b"JSON"
+    gltf = json.loads(raw[20:20 + json_length])
+    bin_length, bin_type = struct.unpack("<I4s", raw[20 + json_length:28 + json_length])
+    assert bin_type == b"BIN\0"
+    assert bin_length == gltf["buffers"][0]["byteLength"] == len(raw) - 28 - json_length
+    primitives = [p for mesh in gltf["meshes"] for p in mesh["primitives"]]
+    assert len(primitives) == len(meshes)
+    for primitive, mesh in zip(primitives, meshes):
+        assert gltf["accessors"][primitive["indices"]]["count"] == len(mesh.indices)
+        assert gltf["accessors"][primitive["attributes"]["POSITION"]]["count"] == len(mesh.positions)
+        assert gltf["materials"][primitive["material"]]["name"] == mesh.material
+
+
+def test_glb_empty(monkeypatch):
+    bsp = load(maps[0])
+    monkeypatch.setattr(export, "meshes", lambda bsp: iter(()))  # nothing to export
+    glb_file = io.BytesIO()
+    export.write_glb(bsp, glb_file)
+    bsp.file.close()
+    raw = glb_file.getvalue()
+    json_length = struct.unpack("<I", raw[12:16])[0]
+    assert len(raw) == 20 + json_length  # no BIN chunk
+    gltf = json.loads(raw[20:20 + json_length])
+    for key in ("meshes", "materials", "accessors", "bufferViews", "buffers"):
+        assert key not in gltf
+    assert "children" not in gltf["nodes"][0]
+    assert gltf["scenes"] == [{"nodes": [0]}]
@@ -0,0 +1,28 @@
+import os
+
+from bsp_tool import batch
+
+from . import maplist
+
+
+def lump_count(bsp):
+    return len(bsp.headers)
+
+
+def test_find_maps():
+    filenames = batch.find_maps(maplist.installed_games)
+    assert len(filenames) != 0
+    assert all(os.path.exists(f) for f in filenames)
+    assert batch.find_maps(filenames[:2]) == filenames[:2]
+
+
+def test_batch():
+    filenames = batch.find_maps({("./", "tests/maps"): ["Quake 3 Arena", "Team Fortress 2"]})
+    filenames.append("tests/maps/missing.bsp")
+    jobs = batch.Batch(filenames, lump_count, workers=2, max_pending=2)
+    results = list(jobs)
+    assert {r.filename for r in results} == set(filenames)
+    assert set(jobs.errors) == {"tests/maps/missing.bsp"}
+    assert "FileNotFoundError" in jobs.errors["tests/maps/missing.bsp"]
+    assert all(count > 0 for count in jobs.results.values())
+    assert jobs.report().startswith(f"1 out of {len(filenames)} .bsps failed")
@@ -1,12 +1,14 @@
 import fnmatch
+import io
 import os
+import zipfile
 
 import pytest
 
 from . import maplist
 from bsp_tool import branches
 from bsp_tool import lumps
-from bsp_tool import load_bsp
+from bsp_tool import load_bsp, probe
 
 
 # auto-detect helper for games with shared (file_magic, version)
@@ -75,3 +77,60 @@ def test_load_bsp(group_path, game_name, map_dirs):
                     types.add((bsp.__class__.__name__, bsp.branch.__name__, bsp.bsp_version))
                     del bsp
     assert errors == dict(), "\n".join([f"{len(errors)} out of {total} .bsps failed", *map(str, types)])
+
+
+test_maps = [os.path.join(folder, m) for folder, dirs, files in os.walk("tests/maps")
+             for m in fnmatch.filter(files, "*[Bb][Ss][Pp]")]
+
+
+@pytest.mark.parametrize("filename", test_maps)
+def test_probe(filename):
+    probed = probe(filename)
+    bsp = load_bsp(filename)
+    bsp.file.close()
+    assert probed.BspVariant is bsp.__class__
+    assert probed.branch is bsp.branch
+    assert probed.bsp_version == bsp.bsp_version
+    assert probed.bsp_file_size == bsp.bsp_file_size
+    headers = bsp.headers if isinstance(bsp.headers, dict) else {h.name: h for h in bsp.headers}
+    assert probed.headers == headers
+
+
+def in_memory_sources(filename: str) -> dict:
+    with open(filename, "rb") as bsp_file:
+        data = bsp_file.read()
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as pk3:
+        pk3.writestr(f"maps/{os.path.basename(filename)}", data)
+    pk3 = zipfile.ZipFile(archive)
+    return {"bytes": data,
+            "bytearray": bytearray(data),
+            "memoryview": memoryview(data),
+            "BytesIO": io.BytesIO(data),
+            "file": open(filename, "rb"),
+            "ZipExtFile": pk3.open(pk3.namelist()[0])}
+
+
+@pytest.mark.parametrize("filename", test_maps)
+@pytest.mark.parametrize("mmap", [False, True])
+def test_load_from_memory(filename, mmap):
+    on_disk = load_bsp(filename)
+    for source_type, source in in_memory_sources(filename).items():
+        bsp = load_bsp(source, mmap=mmap)
+        assert bsp.__class__ is on_disk.__class__, source_type
+        assert bsp.branch is on_disk.branch, source_type
+        assert bsp.folder == ""
+        if source_type in ("file", "ZipExtFile"):
+            assert bsp.filename == on_disk.filename
+        assert bsp.bsp_file_size == on_disk.bsp_file_size
+        assert bsp.headers == on_disk.headers
+        assert bsp.associated_files == list()
+        for lump_name in on_disk._loadable_lumps:
+            lump, expected = getattr(bsp, lump_name), getattr(on_disk, lump_name)
+            if hasattr(expected, "as_bytes"):  # RawBspLump, BspLump etc. & most SpecialLumpClasses
+                lump, expected = lump.as_bytes(), expected.as_bytes()
+            assert lump == expected, f"{source_type}: {lump_name}"
+        if source_type != "file":  # lumps are views of the buffer
+            assert isinstance(bsp._lump_file, memoryview)
+        bsp.file.close()
+    on_disk.file.close()
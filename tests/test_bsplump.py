@@ -1,7 +1,15 @@
+import io
+import lzma
+import os
+import struct
+from typing import Dict, List, Tuple
+
 import pytest
 
-from bsp_tool import load_bsp, lumps
+from bsp_tool import branches, load_bsp, lumps
+from bsp_tool.base import LumpHeader
 from bsp_tool.branches.id_software import quake, quake3
+from bsp_tool.branches.valve import orange_box, source
 
 global bsps
 # TODO: use maplist.installed_games to grab .bsps to test
@@ -11,6 +19,15 @@ bsps = {"mp_lobby": load_bsp("tests/maps/Quake 3 Arena/mp_lobby.bsp"),
         "test_physcollide": load_bsp("tests/maps/Team Fortress 2/test_physcollide.bsp")}
 
 
+def fresh(map_name: str, mmap: bool = False):
+    """reload bsps[map_name]; edits made to it can't leak into other tests"""
+    bsp = bsps[map_name]
+    return load_bsp(os.path.join(bsp.folder, bsp.filename), mmap=mmap)
+
+
+mapped_bsps = {map_name: fresh(map_name, mmap=True) for map_name in bsps}
+
+
 class TestRawBspLump:
     # NOTE: Quake3 has implemented a rough Visibility SpecialLumpClass
     # TODO: generate raw lumps, since the end goal is to have none
@@ -38,6 +55,19 @@ class TestRawBspLump:
             with pytest.raises(TypeError):
                 assert lump["one"], f"{map_name} failed"
 
+    def test_edits(self):
+        for map_name in ("test2", "test_physcollide"):
+            lump = fresh(map_name).VISIBILITY
+            raw = bytearray(lump[::])
+            del lump[4:8]
+            del raw[4:8]
+            lump += b"\x01\x02"
+            raw += b"\x01\x02"
+            lump[0] = 255
+            raw[0] = 255
+            assert lump[::] == bytes(raw), f"{map_name} failed"
+            assert lump.as_bytes() == bytes(raw), f"{map_name} failed"
+
 
 class TestBspLump:
     def test_list_conversion(self):
@@ -80,6 +110,96 @@ class TestBspLump:
             assert lump[:2] == [empty_entry, empty_entry], f"{map_name} failed"
             # TODO: allow for insert via slice & test for this
 
+    def test_slicing(self):
+        for map_name in bsps:
+            lump = fresh(map_name).VERTICES
+            entries = [lump[i] for i in range(len(lump))]
+            for _slice in (slice(None), slice(2, -2), slice(None, None, -1), slice(1, None, 3),
+                           slice(-1, 2, -2), slice(5, 2), slice(len(lump) + 8, None)):
+                assert lump[_slice] == entries[_slice], f"{map_name}.VERTICES[{_slice}] failed"
+
+    def test_slice_changes(self):
+        for map_name in bsps:
+            lump = fresh(map_name).VERTICES
+            empty_entry = lump.LumpClass()
+            lump[1] = empty_entry
+            lump.append(empty_entry)
+            assert lump[:3][1] == empty_entry, f"{map_name} failed"
+            assert lump[::-1][0] == empty_entry, f"{map_name} failed"
+            assert list(lump)[-1] == empty_entry, f"{map_name} failed"
+
+    def test_as_bytes(self):
+        for map_name in bsps:
+            bsp = fresh(map_name)
+            lump = bsp.VERTICES
+            with open(os.path.join(bsp.folder, bsp.filename), "rb") as bsp_file:
+                bsp_file.seek(lump.offset)
+                assert lump.as_bytes() == bsp_file.read(len(lump) * lump._entry_size), f"{map_name} failed"
+            lump[0] = lump.LumpClass()
+            assert lump.as_bytes()[:lump._entry_size] == lump.LumpClass().as_bytes(), f"{map_name} failed"
+
+    def test_edits(self):
+        for map_name in bsps:
+            lump = fresh(map_name).VERTICES
+            entries = lump[::]
+            empty_entry = lump.LumpClass()
+            for edit in (lambda x: x.insert(3, empty_entry), lambda x: x.__delitem__(slice(1, 5)),
+                         lambda x: x.extend([empty_entry] * 3), lambda x: x.__setitem__(2, empty_entry),
+                         lambda x: x.insert(-2, empty_entry), lambda x: x.__delitem__(slice(None, None, 3)),
+                         lambda x: x.pop(), lambda x: x.insert(0, empty_entry), lambda x: x.__delitem__(-3)):
+                edit(lump)
+                edit(entries)
+                assert len(lump) == len(entries), f"{map_name} failed"
+                assert lump[::] == entries, f"{map_name} failed"
+                assert lump[::-2] == entries[::-2], f"{map_name} failed"
+                assert lump[-1] == entries[-1], f"{map_name} failed"
+            assert lump.is_edited()
+            raw = b"".join(lump._struct.pack(*entry.flat()) for entry in entries)
+            assert lump.as_bytes() == raw, f"{map_name} failed"
+            assert b"".join(lump.iter_bytes(chunk_size=lump._entry_size * 3)) == raw, f"{map_name} failed"
+
+    def test_many_edits(self):
+        lump = fresh("test2").VERTICES
+        lump._block_size = 2  # lots of blocks
+        entries = lump[::]
+        for i in range(len(entries) // 2):
+            for edit in (lambda x: x.__delitem__((i * 7) % len(x)), lambda x: x.insert((i * 5) % len(x), x[i])):
+                edit(lump)
+                edit(entries)
+        assert len(lump._blocks) > 1
+        assert lump[::] == entries
+        assert lump.as_bytes() == b"".join(lump._struct.pack(*entry.flat()) for entry in entries)
+
+
+class TestMemoryMappedBspLump:
+    def test_its_mapped(self):
+        for map_name in mapped_bsps:
+            for lump_name in ("VERTICES", "LEAF_FACES"):
+                lump = getattr(mapped_bsps[map_name], lump_name)
+                assert isinstance(lump._view, memoryview), f"{map_name}.{lump_name} is not memory mapped"
+
+    def test_matches_file(self):
+        for map_name, mapped_bsp in mapped_bsps.items():
+            bsp = fresh(map_name)
+            for lump_name in ("VERTICES", "LEAF_FACES"):
+                lump = getattr(mapped_bsp, lump_name)
+                assert list(lump) == list(getattr(bsp, lump_name)), f"{map_name}.{lump_name} failed"
+
+    def test_as_numpy(self):
+        for map_name, mapped_bsp in mapped_bsps.items():
+            bsp = fresh(map_name)
+            for lump_name in ("VERTICES", "LEAF_FACES"):
+                array = getattr(mapped_bsp, lump_name).as_numpy()
+                assert array.base is not None, f"{map_name}.{lump_name} was copied"
+                assert array.tobytes() == getattr(bsp, lump_name).as_bytes(), f"{map_name}.{lump_name} failed"
+                assert array.tobytes() == getattr(bsp, lump_name).as_numpy().tobytes(), f"{map_name}.{lump_name} failed"
+
+    def test_raw_slice_is_view(self):
+        for map_name in ("test2", "test_physcollide"):
+            lump = mapped_bsps[map_name].VISIBILITY
+            assert isinstance(lump[:16], memoryview), f"{map_name} failed"
+            assert bytes(lump[:16]) == bytes(bsps[map_name].VISIBILITY[:16]), f"{map_name} failed"
+
 
 class TestExternalBspLump:  # TODO: ship bespoke RespawnBsp .bsp_lump files with tests
     pass  # ensure data is being loaded from the .bsp_lump, not the .bsp
@@ -112,3 +232,143 @@ class TestBasicBspLump:
             # TODO: check slice cases (negative step, wide step, invalid slice)
             with pytest.raises(TypeError):
                 assert lump["one"], f"{map_name} failed"
+
+    def test_changes(self):
+        for map_name in bsps:
+            lump = fresh(map_name).LEAF_FACES
+            lump[0] = lump.LumpClass(65535)
+            assert lump[0] == 65535, f"{map_name} failed"
+            assert lump[:1] == [65535], f"{map_name} failed"
+            assert lump.as_bytes()[:lump._entry_size] == lump._struct.pack(65535), f"{map_name} failed"
+
+
+def game_lump(children: List[Tuple[bytes, int, int, bytes]], offset: int = 16) -> bytes:
+    """raw GAME_LUMP starting at offset; children are (id, flags, version, raw_child)"""
+    header_size = struct.calcsize(source.GameLumpHeader._format)
+    child_offset = offset + 4 + len(children) * header_size
+    headers = list()
+    for _id, flags, version, raw_child in children:
+        length = int.from_bytes(raw_child[4:8], "little") if flags & 1 else len(raw_child)
+        headers.append(struct.pack(source.GameLumpHeader._format, _id, flags, version, child_offset, length))
+        child_offset += len(raw_child)
+    return b"".join([len(children).to_bytes(4, "little"), *headers, *[c[3] for c in children]])
+
+
+class TestGameLump:
+    def raw_children(self) -> Dict[str, bytes]:
+        game_lump = fresh("test2").GAME_LUMP
+        return {name: bytes(game_lump._raw_children[name]) for name in game_lump.headers}
+
+    def test_lazy(self):
+        game_lump = fresh("test2").GAME_LUMP
+        assert "sprp" not in game_lump.__dict__
+        assert isinstance(game_lump.sprp, source.GameLump_SPRP)
+        assert "sprp" in game_lump.__dict__
+        assert "dprp" not in game_lump.__dict__
+        assert len(game_lump.loading_errors) == 0
+        with pytest.raises(AttributeError):
+            game_lump.not_a_child_lump
+
+    def test_as_bytes(self):
+        bsp = fresh("test2")
+        header = bsp.headers["GAME_LUMP"]
+        with open(os.path.join(bsp.folder, bsp.filename), "rb") as bsp_file:
+            bsp_file.seek(header.offset)
+            raw_game_lump = bsp_file.read(header.length)
+        assert bsp.GAME_LUMP.as_bytes(header.offset) == raw_game_lump  # untouched; copied
+        model_names = bsp.GAME_LUMP.sprp.model_names  # loaded; re-encoded
+        reloaded = lumps.GameLump(io.BytesIO(bsp.GAME_LUMP.as_bytes(0)), LumpHeader(0, header.length, 0, 0),
+                                  orange_box.GAME_LUMP_CLASSES, source.GameLumpHeader)
+        assert reloaded.sprp.model_names == model_names
+        assert bytes(reloaded._raw_children["dprp"]) == bytes(bsp.GAME_LUMP._raw_children["dprp"])
+        assert bsp.GAME_LUMP.as_bytes(header.offset) == raw_game_lump  # unedited sprp re-encodes losslessly
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_compressed(self, workers):
+        raw_children = self.raw_children()
+        children = [(b"prps", 1, 10, lumps.compress(raw_children["sprp"])),
+                    (b"prpd", 0, 4, raw_children["dprp"]),
+                    (b"\0\0\0\0", 0, 0, b"")]  # marks the end of the last compressed child
+        raw_game_lump = game_lump(children)
+        lump_header = LumpHeader(16, len(raw_game_lump), 0, 0)
+        lump_file = io.BytesIO(b"\0" * 16 + raw_game_lump)
+        game_lump_ = lumps.GameLump(lump_file, lump_header, orange_box.GAME_LUMP_CLASSES, source.GameLumpHeader,
+                                    workers)
+        assert game_lump_.headers["sprp"].length == len(raw_children["sprp"])
+        assert game_lump_.as_bytes(16) == raw_game_lump  # untouched; still compressed
+        model_names = game_lump_.sprp.model_names
+        assert model_names == fresh("test2").GAME_LUMP.sprp.model_names
+        assert len(game_lump_.loading_errors) == 0
+        # loaded child lumps are saved uncompressed
+        uncompressed = game_lump_.as_bytes(16)
+        reloaded = lumps.GameLump(io.BytesIO(b"\0" * 16 + uncompressed), LumpHeader(16, len(uncompressed), 0, 0),
+                                  orange_box.GAME_LUMP_CLASSES, source.GameLumpHeader)
+        assert reloaded.headers["sprp"].flags & 1 == 0
+        assert reloaded.sprp.model_names == model_names
+        assert bytes(reloaded._raw_children["dprp"]) == raw_children["dprp"]
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_corrupt_compressed(self, workers):
+        raw_children = self.raw_children()
+        corrupt = lumps.compress(raw_children["sprp"])[:17] + b"\xFF" * 32  # valid header, garbage stream
+        children = [(b"prps", 1, 10, corrupt),
+                    (b"prpd", 0, 4, raw_children["dprp"]),
+                    (b"\0\0\0\0", 0, 0, b"")]
+        raw_game_lump = game_lump(children)
+        lump_file = io.BytesIO(b"\0" * 16 + raw_game_lump)
+        game_lump_ = lumps.GameLump(lump_file, LumpHeader(16, len(raw_game_lump), 0, 0),
+                                    orange_box.GAME_LUMP_CLASSES, source.GameLumpHeader, workers)
+        assert isinstance(game_lump_.sprp, lumps.RawBspLump)  # still compressed
+        assert game_lump_.sprp.as_bytes() == corrupt
+        assert "sprp" in game_lump_.loading_errors
+        game_lump_.dprp  # other children still load
+        assert "dprp" not in game_lump_.loading_errors
+
+
+def lzma_lump(data: bytes) -> bytes:
+    """Valve LZMA compressed lump"""
+    _filter = {"id": lzma.FILTER_LZMA1}
+    compressed = lzma.compress(data, lzma.FORMAT_RAW, filters=[_filter])
+    properties = lzma._encode_filter_properties(_filter)
+    return b"LZMA" + struct.pack("2I", len(data), len(compressed)) + properties + compressed
+
+
+class TestDecompression:
+    def test_decompressed_all(self, tmp_path):
+        entries = [struct.pack("64I", *range(i, i + 64)) for i in range(4)]
+        compressed = [lzma_lump(e) for e in entries]
+        bsp_filename = tmp_path / "compressed.bsp"
+        bsp_filename.write_bytes(b"".join(compressed))
+        offsets = [sum(map(len, compressed[:i])) for i in range(4)]
+        lump_headers = {f"LUMP_{i}": LumpHeader(o, len(c), 0, len(e))
+                        for i, (o, c, e) in enumerate(zip(offsets, compressed, entries))}
+        lump_headers["RAW"] = LumpHeader(0, 4, 0, 0)
+        with open(bsp_filename, "rb") as bsp_file:
+            decompressed = lumps.decompressed_all(bsp_file, lump_headers, workers=4)
+        assert set(decompressed) == {f"LUMP_{i}" for i in range(4)}  # uncompressed lumps are skipped
+        for i, entry in enumerate(entries):
+            lump_file, lump_header = decompressed[f"LUMP_{i}"]
+            assert lump_header == LumpHeader(0, len(entry), 0, 0)
+            assert lumps.create_RawBspLump(lump_file, lump_header).as_bytes() == entry
+
+
+class TestDecompressionCache:
+    def test_cache(self, tmp_path, monkeypatch):
+        entries = struct.pack("64I", *range(64))
+        compressed = lzma_lump(entries)
+        bsp_filename = tmp_path / "compressed.bsp"
+        bsp_filename.write_bytes(b"\0" * 8 + compressed)
+        lump_header = LumpHeader(8, len(compressed), 0, len(entries))
+        cache = lumps.DecompressionCache(str(tmp_path / "cache"))
+        monkeypatch.setattr(lumps, "decompression_cache", cache)
+        with open(bsp_filename, "rb") as bsp_file:
+            lump = lumps.create_BasicBspLump(bsp_file, lump_header, branches.shared.UnsignedInts)
+            assert not isinstance(lump._view, memoryview)  # first load decompresses
+            assert len(os.listdir(cache.folder)) == 1
+            lump = lumps.create_BasicBspLump(bsp_file, lump_header, branches.shared.UnsignedInts)
+        assert isinstance(lump._view, memoryview)  # second load is mapped from the cache
+        assert lump.as_bytes() == entries
+        assert list(lump) == list(range(64))
+        cache.max_size = 0
+        cache.evict()
+        assert os.listdir(cache.folder) == [] or os.name == "nt"  # mapped files can't be deleted on Windows
@@ -0,0 +1,63 @@
+import io
+import tracemalloc
+
+import pytest
+
+from bsp_tool import load_bsp, profiling
+
+
+test2 = "tests/maps/Team Fortress 2/test2.bsp"
+
+
+@pytest.fixture
+def profiler():
+    calls = list()
+    profiling.enable(lambda bsp, lump_name, stats: calls.append((lump_name, stats)))
+    yield calls
+    profiling.disable()
+
+
+def test_disabled():
+    bsp = load_bsp(test2)
+    assert bsp.load_stats == dict()
+    assert isinstance(bsp.file, io.BufferedReader)  # not wrapped
+
+
+def test_load_stats(profiler):
+    bsp = load_bsp(test2)
+    assert set(bsp.load_stats) == set(bsp._loadable_lumps)
+    assert {lump_name for lump_name, stats in profiler} == set(bsp.load_stats)  # hook called for each lump
+    entities = bsp.load_stats["ENTITIES"]
+    assert entities.bytes_read == bsp.headers["ENTITIES"].length
+    assert entities.reads >= 1 and entities.seeks >= 1
+    assert entities.wall_time > 0
+    assert entities.peak_allocation is None  # tracemalloc isn't tracing
+    assert bsp.load_stats["VERTICES"].bytes_read == 0  # BspLumps read entries on access, not while loading
+
+
+def test_lazy(profiler):
+    bsp = load_bsp(test2, lazy=True)
+    assert bsp.load_stats == dict()
+    bsp.VERTICES
+    assert list(bsp.load_stats) == ["VERTICES"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_decompression_time(profiler, tmp_path, workers):
+    load_bsp(test2).save_as(str(tmp_path / "compressed.bsp"), compress=True)
+    bsp = load_bsp(str(tmp_path / "compressed.bsp"), workers=workers)
+    assert bsp.headers["VERTICES"].fourCC != 0
+    assert bsp.load_stats["VERTICES"].decompression_time > 0
+    assert bsp.load_stats["PAKFILE"].decompression_time == 0  # never compressed
+
+
+def test_trace_allocations():
+    profiling.enable(trace_allocations=True)
+    try:
+        bsp = load_bsp(test2)
+    finally:
+        profiling.disable()
+    if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+        assert bsp.load_stats["ENTITIES"].peak_allocation > 0
+    else:
+        assert bsp.load_stats["ENTITIES"].peak_allocation is None
@@ -0,0 +1,148 @@
+import os
+
+import pytest
+
+from bsp_tool import lumps, RespawnBsp
+from bsp_tool.base import LumpHeader
+from bsp_tool.branches import shared
+from bsp_tool.branches.id_software import quake
+from bsp_tool.branches.respawn import titanfall
+
+
+def new_bsp(filename: str) -> RespawnBsp:
+    """a small titanfall .bsp, saved to filename"""
+    bsp = RespawnBsp(titanfall, filename, autoload=False)
+    bsp.bsp_version = titanfall.BSP_VERSION
+    bsp.revision = 1
+    lump_classes = {**titanfall.BASIC_LUMP_CLASSES, **titanfall.LUMP_CLASSES, **titanfall.SPECIAL_LUMP_CLASSES}
+    versions = {name: min(versions) for name, versions in lump_classes.items()}
+    bsp.headers = {L.name: LumpHeader(0, 0, versions.get(L.name, 0), 0) for L in titanfall.LUMP}
+    bsp.TEXTURE_DATA_STRING_DATA = shared.TextureDataStringData(b"TOOLS/TOOLSNODRAW\0WORLD/DEV/GRID\0")
+    bsp.TEXTURE_DATA = [titanfall.TextureData(name_index=i) for i in (1, 0)]
+    bsp.MATERIAL_SORT = [titanfall.MaterialSort(texture_data=i) for i in (0, 1)]
+    bsp.MESH_INDICES = [0, 1, 2, 2, 1, 3]
+    bsp.VERTICES = [quake.Vertex(x, y, 0) for x, y in ((0, 0), (64, 0), (0, 64), (64, 64))]
+    bsp.save_as(filename)
+    return RespawnBsp(titanfall, filename)
+
+
+def lump_bytes(filename: str, lump_header: LumpHeader) -> bytes:
+    with open(filename, "rb") as bsp_file:
+        bsp_file.seek(lump_header.offset)
+        return bsp_file.read(lump_header.length)
+
+
+class TestSave:
+    def test_new_bsp(self, tmp_path):
+        bsp = new_bsp(str(tmp_path / "test.bsp"))
+        assert len(bsp.loading_errors) == 0
+        assert bsp.TEXTURE_DATA_STRING_DATA == ["TOOLS/TOOLSNODRAW", "WORLD/DEV/GRID"]
+        assert [td.name_index for td in bsp.TEXTURE_DATA] == [1, 0]
+        assert list(bsp.MESH_INDICES) == [0, 1, 2, 2, 1, 3]
+        assert [tuple(v) for v in bsp.VERTICES] == [(0, 0, 0), (64, 0, 0), (0, 64, 0), (64, 64, 0)]
+
+    def test_copy_unchanged(self, tmp_path):
+        filename = str(tmp_path / "test.bsp")
+        bsp = new_bsp(filename)
+        bsp.save_as(str(tmp_path / "copy.bsp"))
+        with open(filename, "rb") as bsp_file, open(tmp_path / "copy.bsp", "rb") as copy_file:
+            assert bsp_file.read() == copy_file.read()
+
+    def test_copy_from_memory(self, tmp_path):
+        filename = str(tmp_path / "test.bsp")
+        new_bsp(filename).file.close()
+        with open(filename, "rb") as bsp_file:
+            original = bsp_file.read()
+        bsp = RespawnBsp(titanfall, original)
+        for _ in range(2):  # new file, then an existing file which isn't the source
+            bsp.save_as(str(tmp_path / "copy.bsp"))
+            with open(tmp_path / "copy.bsp", "rb") as copy_file:
+                assert copy_file.read() == original
+
+    def test_in_place(self, tmp_path):
+        filename = str(tmp_path / "test.bsp")
+        bsp = new_bsp(filename)
+        file_size, inode = os.path.getsize(filename), os.stat(filename).st_ino
+        old_headers = {**bsp.headers}
+        old_lumps = {n: lump_bytes(filename, h) for n, h in old_headers.items() if n != "TEXTURE_DATA"}
+        bsp.TEXTURE_DATA[0] = titanfall.TextureData(name_index=0)  # one texture edit
+        bsp.save()
+        assert bsp.headers == old_headers
+        assert os.path.getsize(filename) == file_size
+        assert os.stat(filename).st_ino == inode  # written in place, not replaced
+        assert {n: lump_bytes(filename, h) for n, h in old_headers.items() if n != "TEXTURE_DATA"} == old_lumps
+        assert [td.name_index for td in bsp.TEXTURE_DATA] == [0, 0]
+        assert len(bsp.TEXTURE_DATA._changes) == 0
+
+    def test_grow(self, tmp_path):
+        filename = str(tmp_path / "test.bsp")
+        bsp = new_bsp(filename)
+        vertices, inode = bsp.VERTICES[::], os.stat(filename).st_ino
+        bsp.TEXTURE_DATA.append(titanfall.TextureData(name_index=1))
+        bsp.save()  # doesn't fit in place; every lump after TEXTURE_DATA has to move
+        assert os.stat(filename).st_ino != inode
+        assert [td.name_index for td in bsp.TEXTURE_DATA] == [1, 0, 1]
+        assert bsp.VERTICES[::] == vertices
+        assert bsp.headers["TEXTURE_DATA"].length == 3 * bsp.TEXTURE_DATA._entry_size
+        assert all(h.offset % 4 == 0 for h in bsp.headers.values())
+
+
+def external_bsp(folder, name: str = "test", mmap: bool = False) -> RespawnBsp:
+    """new_bsp w/ a few lumps copied to .bsp_lump files (& an unknown lump only in a .bsp_lump)"""
+    filename = str(folder / f"{name}.bsp")
+    bsp = new_bsp(filename)
+    raw_lumps = {n: bsp.lump_as_bytes(n) for n in ("VERTICES", "MESH_INDICES", "TEXTURE_DATA_STRING_DATA")}
+    raw_lumps.update({"UNUSED_4": b"raw bytes", "GAME_LUMP": b"\0" * 4})  # GAME_LUMP w/ no child lumps
+    bsp.file.close()
+    for lump_name, raw_lump in raw_lumps.items():
+        with open(f"{filename}.{titanfall.LUMP[lump_name].value:04x}.bsp_lump", "wb") as bsp_lump_file:
+            bsp_lump_file.write(raw_lump)
+    return RespawnBsp(titanfall, filename, mmap=mmap)
+
+
+class TestExternalLumps:
+    @pytest.mark.parametrize("mmap", [False, True])
+    def test_load(self, tmp_path, mmap):
+        bsp = external_bsp(tmp_path, mmap=mmap)
+        external = bsp.external
+        assert set(external.headers) == {"VERTICES", "MESH_INDICES", "TEXTURE_DATA_STRING_DATA", "UNUSED_4",
+                                         "GAME_LUMP"}
+        assert external.VERTICES[::] == bsp.VERTICES[::]
+        assert list(external.MESH_INDICES) == [0, 1, 2, 2, 1, 3]
+        assert external.TEXTURE_DATA_STRING_DATA == ["TOOLS/TOOLSNODRAW", "WORLD/DEV/GRID"]
+        assert external.UNUSED_4.as_bytes() == b"raw bytes"
+        assert len(external.GAME_LUMP.headers) == 0
+        assert len(external.loading_errors) == 0
+        assert external.lump_as_bytes("MESH_INDICES") == bsp.lump_as_bytes("MESH_INDICES")
+
+    @pytest.mark.parametrize("mmap", [False, True])
+    def test_save_edited(self, tmp_path, mmap):
+        bsp = external_bsp(tmp_path, mmap=mmap)
+        assert len(bsp.external.VERTICES) == 4  # opened through the file pool
+        bsp.external.VERTICES.append(quake.Vertex(1, 2, 3))
+        bsp.save()  # rewrites the .bsp_lump & reloads
+        assert len(bsp.external.VERTICES) == 5
+        assert tuple(bsp.external.VERTICES[-1]) == (1, 2, 3)
+        assert list(bsp.external.MESH_INDICES) == [0, 1, 2, 2, 1, 3]
+
+    @pytest.mark.parametrize("mmap", [False, True])
+    def test_file_pool(self, tmp_path, mmap):
+        pool = lumps.FilePool(max_open=2)
+        bsps = [external_bsp(tmp_path, f"test{i}", mmap) for i in range(3)]
+        all_lumps = list()
+        for bsp in bsps:
+            bsp.external.file_pool = pool
+            all_lumps.extend([bsp.external.VERTICES, bsp.external.MESH_INDICES, bsp.external.UNUSED_4])
+        for i in range(2):  # reopened after being closed
+            for lump in all_lumps:
+                assert len(lump.as_bytes()) == len(lump) * lump._entry_size
+                assert len(pool._open) <= 2
+        assert bsps[2].external.UNUSED_4[:3] == b"raw"
+        unused_4 = bsps[2].external.headers["UNUSED_4"].filename
+        assert (unused_4, mmap) in pool._open
+        pool.evict(unused_4)
+        assert (unused_4, mmap) not in pool._open
+        assert bsps[2].external.UNUSED_4[:3] == b"raw"  # reopened
+        pool.close()
+        assert len(pool._open) == 0
+        assert list(bsps[0].external.MESH_INDICES) == [0, 1, 2, 2, 1, 3]
@@ -0,0 +1,83 @@
+import numpy
+import pytest
+
+from bsp_tool import load_bsp, spatial
+from bsp_tool.branches import shared
+
+
+test2 = "tests/maps/Team Fortress 2/test2.bsp"
+
+
+@pytest.fixture(scope="module")
+def points():
+    random = numpy.random.default_rng(0)
+    points = random.uniform(-4096, 4096, (5000, 3))
+    points[:, 2] = random.uniform(0, 256, 5000)  # mostly flat, like props on a map
+    return points
+
+
+def brute_force(points, query, radius):
+    distances = ((points - query) ** 2).sum(axis=1)
+    return distances, sorted(numpy.flatnonzero(distances <= radius ** 2).tolist())
+
+
+@pytest.mark.parametrize("cell_size", [None, 16, 4096])
+def test_queries(points, cell_size):
+    index = spatial.PointIndex(points, cell_size=cell_size)
+    random = numpy.random.default_rng(1)
+    queries = [*points[random.integers(0, len(points), 32)], *random.uniform(-8192, 8192, (8, 3))]
+    for query in queries:
+        distances, expected = brute_force(points, query, 300)
+        assert index.within_radius(query, 300) == expected
+        closest = numpy.lexsort((numpy.arange(len(points)), distances))
+        for k in (1, 8, 64):
+            assert index.nearest(query, k) == closest[:k].tolist()
+        inside = numpy.all((points >= query - 200) & (points <= query + 200), axis=1)
+        assert index.within_box(query - 200, query + 200) == numpy.flatnonzero(inside).tolist()
+
+
+def test_ids():
+    grid = [(x, y, 0) for x in range(4) for y in range(4)]
+    index = spatial.PointIndex(grid, ids=range(100, 116), cell_size=1)
+    assert index.nearest((1.5, 1.5, 0), 4) == [105, 106, 109, 110]  # ties: lowest id first
+    assert index.within_radius((0, 0, 0), 1) == [100, 101, 104]
+    assert index.within_box((2, 2, -1), (8, 8, 1)) == [110, 111, 114, 115]
+    assert index.within_box((8, 8, 8), (9, 9, 9)) == list()
+    assert index.nearest((64, 64, 64), 100) == index.nearest((64, 64, 64), 16)  # k > len(index)
+    assert len(index.nearest((0, 0, 0), 16)) == 16
+
+
+def test_empty():
+    index = spatial.PointIndex([])
+    assert len(index) == 0
+    assert index.within_radius((0, 0, 0), 1024) == list()
+    assert index.nearest((0, 0, 0), 4) == list()
+    assert index.within_box((-1, -1, -1), (1, 1, 1)) == list()
+
+
+def test_bsp():
+    bsp = load_bsp(test2)
+    props = spatial.static_props(bsp)
+    assert len(props) == len(bsp.GAME_LUMP.sprp.props)
+    prop = bsp.GAME_LUMP.sprp.props[3]
+    assert 3 in props.within_radius(prop.origin, 1)
+    world_lights = spatial.world_lights(bsp)
+    assert world_lights.points.tolist() == [[*light.origin] for light in bsp.WORLD_LIGHTS]
+    assert len(spatial.world_lights(bsp, "WORLD_LIGHTS_HDR")) == 0  # empty lump
+    assert len(spatial.cubemaps(bsp)) == 0  # empty lump
+    entities = spatial.entities(bsp)
+    for i in entities.within_radius((0, 0, 0), 512):
+        origin = [float(axis) for axis in bsp.ENTITIES[i]["origin"].split()]
+        assert sum(axis ** 2 for axis in origin) <= 512 ** 2
+    assert 0 not in entities.ids  # worldspawn has no origin
+
+
+def test_columnar_props():
+    expected = spatial.static_props(load_bsp(test2)).points.tolist()
+    shared.GameLump_SPRP.columnar = True
+    try:
+        bsp = load_bsp(test2)
+        assert isinstance(bsp.GAME_LUMP.sprp.props, numpy.ndarray)
+        assert spatial.static_props(bsp).points.tolist() == expected
+    finally:
+        shared.GameLump_SPRP.columnar = False
@@ -1,10 +1,13 @@
 # TODO: more in-depth tests
 import fnmatch
 import os
+import shutil
+
+import numpy
 import pytest
 
-from bsp_tool import ValveBsp
-from bsp_tool.branches.valve import orange_box
+from bsp_tool import lumps, ValveBsp
+from bsp_tool.branches.valve import orange_box, source
 
 
 bsps = []
@@ -17,6 +20,8 @@ for map_name in fnmatch.filter(os.listdir(map_dir), "*[Bb][Ss][Pp]"):
 @pytest.mark.parametrize("bsp", bsps)
 def test_no_errors(bsp: ValveBsp):  # NOTE: covered by test_bsp.py
     assert len(bsp.loading_errors) == 0, bsp.filename
+    for child_name in bsp.GAME_LUMP.headers:
+        getattr(bsp.GAME_LUMP, child_name)  # child lumps are loaded on first access
     assert len(bsp.GAME_LUMP.loading_errors) == 0, bsp.filename
 
 
@@ -25,16 +30,150 @@ def test_entities_loaded(bsp: ValveBsp):
     assert bsp.ENTITIES[0]["classname"] == "worldspawn", bsp.filename
 
 
-# TODO: implement .save_as method and test that uneditted saves match EXACTLY
-# @pytest.mark.parametrize("bsp", d3dbsps)
-# def test_save_as(bsp):  # NotImplemented
-#     with open(bsp.filename, "rb") as file:
-#         original = file.read()
-#     test2.save_as(f"{bsp.filename}.copy")
-#     with open(f"{bsp.filename}.copy", "rb") as file:
-#         saved = file.read()
-#     os.remove(f"{bsp.filename}.copy")
-#     assert original == saved
+@pytest.mark.parametrize("bsp", bsps)
+def test_lazy(bsp: ValveBsp):
+    lazy_bsp = ValveBsp(orange_box, os.path.join(bsp.folder, bsp.filename), lazy=True)
+    assert "ENTITIES" not in lazy_bsp.__dict__, bsp.filename
+    assert lazy_bsp.ENTITIES[0]["classname"] == "worldspawn", bsp.filename
+    assert "ENTITIES" in lazy_bsp.__dict__, bsp.filename
+    assert "VERTICES" not in lazy_bsp.__dict__, bsp.filename
+    assert list(lazy_bsp.VERTICES) == list(bsp.VERTICES), bsp.filename
+    assert lazy_bsp.headers.keys() == bsp.headers.keys(), bsp.filename
+    with pytest.raises(AttributeError):
+        lazy_bsp.NOT_A_LUMP
+    # unload
+    entities = lazy_bsp.ENTITIES
+    lazy_bsp.unload("ENTITIES")
+    assert "ENTITIES" not in lazy_bsp.__dict__, bsp.filename
+    assert lazy_bsp.ENTITIES is not entities, bsp.filename
+    assert lazy_bsp.ENTITIES[0]["classname"] == "worldspawn", bsp.filename
+    lazy_bsp.file.close()
+
+
+@pytest.mark.parametrize("bsp", bsps)
+def test_world_mesh(bsp: ValveBsp):
+    mesh = bsp.world_mesh()
+    model = bsp.MODELS[0]
+    positions, texture_data = list(), list()
+    # faces first, then displacements sorted by power
+    faces = range(model.first_face, model.first_face + model.num_faces)
+    displacements = sorted([i for i in faces if bsp.FACES[i].displacement_info != -1],
+                           key=lambda i: bsp.DISPLACEMENT_INFO[bsp.FACES[i].displacement_info].power)
+    for i in faces:
+        if i in displacements:
+            continue
+        vertices = [list(P) for P, N, uv, uv2, rgb in bsp.vertices_of_face(i)]
+        for j in range(1, len(vertices) - 1):
+            positions.extend([vertices[0], vertices[j], vertices[j + 1]])
+        texture_data.extend([bsp.TEXTURE_INFO[bsp.FACES[i].texture_info].texture_data] * (len(vertices) - 2))
+    for i in displacements:
+        vertices = [list(P) for P, N, uv, uv2, rgb in bsp.vertices_of_displacement(i)]
+        triangles = source.displacement_indices(bsp.DISPLACEMENT_INFO[bsp.FACES[i].displacement_info].power)
+        positions.extend([vertices[j] for j in triangles])
+        texture_data.extend([bsp.TEXTURE_INFO[bsp.FACES[i].texture_info].texture_data] * (len(triangles) // 3))
+    assert mesh.positions.shape == (len(positions), 3), bsp.filename
+    assert mesh.uv0.shape == mesh.uv1.shape == (len(positions), 2), bsp.filename
+    assert numpy.allclose(mesh.positions, positions, atol=0.001), bsp.filename
+    assert mesh.texture_data.tolist() == texture_data, bsp.filename
+
+
+@pytest.mark.parametrize("bsp", bsps)
+def test_save_as(bsp: ValveBsp, tmp_path):
+    with open(os.path.join(bsp.folder, bsp.filename), "rb") as file:
+        original = file.read()
+    bsp = ValveBsp(orange_box, os.path.join(bsp.folder, bsp.filename))  # unmodified; other tests load child lumps
+    bsp.save_as(str(tmp_path / bsp.filename))
+    bsp.file.close()
+    with open(tmp_path / bsp.filename, "rb") as file:
+        saved = file.read()
+    assert original == saved, bsp.filename
+    # re-serialise every lump
+    edited = ValveBsp(orange_box, os.path.join(bsp.folder, bsp.filename))
+    for lump_name in edited._loadable_lumps:
+        lump = getattr(edited, lump_name)
+        if isinstance(lump, lumps.RawBspLump):
+            lump[0] = lump[0]
+    unchanged = edited._unchanged_lumps()  # only unedited special lumps, which re-encode to the same bytes
+    assert not any(isinstance(getattr(edited, n), lumps.RawBspLump) for n in unchanged), bsp.filename
+    edited.save_as(str(tmp_path / bsp.filename))
+    with open(tmp_path / bsp.filename, "rb") as file:
+        saved = file.read()
+    edited.file.close()
+    assert original == saved, bsp.filename
+
+
+@pytest.mark.parametrize("bsp", bsps)
+def test_save_as_compressed(bsp: ValveBsp, tmp_path):
+    bsp.save_as(str(tmp_path / bsp.filename), compress=True, workers=2)
+    compressed = ValveBsp(orange_box, str(tmp_path / bsp.filename))
+    assert len(compressed.loading_errors) == 0, bsp.filename
+    assert compressed.headers["PLANES"].fourCC == bsp.headers["PLANES"].length, bsp.filename
+    for lump_name in bsp._loadable_lumps:
+        assert compressed.lump_as_bytes(lump_name) == bsp.lump_as_bytes(lump_name), lump_name
+    # unchanged lumps are copied, & stay compressed
+    lazy = ValveBsp(orange_box, str(tmp_path / bsp.filename), lazy=True)
+    lazy.save_as(str(tmp_path / "copy.bsp"))
+    with open(tmp_path / bsp.filename, "rb") as file, open(tmp_path / "copy.bsp", "rb") as copy_file:
+        assert file.read() == copy_file.read(), bsp.filename
+    compressed.file.close()
+    lazy.file.close()
+
+
+@pytest.mark.parametrize("bsp", bsps)
+def test_resave_compressed(bsp: ValveBsp, tmp_path):
+    bsp.save_as(str(tmp_path / "compressed.bsp"), compress=True)
+    compressed = ValveBsp(orange_box, str(tmp_path / "compressed.bsp"))
+    for lump_name, header in compressed.headers.items():
+        if header.fourCC != 0:  # only compressed if it saves space
+            assert header.length < header.fourCC, lump_name
+        elif lump_name not in ("GAME_LUMP", "PAKFILE") and header.length > 0:
+            assert len(lumps.compress(compressed.lump_as_bytes(lump_name))) >= header.length, lump_name
+    # NOTE: special lumps are re-serialised uncompressed, so compare lump contents, not file bytes
+    compressed.PLANES[0] = compressed.PLANES[0]  # edited; re-compressed
+    compressed.save_as(str(tmp_path / "resaved.bsp"), compress=True, workers=2)
+    resaved = ValveBsp(orange_box, str(tmp_path / "resaved.bsp"))
+    assert len(resaved.loading_errors) == 0, bsp.filename
+    for lump_name in bsp._loadable_lumps:
+        assert resaved.lump_as_bytes(lump_name) == bsp.lump_as_bytes(lump_name), lump_name
+    compressed.file.close()
+    resaved.file.close()
+
+
+@pytest.mark.parametrize("bsp", bsps)
+def test_save_as_from_memory(bsp: ValveBsp, tmp_path):
+    with open(os.path.join(bsp.folder, bsp.filename), "rb") as file:
+        original = file.read()
+    in_memory = ValveBsp(orange_box, original)
+    in_memory.save_as(str(tmp_path / bsp.filename))  # new file; unchanged lumps are copied from the buffer
+    in_memory.save_as(str(tmp_path / bsp.filename))  # existing file; not the source
+    with open(tmp_path / bsp.filename, "rb") as file:
+        assert file.read() == original, bsp.filename
+
+
+def test_unchanged_special_lumps():
+    bsp = ValveBsp(orange_box, os.path.join(map_dir, "test2.bsp"), lazy=True)
+    assert len(bsp.ENTITIES) > 0 and len(bsp.GAME_LUMP.sprp.props) > 0  # accessed, not edited
+    assert {"ENTITIES", "GAME_LUMP"}.issubset(bsp._unchanged_lumps())
+    bsp.ENTITIES[0]["classname"] = "edited"
+    assert "ENTITIES" not in bsp._unchanged_lumps()
+    bsp.file.close()
+
+
+def test_save(tmp_path):
+    filename = str(tmp_path / "test2.bsp")
+    shutil.copyfile(os.path.join(map_dir, "test2.bsp"), filename)
+    bsp = ValveBsp(orange_box, filename)
+    vertices = bsp.VERTICES[::]
+    bsp.PLANES[0] = bsp.PLANES[1]
+    bsp.VERTICES.append(bsp.VERTICES[0])
+    bsp.save()
+    assert len(bsp.PLANES._changes) == 0
+    assert bsp.PLANES[0] == bsp.PLANES[1]
+    assert bsp.VERTICES[::] == [*vertices, vertices[0]]
+    assert bsp.ENTITIES[0]["classname"] == "worldspawn"
+    assert bsp.revision == 24
+    bsp.file.close()
+
 
 # TODO: assert UNUSED lump names are accurate
 # -- warn if a lump is unexpectedly empty across all maps (test_deprecated?)